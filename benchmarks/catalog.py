@@ -0,0 +1,96 @@
+# benchmarks/catalog.py – catálogos sintéticos deterministas (es/ca) para los benchmarks
+#
+# Mismo `n` y `seed` → mismo catálogo, byte a byte. Las columnas son las que
+# devuelve scrape_mercadona() antes de enrich_prices(), para poder pasarlo tal
+# cual por enrich_prices() y reload_mercadona().
+
+import random
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+SIZES: Dict[str, int] = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# (producto es, producto ca, sección, subcategoría, formatos típicos)
+_PRODUCTS: List[Tuple[str, str, str, str, Tuple[str, ...]]] = [
+    ("Leche entera", "Llet sencera", "Lácteos", "Leche", ("Brick 1 L", "6 bricks x 1 L", "Botella 1,5 L")),
+    ("Leche semidesnatada", "Llet semidesnatada", "Lácteos", "Leche", ("Brick 1 L", "6 x 1 L", "Pack 6 bricks 1 L")),
+    ("Yogur natural", "Iogurt natural", "Lácteos", "Yogures", ("Pack 4 x 125 g", "Bote 1 kg", "6 x 125 g")),
+    ("Yogur griego", "Iogurt grec", "Lácteos", "Yogures", ("Pack 4 x 115 g", "Bote 500 g")),
+    ("Queso curado", "Formatge curat", "Charcutería y quesos", "Quesos", ("Cuña 250 g", "Pieza 1,2 kg aprox.", "Lonchas 150 g")),
+    ("Queso tierno", "Formatge tendre", "Charcutería y quesos", "Quesos", ("Cuña 300 g", "Lonchas 200 g")),
+    ("Jamón serrano", "Pernil serrà", "Charcutería y quesos", "Embutidos", ("Paquete 100 g", "Lonchas 2 x 80 g", "Pieza 7 kg aprox.")),
+    ("Chorizo extra", "Xoriço extra", "Charcutería y quesos", "Embutidos", ("Sarta 200 g", "Lonchas 100 g")),
+    ("Pan de molde", "Pa de motlle", "Panadería", "Pan de molde", ("Paquete 460 g", "Paquete 675 g")),
+    ("Barra de pan", "Barra de pa", "Panadería", "Pan del día", ("1 ud. 250 g", "Pieza 220 g")),
+    ("Galletas maría", "Galetes maria", "Desayuno", "Galletas", ("Paquete 800 g", "Pack 4 x 200 g")),
+    ("Cereales de avena", "Cereals de civada", "Desayuno", "Cereales", ("Caja 500 g", "Caja 375 g")),
+    ("Café molido natural", "Cafè mòlt natural", "Desayuno", "Café", ("Paquete 250 g", "Pack 2 x 250 g", "Cápsulas 10 ud.")),
+    ("Aceite de oliva virgen extra", "Oli d'oliva verge extra", "Aceite y especias", "Aceite", ("Botella 1 L", "Garrafa 5 L", "Botella 750 ml")),
+    ("Arroz redondo", "Arròs rodó", "Arroz, legumbres y pasta", "Arroz", ("Paquete 1 kg", "Paquete 500 g")),
+    ("Macarrones", "Macarrons", "Arroz, legumbres y pasta", "Pasta", ("Paquete 500 g", "Paquete 1 kg")),
+    ("Garbanzos cocidos", "Cigrons cuits", "Arroz, legumbres y pasta", "Legumbres", ("Bote 400 g (240 g escurrido)", "3 x 400 g")),
+    ("Atún en aceite de oliva", "Tonyina en oli d'oliva", "Conservas", "Pescado", ("Pack 3 x 80 g", "Lata 120 g")),
+    ("Tomate triturado", "Tomàquet triturat", "Conservas", "Verduras", ("Bote 800 g", "Brick 390 g")),
+    ("Agua mineral", "Aigua mineral", "Agua y refrescos", "Agua", ("Botella 1,5 L", "6 botellas x 1,5 L", "Garrafa 5 L")),
+    ("Refresco de cola", "Refresc de cola", "Agua y refrescos", "Refrescos", ("Lata 330 ml", "Pack 8 latas 330 ml", "Botella 2 L")),
+    ("Cerveza rubia", "Cervesa rossa", "Bodega", "Cerveza", ("Pack 6 latas x 330 ml", "Botellín 250 ml", "12 x 330 ml")),
+    ("Vino tinto", "Vi negre", "Bodega", "Vino", ("Botella 750 ml", "Brick 1 L")),
+    ("Pechuga de pollo", "Pit de pollastre", "Carne", "Aves", ("Bandeja 500 g aprox.", "Bandeja 1 kg aprox.")),
+    ("Filetes de ternera", "Filets de vedella", "Carne", "Vacuno", ("Bandeja 400 g aprox.",)),
+    ("Salmón fresco", "Salmó fresc", "Marisco y pescado", "Pescado fresco", ("Bandeja 300 g aprox.", "Lomos 2 x 125 g")),
+    ("Manzana golden", "Poma golden", "Fruta y verdura", "Fruta", ("Malla 1 kg", "Pieza 200 g aprox.")),
+    ("Plátano de Canarias", "Plàtan de Canàries", "Fruta y verdura", "Fruta", ("Racimo 1 kg aprox.",)),
+    ("Tomate pera", "Tomàquet pera", "Fruta y verdura", "Verdura", ("Bandeja 1 kg", "Pieza 150 g aprox.")),
+    ("Chocolate con leche", "Xocolata amb llet", "Cacao y chocolate", "Chocolate", ("Tableta 150 g", "Pack 3 x 100 g")),
+    ("Pizza barbacoa", "Pizza barbacoa", "Congelados", "Pizzas", ("Caja 410 g", "Pack 2 x 350 g")),
+    ("Helado de vainilla", "Gelat de vainilla", "Congelados", "Helados", ("Tarrina 1 L", "Pack 6 x 60 ml")),
+    ("Detergente líquido", "Detergent líquid", "Limpieza y hogar", "Detergente", ("Botella 40 lavados 2 L", "Garrafa 3 L")),
+    ("Papel higiénico doble capa", "Paper higiènic doble capa", "Limpieza y hogar", "Papel", ("Paquete 12 rollos", "6 rollos")),
+    ("Gel de baño", "Gel de bany", "Cuidado personal", "Higiene", ("Botella 750 ml", "Bote 600 ml")),
+    ("Champú anticaspa", "Xampú anticaspa", "Cuidado personal", "Cabello", ("Bote 400 ml",)),
+    ("Comida perro adulto", "Menjar gos adult", "Mascotas", "Perro", ("Paquete 3 kg", "Saco 10 kg", "Lata 400 g")),
+]
+_MODIFIERS_ES = ("", "", "", "sin lactosa", "ecológico", "light", "bajo en sal", "sin gluten", "extra", "clásico", "integral")
+_MODIFIERS_CA = ("", "", "", "sense lactosa", "ecològic", "light", "baix en sal", "sense gluten", "extra", "clàssic", "integral")
+_BRANDS = ("Hacendado", "Bosque Verde", "Deliplus", "Compy", "Consum", "Bonpreu", "Pascual", "Danone",
+           "Central Lechera", "Nestlé", "Gallo", "Cuétara", "Carbonell", "El Pozo", "Campofrío", "Font Vella")
+# Mismo mix que las tiendas reales: Mercadona/Consum en castellano, Bonpreu en catalán
+_STORES = (("Mercadona", "es", 0.5), ("Consum", "es", 0.3), ("Bonpreu", "ca", 0.2))
+
+# Consultas de los benchmarks de búsqueda (es, ca, cortas, multi-palabra, sin resultados)
+QUERIES: Tuple[str, ...] = (
+    "leche", "leche semidesnatada", "pan", "formatge", "aceite oliva", "yogur griego",
+    "pollo", "cervesa", "sin lactosa", "xyzzy",
+)
+
+
+def generate(n: int, seed: int = 42) -> pd.DataFrame:
+    """Catálogo sintético de `n` productos, con columnas de scraper + `store`."""
+    rng = random.Random(seed)
+    weights = [w for _, _, w in _STORES]
+    rows = []
+    for i in range(n):
+        store, lang, _ = rng.choices(_STORES, weights=weights)[0]
+        es, ca, section, sub, formats = rng.choice(_PRODUCTS)
+        base = ca if lang == "ca" else es
+        mods = _MODIFIERS_CA if lang == "ca" else _MODIFIERS_ES
+        mod = rng.choice(mods)
+        brand = rng.choice(_BRANDS)
+        fmt = rng.choice(formats)
+        # sufijo numérico = variantes distintas con el mismo patrón (evita duplicados por título)
+        name = " ".join(p for p in (base, mod, brand, f"{i % 997:03d}" if i >= 997 else "", fmt) if p)
+        price = round(rng.uniform(0.35, 25.0), 2)
+        ppu_unit = "kg" if (" g" in fmt or "kg" in fmt) else ("L" if (" l" in fmt.lower() or "ml" in fmt) else "ud.")
+        rows.append({
+            "store": store,
+            "section": section,
+            "subcategory": sub,
+            "category_path": f"{section} > {sub}",
+            "name": name,
+            "price": price,
+            "price_per_unit_text": f"{rng.uniform(0.5, 40):.2f}".replace(".", ",") + f" €/{ppu_unit}",
+            "format_text": fmt,
+            "img_url": f"https://img.example.invalid/{seed}/{i}.jpg",
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,410 @@
+# benchmarks/fixture_server.py – servidor local de páginas de tienda para probar scrapers sin red
+#
+#   python -m benchmarks.fixture_server --port 8765 --latency-ms 80 --api-latency-ms 150
+#
+# Sirve réplicas mínimas (mismos selectores que usan los scrapers) de:
+#   Mercadona  /mercadona/categories/112         SPA: menú de secciones, cookies, CP;
+#                                                 la subcategoría carga por fetch (todo de golpe
+#                                                 o por tandas al hacer scroll: --mercadona-mode)
+#   Consum     /consum/es  →  /consum/es/c/<cat>?page=N   páginas con paginador y "Siguiente"
+#   Bonpreu    /bonpreu/categories?source=navigation  →  /bonpreu/categories/<cat>
+#                                                 lista virtualizada con scroll infinito
+# Los productos salen de benchmarks.catalog (deterministas), así que se sabe
+# exactamente cuántos debe sacar cada scraper: GET /__expected.
+#
+# Con --snapshots DIR, si existe DIR/<ruta>.html se sirve tal cual (páginas
+# guardadas de las webs reales) en lugar de la réplica.
+#
+# Uso desde Python (tests/benchmarks):
+#   srv = FixtureServer(products=600, latency_ms=50).start()
+#   scrape_mercadona(start_category_url=srv.url("/mercadona/categories/112"))
+#   srv.expected["Mercadona"]; srv.stop()
+
+import argparse, html, json, random, re, threading, time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.catalog import generate
+
+_esc = html.escape
+
+
+def _slug(s: str) -> str:
+    s = s.lower()
+    for a, b in (("á", "a"), ("é", "e"), ("í", "i"), ("ó", "o"), ("ú", "u"), ("à", "a"),
+                 ("è", "e"), ("ò", "o"), ("ñ", "n"), ("ç", "c"), ("·", "")):
+        s = s.replace(a, b)
+    return re.sub(r"[^a-z0-9]+", "-", s).strip("-")
+
+
+def _price(v: float) -> str:
+    return f"{v:.2f}".replace(".", ",") + " €"
+
+
+# ========= Datos =========
+
+class FixtureData:
+    """Catálogo por tienda → categorías (ordenadas) → productos."""
+
+    def __init__(self, products: int, seed: int):
+        df = generate(products, seed)
+        self.stores: Dict[str, "OrderedDict[Tuple[str, str], List[dict]]"] = {}
+        for r in df.itertuples(index=False):
+            fmt = r.format_text
+            name = r.name[: -len(fmt)].strip() if r.name.endswith(fmt) else r.name
+            cats = self.stores.setdefault(r.store, OrderedDict())
+            cats.setdefault((r.section, r.subcategory), []).append({
+                "id": len(cats.get((r.section, r.subcategory), [])) + 1,
+                "name": name, "format": fmt, "full": r.name,
+                "price": r.price, "ppu": r.price_per_unit_text, "img": r.img_url,
+            })
+        for cats in self.stores.values():
+            for k in list(cats):
+                cats[k].sort(key=lambda p: p["full"])
+
+    def expected(self) -> Dict[str, int]:
+        # Lo que debe devolver cada scraper tras sus propios dedups
+        out = {}
+        for store, cats in self.stores.items():
+            if store == "Mercadona":     # clave por subcategoría: nombre+formato|precio
+                out[store] = len({(k, p["full"], p["price"]) for k, ps in cats.items() for p in ps})
+            else:                        # clave = URL del producto (única)
+                out[store] = sum(len(ps) for ps in cats.values())
+        return out
+
+
+# ========= Páginas =========
+
+_BASE_CSS = """
+body{font-family:sans-serif;margin:0} .grid{display:flex;flex-wrap:wrap;gap:8px;padding:8px}
+.card{width:220px;height:260px;border:1px solid #ddd;box-sizing:border-box;padding:6px;overflow:hidden}
+.card img{width:100px;height:100px;background:#eee;display:block} footer{height:300px;background:#333;color:#fff}
+"""
+
+_COOKIES = ('<div id="onetrust-banner-sdk"><button id="onetrust-accept-btn-handler" '
+            'onclick="this.parentNode.style.display=\'none\'">Aceptar todas</button></div>')
+
+
+def _mercadona_page(data: FixtureData, mode: str, batch: int) -> str:
+    cats = data.stores.get("Mercadona", {})
+    sections: "OrderedDict[str, List[Tuple[int, str]]]" = OrderedDict()
+    for i, (sec, sub) in enumerate(cats):
+        sections.setdefault(sec, []).append((i, sub))
+    menu = []
+    for sec, subs in sections.items():
+        items = "".join(f'<li class="category-item"><button id="{i}" onclick="openSub({i})">{_esc(sub)}</button></li>'
+                        for i, sub in subs)
+        menu.append(f'<li class="category-menu__item"><div class="category-menu__header">'
+                    f'<button><label>{_esc(sec)}</label></button></div><ul>{items}</ul></li>')
+    return f"""<!doctype html><html lang="es"><head><meta charset="utf-8"><title>Mercadona (fixture)</title>
+<style>{_BASE_CSS}</style></head><body>
+{_COOKIES}
+<div id="cp-modal"><form class="postal-code-checker" onsubmit="return false">
+<input data-testid="postal-code-checker-input" name="postalCode">
+<button type="button" data-testid="postal-code-checker-button"
+ onclick="setTimeout(()=>document.querySelector('form.postal-code-checker').remove(),50)">Continuar</button></form></div>
+<nav><ul class="category-menu">{''.join(menu)}</ul></nav>
+<main><p data-testid="product-count" id="count"></p><div id="products" class="grid"></div></main>
+<div id="footer-slot"></div>
+<script>
+const MODE = {json.dumps(mode)}, BATCH = {int(batch)};
+let cur = null, offset = 0, total = 0, loading = false;
+function cell(p) {{
+  const d = document.createElement('div');
+  d.className = 'card product-cell'; d.setAttribute('data-testid', 'product-cell');
+  d.innerHTML = '<div class="product-cell__image-wrapper"><img src="' + p.img + '"></div>' +
+    '<h4 class="product-cell__description-name"></h4><div class="product-format"><span></span></div>' +
+    '<div class="product-price"><p class="product-price__unit-price"></p></div>';
+  d.querySelector('h4').textContent = p.name;
+  d.querySelector('.product-format span').textContent = p.format;
+  const pr = d.querySelector('.product-price p'); pr.textContent = p.price; pr.setAttribute('aria-label', p.price);
+  return d;
+}}
+function footer(show) {{
+  document.getElementById('footer-slot').innerHTML = show ? '<footer>Mercadona · fin</footer>' : '';
+}}
+async function load() {{
+  if (loading || cur === null || (total && offset >= total)) return;
+  loading = true;
+  const sub = cur;
+  const lim = MODE === 'all' ? 100000 : BATCH;
+  const r = await fetch('/mercadona/api/sub/' + sub + '?offset=' + offset + '&limit=' + lim);
+  const j = await r.json();
+  if (sub !== cur) {{ loading = false; return; }}
+  const box = document.getElementById('products');
+  for (const p of j.items) box.appendChild(cell(p));
+  offset += j.items.length; total = j.total;
+  document.getElementById('count').textContent = total + ' productos';
+  footer(offset >= total);
+  loading = false;
+}}
+function openSub(i) {{
+  cur = i; offset = 0; total = 0;
+  document.getElementById('products').innerHTML = ''; footer(false);
+  document.getElementById('count').textContent = '';
+  window.scrollTo(0, 0);
+  load();
+}}
+window.addEventListener('scroll', () => {{
+  if (window.innerHeight + window.scrollY > document.body.scrollHeight - 600) load();
+}});
+</script></body></html>"""
+
+
+def _consum_home(data: FixtureData) -> str:
+    links = "".join(
+        f'<li><a class="element-list__link" href="/consum/es/c/{_slug(sec)}-{_slug(sub)}/{i}">{_esc(sub)}</a></li>'
+        for i, (sec, sub) in enumerate(data.stores.get("Consum", {})))
+    return f"""<!doctype html><html lang="es"><head><meta charset="utf-8"><title>Consum (fixture)</title>
+<style>{_BASE_CSS}</style></head><body>
+<div id="cookies"><button onclick="this.parentNode.remove()">Aceptar todas</button></div>
+<cmp-menu-button><button onclick="document.getElementById('menu').style.display='block'">Menú</button></cmp-menu-button>
+<div id="menu" style="display:none"><ul class="element-list__ul">{links}</ul></div>
+</body></html>"""
+
+
+def _consum_category(data: FixtureData, idx: int, page: int, page_size: int, path: str) -> Optional[str]:
+    cats = list(data.stores.get("Consum", {}).items())
+    if not (0 <= idx < len(cats)):
+        return None
+    (sec, sub), prods = cats[idx]
+    pages = max(1, -(-len(prods) // page_size))
+    page = min(max(page, 1), pages)
+    cards = []
+    for p in prods[(page - 1) * page_size: page * page_size]:
+        brand, title = p["name"].split(" ")[-1], p["full"]
+        cards.append(
+            f'<cmp-widget-product-v2 class="card"><a href="/consum/es/p/{_slug(title)}/{idx}-{p["id"]}">'
+            f'<cmp-image><picture class="image-component"><img src="{_esc(p["img"])}"></picture></cmp-image></a>'
+            f'<div class="product-info-name product-info-name--name"><p class="u-size--20">{_esc(brand)}</p>'
+            f'<h1 class="u-title-3">{_esc(title)}</h1></div>'
+            f'<div class="product-info-price__price"><span class="price">{_price(p["price"])}</span></div>'
+            f'<lib-product-info-price><span class="price__ppu">{_esc(p["ppu"])}</span></lib-product-info-price>'
+            f'</cmp-widget-product-v2>')
+    nums = "".join(f'<a href="{path}?orderById=5&page={n}" aria-label="página {n}">{n}</a> ' for n in range(1, pages + 1))
+    nxt_cls = "next-page" + (" disabled" if page >= pages else "")
+    nxt = f'<a class="{nxt_cls}" aria-label="Siguiente" href="{path}?orderById=5&page={min(page + 1, pages)}">›</a>'
+    return f"""<!doctype html><html lang="es"><head><meta charset="utf-8"><title>{_esc(sub)} (fixture)</title>
+<style>{_BASE_CSS}</style></head><body>
+<h2>{_esc(sec)} / {_esc(sub)}</h2>
+<div class="grid">{''.join(cards)}</div>
+<nav aria-label="paginación" class="pagination">{nums}{nxt}</nav>
+</body></html>"""
+
+
+def _bonpreu_root(data: FixtureData) -> str:
+    links = "".join(
+        f'<li><a data-test="root-category-link" href="/bonpreu/categories/{_slug(sub)}/{i}">{_esc(sub)}</a></li>'
+        for i, (sec, sub) in enumerate(data.stores.get("Bonpreu", {})))
+    return f"""<!doctype html><html lang="ca"><head><meta charset="utf-8"><title>Bonpreu (fixture)</title>
+<style>{_BASE_CSS}</style></head><body>{_COOKIES}
+<aside><a data-test="root-category-link" href="/bonpreu/categories">Totes</a><ul>{links}</ul></aside>
+</body></html>"""
+
+
+def _bonpreu_category(data: FixtureData, idx: int, batch: int) -> Optional[str]:
+    cats = list(data.stores.get("Bonpreu", {}).items())
+    if not (0 <= idx < len(cats)):
+        return None
+    n = len(cats[idx][1])
+    return f"""<!doctype html><html lang="ca"><head><meta charset="utf-8"><title>Bonpreu (fixture)</title>
+<style>{_BASE_CSS}
+#list{{height:800px;overflow-y:auto;position:relative;border:1px solid #ccc}}
+#spacer{{position:relative}} .product-card-container{{position:absolute;width:220px;height:260px}}</style>
+</head><body>{_COOKIES}<main>
+<p data-test="product-count">{n} productes</p>
+<div data-test="infinite-scroll-component" id="list"><div id="spacer"></div></div></main>
+<script>
+// Lista virtualizada: solo existen en el DOM las filas cercanas a la vista
+const CAT = {idx}, BATCH = {int(batch)}, ROW_H = 270, COLS = 4, OVERSCAN = 1;
+let items = [], total = -1, loading = false;
+const list = document.getElementById('list'), spacer = document.getElementById('spacer');
+function card(p, i) {{
+  const d = document.createElement('div');
+  d.className = 'card product-card-container';
+  d.style.top = (Math.floor(i / COLS) * ROW_H) + 'px'; d.style.left = ((i % COLS) * 230) + 'px';
+  d.innerHTML = '<a data-test="fop-product-link"><img data-test="lazy-load-image"><h3 data-test="fop-title"></h3></a>' +
+    '<div data-test="fop-price"></div><div data-test="fop-price-per-unit"></div>';
+  d.querySelector('a').setAttribute('href', '/bonpreu/products/' + CAT + '-' + p.id);
+  d.querySelector('img').setAttribute('src', p.img);
+  d.querySelector('h3').textContent = p.full;
+  d.querySelector('[data-test="fop-price"]').textContent = p.price;
+  d.querySelector('[data-test="fop-price-per-unit"]').textContent = p.ppu;
+  return d;
+}}
+function render() {{
+  const rows = Math.ceil(items.length / COLS);
+  spacer.style.height = (rows * ROW_H + (total < 0 || items.length < total ? 400 : 0)) + 'px';
+  const first = Math.max(0, Math.floor(list.scrollTop / ROW_H) - OVERSCAN);
+  const last = Math.min(rows, Math.ceil((list.scrollTop + list.clientHeight) / ROW_H) + OVERSCAN);
+  spacer.innerHTML = '';
+  for (let i = first * COLS; i < Math.min(items.length, last * COLS); i++) spacer.appendChild(card(items[i], i));
+  if (list.scrollTop + list.clientHeight > rows * ROW_H - 400) more();
+}}
+async function more() {{
+  if (loading || (total >= 0 && items.length >= total)) return;
+  loading = true;
+  const r = await fetch('/bonpreu/api/cat/' + CAT + '?offset=' + items.length + '&limit=' + BATCH);
+  const j = await r.json();
+  items = items.concat(j.items); total = j.total; loading = false;
+  render();
+}}
+list.addEventListener('scroll', render);
+more();
+</script></body></html>"""
+
+
+# ========= Servidor =========
+
+class FixtureServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, products: int = 1200, seed: int = 42,
+                 latency_ms: float = 0.0, api_latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 mercadona_mode: str = "all", batch: int = 40, page_size: int = 24,
+                 snapshots: Optional[Path] = None):
+        self.data = FixtureData(products, seed)
+        self.latency_ms, self.api_latency_ms, self.jitter_ms = latency_ms, api_latency_ms, jitter_ms
+        self.mercadona_mode, self.batch, self.page_size = mercadona_mode, batch, page_size
+        self.snapshots = snapshots
+        self.expected = self.data.expected()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True, name="fixture-server")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    # ---------- latencia ----------
+    def _sleep(self, base_ms: float) -> None:
+        if base_ms <= 0 and self.jitter_ms <= 0:
+            return
+        with self._rng_lock:
+            j = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        time.sleep(max(0.0, base_ms + j) / 1000.0)
+
+    # ---------- rutas ----------
+    def route(self, path: str, qs: Dict[str, List[str]]) -> Tuple[int, str, str]:
+        """Devuelve (status, content-type, cuerpo)."""
+        def qi(name: str, default: int) -> int:
+            try:
+                return int(qs.get(name, [default])[0])
+            except ValueError:
+                return default
+
+        if self.snapshots is not None:
+            snap = (self.snapshots / (path.strip("/") or "index")).with_suffix(".html")
+            if snap.resolve().is_relative_to(self.snapshots.resolve()) and snap.is_file():
+                return 200, "text/html", snap.read_text(encoding="utf-8")
+
+        if path == "/__expected":
+            return 200, "application/json", json.dumps(self.expected)
+
+        m = re.fullmatch(r"/(mercadona|bonpreu)/api/(sub|cat)/(\d+)", path)
+        if m:
+            self._sleep(self.api_latency_ms)
+            store = "Mercadona" if m.group(1) == "mercadona" else "Bonpreu"
+            cats = list(self.data.stores.get(store, {}).values())
+            idx = int(m.group(3))
+            if not (0 <= idx < len(cats)):
+                return 404, "application/json", "{}"
+            prods = cats[idx]
+            off, lim = qi("offset", 0), qi("limit", self.batch)
+            items = [{"id": p["id"], "name": p["name"], "format": p["format"], "full": p["full"],
+                      "price": _price(p["price"]), "ppu": p["ppu"], "img": p["img"]}
+                     for p in prods[off: off + lim]]
+            return 200, "application/json", json.dumps({"items": items, "total": len(prods)})
+
+        self._sleep(self.latency_ms)
+        if re.fullmatch(r"/mercadona/categories/\d+", path):
+            return 200, "text/html", _mercadona_page(self.data, self.mercadona_mode, self.batch)
+        if path in ("/consum/es", "/consum/es/"):
+            return 200, "text/html", _consum_home(self.data)
+        m = re.fullmatch(r"/consum/es/c/[\w-]+/(\d+)", path)
+        if m:
+            body = _consum_category(self.data, int(m.group(1)), qi("page", 1), self.page_size, path)
+            if body:
+                return 200, "text/html", body
+        if path == "/bonpreu/categories":
+            return 200, "text/html", _bonpreu_root(self.data)
+        m = re.fullmatch(r"/bonpreu/categories/[\w-]+/(\d+)", path)
+        if m:
+            body = _bonpreu_category(self.data, int(m.group(1)), self.batch)
+            if body:
+                return 200, "text/html", body
+        return 404, "text/plain", "not found"
+
+    def _handler(self):
+        srv = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                srv.requests += 1
+                u = urlparse(self.path)
+                status, ctype, body = srv.route(u.path, parse_qs(u.query))
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{ctype}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Servidor local de páginas de Mercadona/Consum/Bonpreu para los scrapers")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--products", type=int, default=1200, help="productos en total (se reparten entre tiendas)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="latencia de cada página HTML")
+    ap.add_argument("--api-latency-ms", type=float, default=0.0, help="latencia de cada tanda (fetch) del scroll infinito")
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--mercadona-mode", choices=("all", "infinite"), default="all",
+                    help="all: la subcategoría llega entera; infinite: por tandas al hacer scroll")
+    ap.add_argument("--batch", type=int, default=40, help="productos por tanda (scroll infinito)")
+    ap.add_argument("--page-size", type=int, default=24, help="productos por página (Consum)")
+    ap.add_argument("--snapshots", type=Path, help="carpeta con páginas guardadas (<ruta>.html)")
+    args = ap.parse_args()
+    srv = FixtureServer(args.host, args.port, args.products, args.seed, args.latency_ms, args.api_latency_ms,
+                        args.jitter_ms, args.mercadona_mode, args.batch, args.page_size, args.snapshots)
+    print(f"Fixtures en {srv.base_url}  (esperados: {srv.expected})")
+    print(f"  Mercadona: {srv.url('/mercadona/categories/112')}")
+    print(f"  Consum:    {srv.url('/consum/es')}")
+    print(f"  Bonpreu:   {srv.url('/bonpreu/categories?source=navigation')}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
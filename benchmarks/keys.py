@@ -0,0 +1,161 @@
+# benchmarks/keys.py – claves TEXT (uuid) vs INTEGER en product/category/product_category
+#
+#   python -m benchmarks.keys                      # sobre una copia de la DB configurada
+#   python -m benchmarks.keys --db otra.db --repeat 20
+#
+# Copia la DB a un temporal (la original no se toca), mide, la migra con init_db() en
+# un proceso aparte (BARATAZO_DB se lee al importar pagina_web.db), hace VACUUM en las dos
+# y vuelve a medir: tamaño del fichero, bytes por tabla/índice (dbstat), tiempo de los
+# joins típicos y de generar los ids (make_product_id fila a fila vs make_product_ids).
+
+import argparse, os, shutil, sqlite3, subprocess, sys, tempfile, time
+from pathlib import Path
+from typing import Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# {pc_p}/{pc_c}: columnas de product_category; {p_k}/{c_k}: a qué apuntan en product/category
+_LAYOUTS = {
+    "text": {"pc_p": "product_id", "pc_c": "category_id", "p_k": "id", "c_k": "id"},
+    "integer": {"pc_p": "product_pk", "pc_c": "category_pk", "p_k": "pk", "c_k": "pk"},
+}
+JOINS = {
+    # productos por categoría (recuento)
+    "count_by_category": """
+        SELECT c.category, c.subcategory, COUNT(*) FROM product_category pc
+          JOIN category c ON c.{c_k} = pc.{pc_c} GROUP BY c.{c_k}""",
+    # catálogo entero con su categoría (producto → categorías)
+    "product_categories": """
+        SELECT p.title, p.price_unit, c.category, c.subcategory FROM product p
+          JOIN product_category pc ON pc.{pc_p} = p.{p_k}
+          JOIN category c ON c.{c_k} = pc.{pc_c}""",
+    # listado de una categoría (categoría → productos), todas una a una
+    "category_listing": """
+        SELECT p.title, p.price_unit FROM product_category pc
+          JOIN product p ON p.{p_k} = pc.{pc_p}
+         WHERE pc.{pc_c} = ?""",
+}
+
+
+def _layout(conn: sqlite3.Connection) -> str:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(product_category)")}
+    return "text" if "product_id" in cols else "integer"
+
+
+def _prepare_before(path: Path) -> None:
+    """Las columnas/índices de precio que init_db() añade también en el 'antes' (si no, no es justo)."""
+    from pagina_web.db import _PRODUCT_COLUMNS, _PRODUCT_INDEXED
+    with sqlite3.connect(path) as conn:
+        have = {r[1] for r in conn.execute("PRAGMA table_info(product)")}
+        for col, typ in _PRODUCT_COLUMNS.items():
+            if col not in have:
+                conn.execute(f"ALTER TABLE product ADD COLUMN {col} {typ}")
+        for col in _PRODUCT_INDEXED:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_product_{col} ON product({col})")
+
+
+def measure(path: Path, repeat: int) -> Dict[str, float]:
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    lay = _LAYOUTS[_layout(conn)]
+    m: Dict[str, float] = {"file_bytes": path.stat().st_size}
+    for name, tbl, size in conn.execute("""
+            SELECT s.name, m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name
+             WHERE m.tbl_name IN ('product', 'category', 'product_category') GROUP BY s.name"""):
+        kind = "table" if name == tbl else "index"
+        if kind == "index":   # las autoindex cambian de número: se nombran por sus columnas
+            cols = ", ".join(r[2] for r in conn.execute(f"PRAGMA index_info({name!r})"))
+            name = f"{tbl}({cols})" + ("" if name.startswith("sqlite_autoindex") else f" {name}")
+        m[f"{kind}.{name}"] = size
+        m[f"total.{kind}_bytes"] = m.get(f"total.{kind}_bytes", 0) + size
+    cats = [r[0] for r in conn.execute(f"SELECT {lay['c_k']} FROM category")]
+    for name, sql in JOINS.items():
+        q = sql.format(**lay)
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            if "?" in q:
+                for c in cats:
+                    conn.execute(q, (c,)).fetchall()
+            else:
+                conn.execute(q).fetchall()
+            best = min(best, time.perf_counter() - t0)
+        m[f"join.{name}_ms"] = best * 1000
+    conn.close()
+    return m
+
+
+def id_builders(path: Path, repeat: int) -> Dict[str, float]:
+    """Ids de una recarga: productos + enlaces (una fila por producto y categoría)."""
+    import pandas as pd
+    from pagina_web.models import make_product_id, make_category_id, make_product_ids, make_category_ids
+    conn = sqlite3.connect(path)
+    lay = _LAYOUTS[_layout(conn)]
+    df = pd.DataFrame(conn.execute("""
+        SELECT p.store, p.title, c.category, c.subcategory FROM product p
+          JOIN product_category pc ON pc.{pc_p} = p.{p_k}
+          JOIN category c ON c.{c_k} = pc.{pc_c}""".format(**lay)).fetchall(),
+        columns=["store", "title", "category", "subcategory"])
+    conn.close()
+    prod = df.drop_duplicates(["store", "title"])
+
+    def rowwise():   # como el loader anterior: el del producto dos veces por fila
+        [make_product_id(s, t) for s, t in zip(prod["store"], prod["title"])]
+        [(make_category_id(c, sc), make_product_id(s, t))
+         for s, t, c, sc in zip(df["store"], df["title"], df["category"], df["subcategory"])]
+
+    def vectorized():
+        make_product_ids(df["store"], df["title"])
+        make_category_ids(df["category"], df["subcategory"])
+
+    out = {}
+    for name, fn in (("rowwise", rowwise), ("vectorized", vectorized)):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        out[f"ids.{name}_ms"] = best * 1000
+    return out
+
+
+def _migrate(path: Path) -> None:
+    env = {**os.environ, "BARATAZO_DB": str(path), "PYTHONPATH": str(ROOT)}
+    subprocess.run([sys.executable, "-c", "from pagina_web.db import init_db; init_db()"],
+                   env=env, check=True, cwd=ROOT)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Claves TEXT vs INTEGER: tamaño, índices y joins")
+    ap.add_argument("--db", type=Path, help="DB de partida (por defecto la de pagina_web.db)")
+    ap.add_argument("--repeat", type=int, default=10, help="se queda la mejor de N")
+    args = ap.parse_args()
+    if args.db is None:
+        from pagina_web.db import db_path
+        args.db = db_path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before, after = Path(tmp) / "before.db", Path(tmp) / "after.db"
+        shutil.copyfile(args.db, before)
+        with sqlite3.connect(before) as conn:
+            if _layout(conn) != "text":
+                print(f"{args.db} ya usa claves enteras: no hay 'antes' que medir")
+                return 1
+        _prepare_before(before)
+        shutil.copyfile(before, after)
+        _migrate(after)
+        mb, ma = measure(before, args.repeat), measure(after, args.repeat)
+        ids = id_builders(before, args.repeat)
+
+    print(f"{'métrica':64} {'antes':>12} {'después':>12} {'cambio':>8}")
+    for k in sorted(set(mb) | set(ma), key=lambda k: (k.split(".")[0], k)):
+        b, a = mb.get(k), ma.get(k)
+        ch = f"{(a - b) / b:+.0%}" if a is not None and b else ""
+        print(f"{k:64} {'' if b is None else f'{b:,.1f}':>12} {'' if a is None else f'{a:,.1f}':>12} {ch:>8}")
+    print(f"{'ids.rowwise_ms → vectorized_ms':64} {ids['ids.rowwise_ms']:12,.1f} {ids['ids.vectorized_ms']:12,.1f} "
+          f"{(ids['ids.vectorized_ms'] - ids['ids.rowwise_ms']) / ids['ids.rowwise_ms']:+8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+# benchmarks/run.py – benchmarks de los caminos calientes (búsqueda, orden, carga, parseo)
+#
+#   python -m benchmarks.run                         # 10k y 100k, compara con baseline.json
+#   python -m benchmarks.run --sizes 10k,100k,1m     # 1m tarda (la carga es fila a fila)
+#   python -m benchmarks.run --save-baseline         # fija los resultados como nueva referencia
+#
+# Cada tamaño corre en un proceso aparte con su propia DB temporal (BARATAZO_DB se
+# lee al importar pagina_web.db), así los tamaños no se contaminan entre sí.
+# Resultados en benchmarks/results/<fecha>.json. Sale con código 1 si alguna
+# métrica empeora más de --threshold respecto a la referencia.
+#
+# Métricas: las que acaban en _per_s cuanto más, mejor; el resto (s, ms, us, bytes),
+# cuanto menos, mejor. Las que empiezan por "info." no se comparan.
+
+import argparse, json, os, platform, statistics, subprocess, sys, tempfile, time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE = BENCH_DIR / "baseline.json"
+RESULTS_DIR = BENCH_DIR / "results"
+
+SORTS = ("recientes", "relevancia", "unit_asc", "unit_desc", "kg_asc", "kg_desc", "l_asc", "count_asc")
+PARSE_SAMPLE = 100_000     # textos como mucho para los micro-benchmarks de parseo/búsqueda
+API_REPEAT = 7            # por consulta se queda la mejor de N (quita el ruido del threadpool)
+MIN_ABS_MS = 2.0          # cambios de latencia menores que esto no cuentan como regresión
+
+
+def _best(fn: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _pct(values: List[float], q: float) -> float:
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(q * (len(v) - 1))))]
+
+
+# ========= worker (un tamaño, proceso propio) =========
+
+def run_size(label: str, n: int, seed: int) -> Dict[str, float]:
+    from benchmarks.catalog import generate, QUERIES
+    from pagina_web.units import parse_totals_simple
+    from scrapers.mercadona import enrich_prices
+    from pagina_web.utils import matches_query
+
+    m: Dict[str, float] = {}
+    p = f"{label}."
+
+    t0 = time.perf_counter()
+    df = generate(n, seed)
+    m[p + "info.generate_s"] = time.perf_counter() - t0
+    m[p + "info.rows"] = n
+
+    # --- parseo ---
+    titles = df["name"].tolist()[:PARSE_SAMPLE]
+    m[p + "parse_totals_simple_per_s"] = len(titles) / _best(lambda: [parse_totals_simple(t) for t in titles])
+    m[p + "enrich_prices_per_s"] = n / _best(lambda: enrich_prices(df), repeat=1 if n > 200_000 else 3)
+
+    # --- búsqueda lineal (camino "recientes" con q) ---
+    def _scan():
+        for q in QUERIES:
+            for t in titles:
+                matches_query(t, q)
+    m[p + "matches_query_per_s"] = len(titles) * len(QUERIES) / _best(_scan, repeat=1)
+
+    # --- carga en DB ---
+    from scrapers.guardar_mercadona import reload_mercadona
+    from pagina_web.db import db_path
+    enriched = enrich_prices(df)
+    t0 = time.perf_counter()
+    reload_mercadona(enriched)
+    dt = time.perf_counter() - t0
+    m[p + "reload_mercadona_s"] = dt
+    m[p + "reload_mercadona_rows_per_s"] = n / dt
+    m[p + "db_size_bytes"] = sum(
+        f.stat().st_size for f in db_path.parent.glob(db_path.name + "*") if f.is_file()
+    )
+
+    # --- validación previa a la carga (contra lo recién cargado como histórico) ---
+    from scrapers.guardar import from_mercadona
+    from scrapers.validate import load_history, validate
+    from pagina_web.models import make_product_ids
+    loaded = from_mercadona(enriched).assign(store="Mercadona")
+    loaded = loaded.assign(id=make_product_ids(loaded["store"], loaded["title"]))   # como reload_store
+    hist = load_history("Mercadona")
+    m[p + "validate_history_ms"] = _best(lambda: load_history("Mercadona")) * 1000
+    m[p + "validate_ms"] = _best(lambda: validate("Mercadona", loaded, history=hist)) * 1000
+
+    # --- API ---
+    from fastapi.testclient import TestClient
+    from pagina_web.app import app
+    with TestClient(app) as c:
+        t0 = time.perf_counter()
+        c.get("/api/products", params={"q": "leche", "sort": "relevancia"})
+        m[p + "api_first_ranked_ms"] = (time.perf_counter() - t0) * 1000   # incluye construir el índice
+
+        def _lat(params) -> float:
+            best = float("inf")
+            for _ in range(API_REPEAT):
+                t0 = time.perf_counter()
+                c.get("/api/products", params=params).raise_for_status()
+                best = min(best, (time.perf_counter() - t0) * 1000)
+            return best
+
+        # p50/p95 entre consultas (cada una, su mejor tiempo)
+        modes = {sort: {"sort": sort} for sort in SORTS}
+        modes["fuzzy"] = {"fuzzy": 1}
+        for name, extra in modes.items():
+            lat = [_lat({"q": q, "limit": 400, **extra}) for q in QUERIES]
+            m[p + f"api_{name}_p50_ms"] = statistics.median(lat)
+            m[p + f"api_{name}_p95_ms"] = _pct(lat, 0.95)
+        m[p + "api_browse_ms"] = _lat({"sort": "recientes", "limit": 400})
+
+    # --- catálogo en columnas (BARATAZO_SNAPSHOT=1), sin HTTP: selección + filas ---
+    from pagina_web.db import engine
+    from pagina_web.snapshot import CatalogSnapshot
+    t0 = time.perf_counter()
+    snap = CatalogSnapshot.load(engine)
+    m[p + "snapshot_build_s"] = time.perf_counter() - t0
+    m[p + "info.snapshot_bytes"] = sum(snap.nbytes().values())
+    cases = {
+        "browse": ("", [], "recientes", False, 400),
+        "browse_kg": ("", ["Mercadona"], "kg_asc", False, 400),
+        "q_unit": ("leche", [], "unit_asc", False, 400),
+        "ranked": ("leche", [], "relevancia", False, 400),
+    }
+    for name, args in cases.items():
+        m[p + f"snapshot_{name}_us"] = _best(lambda: snap.items(snap.select(*args)), repeat=7) * 1e6
+    return m
+
+
+def _spawn(label: str, n: int, seed: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory(prefix=f"baratazo-bench-{label}-") as tmp:
+        env = dict(os.environ)
+        env["BARATAZO_DB"] = str(Path(tmp) / "bench.db")
+        env["BARATAZO_RUNS_DIR"] = str(Path(tmp) / "runs")
+        env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", label, "--seed", str(seed)],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stdout[-2000:] + proc.stderr[-4000:])
+            raise SystemExit(f"benchmark {label} falló (código {proc.returncode})")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ========= comparación =========
+
+def _worse(key: str, new: float, old: float) -> float:
+    """Empeoramiento relativo (>0 = peor)."""
+    if not old:
+        return 0.0
+    if key.endswith("_per_s"):
+        return old / new - 1 if new else float("inf")
+    return new / old - 1
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    regressions = []
+    print(f"\n{'métrica':45} {'referencia':>14} {'ahora':>14} {'cambio':>9}")
+    for k in sorted(metrics):
+        v = metrics[k]
+        if k not in baseline or ".info." in k:
+            print(f"{k:45} {'':>14} {v:14.4g}")
+            continue
+        w = _worse(k, v, baseline[k])
+        flag = ""
+        if k.endswith("_ms") and abs(v - baseline[k]) < MIN_ABS_MS:
+            pass
+        elif w > threshold:
+            flag = "  ❌"
+            regressions.append(k)
+        elif w < -threshold:
+            flag = "  ✅"
+        print(f"{k:45} {baseline[k]:14.4g} {v:14.4g} {w * 100:+8.1f}%{flag}")
+    return regressions
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main() -> int:
+    from benchmarks.catalog import SIZES
+    ap = argparse.ArgumentParser(description="Benchmarks de búsqueda, orden, carga y parseo")
+    ap.add_argument("--sizes", default="10k,100k", help=f"tamaños separados por coma ({', '.join(SIZES)})")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--threshold", type=float, default=0.25, help="empeoramiento máximo tolerado (0.25 = 25%%)")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        # Proceso hijo: solo la última línea de stdout es el JSON
+        m = run_size(args.worker, SIZES[args.worker], args.seed)
+        print(json.dumps(m))
+        return 0
+
+    labels = [s.strip().lower() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in labels if s not in SIZES]
+    if unknown:
+        ap.error(f"tamaños desconocidos: {', '.join(unknown)}")
+
+    metrics: Dict[str, float] = {}
+    for label in labels:
+        t0 = time.perf_counter()
+        print(f"→ {label} ({SIZES[label]:,} productos)…", flush=True)
+        metrics.update(_spawn(label, SIZES[label], args.seed))
+        print(f"  {time.perf_counter() - t0:.1f}s")
+
+    result = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "metrics": metrics,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.write_text(json.dumps(result, indent=1), encoding="utf-8")
+    print(f"Resultados → {out.relative_to(ROOT)}")
+
+    regressions: List[str] = []
+    if args.baseline.exists():
+        base = json.loads(args.baseline.read_text(encoding="utf-8"))
+        print(f"Referencia: {args.baseline.name} ({base.get('git', '?')}, {base.get('created_at', '?')})")
+        regressions = compare(metrics, base["metrics"], args.threshold)
+    else:
+        print("Sin referencia; guarda una con --save-baseline")
+        compare(metrics, {}, args.threshold)
+
+    if args.save_baseline:
+        merged = dict(result)
+        if args.baseline.exists():
+            # conserva los tamaños que no se han medido ahora
+            old = json.loads(args.baseline.read_text(encoding="utf-8"))["metrics"]
+            merged["metrics"] = {**old, **metrics}
+        args.baseline.write_text(json.dumps(merged, indent=1), encoding="utf-8")
+        print(f"Referencia guardada → {args.baseline.relative_to(ROOT)}")
+        return 0
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regresiones > {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\n✅ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
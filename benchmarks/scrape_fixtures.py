@@ -0,0 +1,103 @@
+# benchmarks/scrape_fixtures.py – mide los scrapers (Chrome headless) contra benchmarks/fixture_server.py
+#
+#   python -m benchmarks.scrape_fixtures                          # las 3 tiendas
+#   python -m benchmarks.scrape_fixtures --stores bonpreu --latency-ms 80 --api-latency-ms 200
+#   python -m benchmarks.scrape_fixtures --mercadona-mode infinite
+#
+# Sin red ni webs reales: mismo catálogo en cada ejecución, así que los tiempos
+# de extracción/scroll/paginación se pueden comparar entre commits. Comprueba
+# además que cada scraper saca exactamente los productos servidos.
+# Resultados en benchmarks/results/scrape-<fecha>.json. Necesita Chrome.
+
+import argparse, json, os, sys, tempfile, time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+
+from benchmarks.fixture_server import FixtureServer
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _run_store(store: str, srv: FixtureServer) -> Dict:
+    if store == "Mercadona":
+        from scrapers.mercadona import scrape_mercadona
+        fn = lambda: scrape_mercadona(start_category_url=srv.url("/mercadona/categories/112"), headless=True)
+    elif store == "Consum":
+        from scrapers.consum import scrape_consum
+        fn = lambda: scrape_consum(headless=True, base=srv.url("/consum/es"), progress=None)
+    else:
+        from scrapers.bonpreu import scrape_bonpreu
+        fn = lambda: scrape_bonpreu(headless=True, root=srv.url("/bonpreu/categories?source=navigation"))
+    from scrapers import telemetry
+    r0 = srv.requests
+    t0 = time.perf_counter()
+    with telemetry.run(store) as run:   # el scraper la reutiliza: sus contadores quedan aquí
+        df = fn()
+    dt = time.perf_counter() - t0
+    expected = srv.expected.get(store, 0)
+    return {
+        "seconds": round(dt, 3),
+        "items": len(df),
+        "expected": expected,
+        "ok": len(df) == expected,
+        "items_per_s": round(len(df) / dt, 1) if dt else 0.0,
+        "http_requests": srv.requests - r0,
+        "categories_unchanged": run.counters.get("categories_unchanged", 0),   # debe ser 0
+        "scroll_stats": df.attrs.get("scroll_stats", []),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Scrapers contra el servidor de fixtures local")
+    ap.add_argument("--stores", default="mercadona,consum,bonpreu")
+    ap.add_argument("--products", type=int, default=1200)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--api-latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--mercadona-mode", choices=("all", "infinite"), default="all")
+    args = ap.parse_args()
+
+    names = {"mercadona": "Mercadona", "consum": "Consum", "bonpreu": "Bonpreu"}
+    stores = [names[s.strip().lower()] for s in args.stores.split(",") if s.strip().lower() in names]
+    if not stores:
+        ap.error("ninguna tienda válida en --stores")
+
+    # Los informes de telemetría van a un directorio temporal, no al histórico real
+    os.environ.setdefault("BARATAZO_RUNS_DIR", tempfile.mkdtemp(prefix="baratazo-fixture-runs-"))
+    # Huellas (scrapers/fingerprint.py) aparte y siempre pasada completa: ni se escriben junto a
+    # la DB real ni se reutilizan filas, que entonces no se mediría scroll ni extracción.
+    # Antes de importar los scrapers: FORCE_FULL se lee al importar fingerprint.
+    os.environ["BARATAZO_FP_DIR"] = tempfile.mkdtemp(prefix="baratazo-fixture-fp-")
+    os.environ["BARATAZO_FULL_REFRESH"] = "1"
+
+    srv = FixtureServer(products=args.products, seed=args.seed, latency_ms=args.latency_ms,
+                        api_latency_ms=args.api_latency_ms, jitter_ms=args.jitter_ms,
+                        mercadona_mode=args.mercadona_mode).start()
+    print(f"Fixtures en {srv.base_url} · esperados {srv.expected}")
+    results: Dict[str, Dict] = {}
+    try:
+        for store in stores:
+            print(f"→ {store}…", flush=True)
+            results[store] = res = _run_store(store, srv)
+            mark = "✅" if res["ok"] else "❌"
+            print(f"  {mark} {res['items']}/{res['expected']} en {res['seconds']:.1f}s "
+                  f"({res['items_per_s']:.0f}/s, {res['http_requests']} peticiones, "
+                  f"{res['categories_unchanged']} categorías reutilizadas)")
+    finally:
+        srv.stop()
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = RESULTS_DIR / f"scrape-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.write_text(json.dumps({
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "results": results,
+    }, indent=1, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados → {out}")
+    return 0 if all(r["ok"] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# pagina_web/alerts.py – avisos de bajada de precio evaluados solo sobre lo que cambió
+#
+# Vigilancias (tabla watch): un producto concreto (product_id) o una búsqueda guardada
+# (query [+ store]), sobre price_unit, price_kg o price_l y con umbral opcional (max_price).
+# Tras cada recarga de tienda el loader calcula su change set (price_changes(): productos
+# cuyo precio difiere de la carga anterior, nuevos incluidos) y llama a evaluate(), que
+#   - producto: busca las vigilancias de esos ids (índice sobre watch.product_id)
+#   - búsqueda: índice invertido token de búsqueda → vigilancias; cada producto cambiado
+#     busca los tokens de su título (y sus trozos, porque "semi" casa con "semidesnatada")
+#     y salta la vigilancia que los tenga todos (misma regla que matches_query)
+# y deja los avisos en alert_outbox en la misma transacción que la carga. Un notificador
+# los lee de ahí (GET /api/alerts, python -m pagina_web.alerts) y los marca entregados.
+# Coste ∝ filas cambiadas (+ leer las búsquedas vigiladas), nunca catálogo × vigilancias.
+#
+# Cuándo salta: el precio nuevo existe, no pasa del umbral y ha bajado respecto al anterior
+# (o el producto es nuevo y la vigilancia tiene umbral). Así cada bajada avisa una vez.
+
+import json
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from pydantic import BaseModel, Field, model_validator
+from sqlalchemy import text
+
+from .db import in_chunks
+from .utils import normalize, tokens
+
+METRICS = ("price_unit", "price_kg", "price_l")
+_MIN_SUBSTR = 4           # _token_match: los tokens de más de 3 letras casan como substring
+
+
+class WatchIn(BaseModel):
+    product_id: Optional[str] = None
+    query: Optional[str] = Field(default=None, max_length=120)
+    store: Optional[str] = None
+    metric: str = "price_unit"
+    max_price: Optional[float] = Field(default=None, gt=0)
+    owner: str = Field(default="", max_length=200)   # a quién avisar; lo interpreta el notificador
+
+    @model_validator(mode="after")
+    def _check(self):
+        if (self.product_id is None) == (self.query is None):
+            raise ValueError("indica product_id o query (solo uno)")
+        if self.query is not None and not tokens(self.query):
+            raise ValueError("la búsqueda no tiene palabras útiles")
+        if self.metric not in METRICS:
+            raise ValueError(f"metric debe ser una de {', '.join(METRICS)}")
+        return self
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# ---------- vigilancias ----------
+def add_watch(engine, body: WatchIn) -> Dict[str, Any]:
+    row = body.model_dump()
+    if row["query"] is not None:
+        row["query"] = normalize(row["query"])
+    with engine.begin() as conn:
+        row["id"] = conn.execute(text("""
+            INSERT INTO watch(product_id, query, store, metric, max_price, owner, created_at)
+            VALUES (:product_id, :query, :store, :metric, :max_price, :owner, :created_at)
+        """), {**row, "created_at": _now()}).lastrowid
+    return row
+
+
+def list_watches(engine, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+    sql = "SELECT id, product_id, query, store, metric, max_price, owner, created_at FROM watch"
+    with engine.connect() as conn:
+        if owner is None:
+            rows = conn.execute(text(sql + " ORDER BY id")).mappings()
+        else:
+            rows = conn.execute(text(sql + " WHERE owner = :o ORDER BY id"), {"o": owner}).mappings()
+        return [dict(r) for r in rows]
+
+
+def delete_watch(engine, watch_id: int) -> bool:
+    with engine.begin() as conn:
+        return conn.execute(text("DELETE FROM watch WHERE id = :id"), {"id": watch_id}).rowcount > 0
+
+
+# ---------- change set del loader ----------
+def price_changes(before, after) -> List[Dict[str, Any]]:
+    """Filas de `after` (DataFrame con id, title, store y METRICS) cuyo precio no es el de
+    `before` (id + METRICS de la carga anterior) o que no estaban; con old_<métrica>."""
+    old = before.set_index("id")[list(METRICS)].add_prefix("old_")
+    m = after[["id", "title", "store", *METRICS]].join(old, on="id")
+    changed = ~m["id"].isin(old.index)
+    for c in METRICS:
+        a, b = m[c], m["old_" + c]
+        changed |= ~((a == b) | (a.isna() & b.isna()))
+    m = m.loc[changed].astype(object)
+    return m.where(m.notna(), None).to_dict("records")
+
+
+# ---------- evaluación ----------
+class _SearchIndex:
+    """token de búsqueda → vigilancias que lo llevan. Una búsqueda casa con un título si
+    todos sus tokens aparecen (regla de matches_query: ≤3 letras exacto, si no substring)."""
+
+    def __init__(self, watches: Iterable[Dict[str, Any]]):
+        self.by_token: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for w in watches:
+            w["need"] = len(set(tokens(w["query"])))
+            for t in set(tokens(w["query"])):
+                self.by_token[t].append(w)
+
+    def matches(self, store: str, title: str) -> List[Dict[str, Any]]:
+        hit = set()
+        for t in set(tokens(title)):
+            if t in self.by_token:
+                hit.add(t)
+            for i in range(len(t) - _MIN_SUBSTR + 1):          # trozos: "semi" ⊂ "semidesnatada"
+                for j in range(i + _MIN_SUBSTR, len(t) + 1):
+                    if t[i:j] in self.by_token:
+                        hit.add(t[i:j])
+        count: Dict[int, int] = defaultdict(int)
+        out = []
+        for q in hit:
+            for w in self.by_token[q]:
+                count[w["id"]] += 1
+                if count[w["id"]] == w["need"] and (w["store"] is None or w["store"] == store):
+                    out.append(w)
+        return out
+
+
+def _fires(w: Dict[str, Any], ch: Dict[str, Any]) -> bool:
+    new, old = ch[w["metric"]], ch["old_" + w["metric"]]
+    limit = w["max_price"]
+    if new is None or (limit is not None and new > limit):
+        return False
+    if old is None:
+        return limit is not None
+    return new < old
+
+
+def evaluate(conn, changes: Sequence[Dict[str, Any]]) -> int:
+    """Evalúa las vigilancias sobre el change set de una carga y escribe los avisos en
+    alert_outbox (con la conexión/transacción del loader). Devuelve cuántos."""
+    if not changes:
+        return 0
+    cols = "id, product_id, query, store, metric, max_price, owner"
+    by_product: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for ph, params in in_chunks(c["id"] for c in changes):
+        for r in conn.execute(text(f"SELECT {cols} FROM watch WHERE product_id IN ({ph})"), params).mappings():
+            by_product[r["product_id"]].append(dict(r))
+    searches = _SearchIndex(dict(r) for r in conn.execute(
+        text(f"SELECT {cols} FROM watch WHERE query IS NOT NULL")).mappings())
+
+    now = _now()
+    out = []
+    for ch in changes:
+        for w in by_product.get(ch["id"], []) + searches.matches(ch["store"], ch["title"]):
+            if not _fires(w, ch):
+                continue
+            out.append({"w": w["id"], "o": w["owner"], "p": ch["id"], "t": ch["title"], "s": ch["store"],
+                        "m": w["metric"], "old": ch["old_" + w["metric"]], "new": ch[w["metric"]],
+                        "lim": w["max_price"], "at": now})
+    if out:
+        conn.execute(text("""
+            INSERT INTO alert_outbox(watch_id, owner, product_id, title, store, metric,
+                                     old_price, new_price, max_price, created_at)
+            VALUES (:w, :o, :p, :t, :s, :m, :old, :new, :lim, :at)
+        """), out)
+    return len(out)
+
+
+# ---------- bandeja de salida ----------
+def pending_alerts(conn, after: int = 0, limit: int = 100, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Avisos sin entregar con id > after, en orden (el notificador pagina con el último id)."""
+    sql = """
+        SELECT id, watch_id, owner, product_id, title, store, metric, old_price, new_price,
+               max_price, created_at
+          FROM alert_outbox WHERE delivered_at IS NULL AND id > :after
+    """
+    params: Dict[str, Any] = {"after": after, "limit": limit}
+    if owner is not None:
+        sql += " AND owner = :owner"
+        params["owner"] = owner
+    return [dict(r) for r in conn.execute(text(sql + " ORDER BY id LIMIT :limit"), params).mappings()]
+
+
+def ack_alerts(conn, ids: Sequence[int]) -> int:
+    n, now = 0, _now()
+    for ph, params in in_chunks(ids):
+        n += conn.execute(text(f"UPDATE alert_outbox SET delivered_at = :now WHERE delivered_at IS NULL AND id IN ({ph})"),
+                          {"now": now, **params}).rowcount
+    return n
+
+
+if __name__ == "__main__":
+    # Notificador mínimo: saca los avisos pendientes como JSON (uno por línea) y, con --ack,
+    # los marca entregados. Uso: python -m pagina_web.alerts [--owner X] [--ack]
+    import argparse
+    from .db import engine, init_db
+
+    ap = argparse.ArgumentParser(description="Avisos de bajada de precio pendientes")
+    ap.add_argument("--owner")
+    ap.add_argument("--limit", type=int, default=1000)
+    ap.add_argument("--ack", action="store_true", help="marca como entregados los que se imprimen")
+    args = ap.parse_args()
+    init_db()
+    with engine.begin() as conn:
+        rows = pending_alerts(conn, limit=args.limit, owner=args.owner)
+        for r in rows:
+            print(json.dumps(r, ensure_ascii=False))
+        if args.ack and rows:
+            ack_alerts(conn, [r["id"] for r in rows])
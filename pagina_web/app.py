@@ -1,18 +1,31 @@
 # pagina_web/app.py
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 from pathlib import Path
+import threading
 
-from fastapi import FastAPI, Request, Query
-from fastapi.responses import HTMLResponse
+import numpy as np
+
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 
-from .db import engine, init_db
-from .utils import matches_query
+from .db import engine, catalog_engine, init_db, get_generation, in_chunks
+from .search import SearchIndex
+from .popular import PopularCache, query_key
+from .snapshot import (PRICE_ORDERS as _PRICE_ORDERS, PRICE_COLS as _PRICE_COLS, ITEM_FIELDS as _ITEM_FIELDS,
+                       SnapshotHolder, price_key, snapshot_enabled)
+from .metrics import install as install_metrics, instrument_engine
+from .images import ImageCache, ImageError
+from .lists import (BatchRequest, ListIn, deltas, delete_list, fetch_products, list_exists, load_list,
+                    new_list_id, save_list)
+from .alerts import WatchIn, ack_alerts, add_watch, delete_watch, list_watches, pending_alerts
 
 
 app = FastAPI(title="Baratazo")
+install_metrics(app, engine)  # /metrics, Server-Timing y perfilador opt-in (antes de las rutas)
+catalog_engine.on_open(instrument_engine)  # también las réplicas del catálogo (BARATAZO_REPLICA=1)
 
 BASE_DIR = Path(__file__).resolve().parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
@@ -22,9 +35,15 @@ if static_dir.exists():
     app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
 
+# Modo instantánea (BARATAZO_SNAPSHOT=1|shared): /api/products y /api/stores salen de memoria
+_snapshots: Optional[SnapshotHolder] = SnapshotHolder(catalog_engine) if snapshot_enabled() else None
+
+
 @app.on_event("startup")
 def _startup() -> None:
     init_db()
+    if _snapshots is not None:
+        _snapshots.start()
 
 
 @app.get("/health")
@@ -34,26 +53,257 @@ def health() -> Dict[str, str]:
 
 # ========= Helpers DB =========
 
+# Lecturas del catálogo: réplica inmutable con BARATAZO_REPLICA=1 (pagina_web/replica.py)
 def _fetch_all(q: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
-    with engine.connect() as conn:
+    with catalog_engine.connect() as conn:
         rows = conn.execute(text(q), params).mappings().all()
         return [dict(r) for r in rows]
 
 def _fetch_one(q: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    with engine.connect() as conn:
+    with catalog_engine.connect() as conn:
         row = conn.execute(text(q), params).mappings().first()
         return dict(row) if row else None
 
+def _fetch_by_rowids(rowids: Sequence[int], columns: str) -> List[Dict[str, Any]]:
+    """Trae filas de product por ROWID (en trozos), conservando el orden de `rowids`."""
+    by_rowid: Dict[int, Dict[str, Any]] = {}
+    for ph, params in in_chunks(rowids, "r"):
+        qsql = f"SELECT {columns}, ROWID AS _rowid FROM product WHERE ROWID IN ({ph})"
+        for r in _fetch_all(qsql, params):
+            by_rowid[r["_rowid"]] = r
+    return [by_rowid[r] for r in rowids if r in by_rowid]
+
+
+# ========= Índice de búsqueda (en memoria) =========
+# Se reconstruye solo cuando cambia la generación del catálogo (la suben los loaders).
+# Junto al índice van los precios de cada doc (mismo orden) para ordenar sin ir a la DB.
+
+_search_lock = threading.Lock()
+_search_index: Optional[SearchIndex] = None
+_search_prices: Dict[str, np.ndarray] = {}
+_search_generation: Optional[int] = None
+
+def _get_catalog() -> Tuple[SearchIndex, Dict[str, np.ndarray], int]:
+    global _search_index, _search_prices, _search_generation
+    with catalog_engine.connect() as conn:
+        gen = get_generation(conn)
+    with _search_lock:
+        if _search_index is None or gen != _search_generation:
+            with catalog_engine.connect() as conn:
+                rows = conn.execute(text(
+                    f"SELECT ROWID, title, store, {', '.join(_PRICE_COLS)} FROM product ORDER BY ROWID"
+                )).all()
+            _search_index = SearchIndex((r[0], r[1], r[2]) for r in rows)
+            _search_prices = {   # None → NaN
+                c: np.array([r[3 + i] for r in rows], dtype=np.float64) for i, c in enumerate(_PRICE_COLS)
+            }
+            _search_generation = gen
+        return _search_index, _search_prices, _search_generation
+
+def _get_search_index() -> SearchIndex:
+    return _get_catalog()[0]
+
+
+_ITEM_COLS = ", ".join(_ITEM_FIELDS)
+
+def _order_rowids(index: SearchIndex, prices: Dict[str, np.ndarray], q: str, order: str,
+                  stores: Optional[Sequence[str]] = None) -> np.ndarray:
+    """ROWIDs de todos los resultados de `q` en `order` (empates → más reciente)."""
+    if order == "relevancia":
+        return np.asarray(index.search_ranked(q, stores), dtype=np.int64)
+    if order == "fuzzy":
+        return np.asarray(index.search_fuzzy(q, stores), dtype=np.int64)
+    docs = index.candidates(q, stores)
+    rowids = index.rowids_of(docs)
+    if order not in _PRICE_ORDERS:   # recientes
+        return rowids[np.argsort(-rowids, kind="stable")]
+    col, desc = _PRICE_ORDERS[order]
+    return rowids[np.lexsort((-rowids, price_key(prices[col][docs], desc)))]
+
+
+def _browse_by_price(clauses: List[str], params: Dict[str, Any], order: str, limit: int,
+                     offset: int = 0) -> List[Dict[str, Any]]:
+    """Sin q: recorre el índice de la columna de precio (ix_product_<col>) y rellena con los que no tienen."""
+    col, desc = _PRICE_ORDERS[order]
+    where = " AND ".join(clauses + [f"{col} > 0"])
+    items = _fetch_all(f"""
+        SELECT {_ITEM_COLS}, ROWID AS _rowid FROM product
+         WHERE {where}
+         ORDER BY {col} {"DESC" if desc else "ASC"}, ROWID DESC
+         LIMIT :limit OFFSET :offset
+    """, {**params, "limit": limit, "offset": offset})
+    if len(items) < limit:
+        # Página que llega a los sin precio: cuántos de ellos se saltan
+        skip = 0
+        if offset and not items:
+            row = _fetch_one(f"SELECT COUNT(*) AS n FROM product WHERE {where}", params)
+            skip = max(0, offset - row["n"])
+        where = " AND ".join(clauses + [f"({col} IS NULL OR {col} <= 0)"])
+        items += _fetch_all(f"""
+            SELECT {_ITEM_COLS}, ROWID AS _rowid FROM product
+             WHERE {where} ORDER BY ROWID DESC LIMIT :limit OFFSET :offset
+        """, {**params, "limit": limit - len(items), "offset": skip})
+    return items
+
+
+# ========= Búsquedas populares (resultados precalculados) =========
+
+def _popular_snapshot():
+    index, prices, gen = _get_catalog()
+    return gen, lambda q, order: _order_rowids(index, prices, q, order)
+
+_popular = PopularCache(engine, _popular_snapshot)
+
+def _query_rowids(q: str, order: str, stores: Sequence[str], limit: int) -> List[int]:
+    """Primeros `limit` ROWIDs de `q` en `order`: de la caché si es popular, si no se calculan."""
+    index, prices, gen = _get_catalog()
+    key = query_key(q)
+    _popular.record(key)
+    _popular.maybe_refresh(gen)
+    rowids = _popular.get(key, order, gen) if key else None
+    if rowids is None:
+        rowids = _order_rowids(index, prices, q, order, stores)
+    elif stores:
+        rowids = rowids[index.in_stores(rowids, stores)]
+    return rowids[:limit].tolist()
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    try:
+        _popular.flush()
+    except Exception:
+        pass
+
 
 # ========= API auxiliar =========
 
 @app.get("/api/stores")
 def api_stores() -> List[str]:
+    if _snapshots is not None:
+        return [st for st in _snapshots.get().store_names if st]
     qsql = "SELECT DISTINCT store FROM product ORDER BY store"
     rows = _fetch_all(qsql, {})
     return [r["store"] for r in rows]
 
 
+@app.get("/api/popular")
+def api_popular() -> Dict[str, Any]:
+    # Búsquedas más frecuentes y estado de la caché de resultados
+    return _popular.stats()
+
+
+@app.get("/api/snapshot")
+def api_snapshot() -> Dict[str, Any]:
+    # Estado y memoria del catálogo en columnas (solo con BARATAZO_SNAPSHOT=1|shared)
+    if _snapshots is None:
+        return {"enabled": False}
+    return {"enabled": True, **_snapshots.stats()}
+
+
+# ========= Lista de la compra (precios actuales en lote, listas guardadas) =========
+
+@app.post("/api/products/batch")
+def api_products_batch(body: BatchRequest) -> Dict[str, Any]:
+    # Precios actuales de muchos ids en una petición; con `prices` (los guardados) añade deltas
+    with catalog_engine.connect() as conn:
+        current = fetch_products(conn, body.ids)
+    return deltas(body.ids, current, body.prices or {})
+
+
+@app.post("/api/lists", status_code=201)
+def api_list_create(body: ListIn) -> Dict[str, Any]:
+    list_id = new_list_id()
+    save_list(engine, list_id, body)
+    return load_list(engine, list_id, catalog_engine)
+
+
+@app.get("/api/lists/{list_id}")
+def api_list_get(list_id: str) -> Dict[str, Any]:
+    lst = load_list(engine, list_id, catalog_engine)
+    if lst is None:
+        raise HTTPException(status_code=404, detail="lista no encontrada")
+    return lst
+
+
+@app.put("/api/lists/{list_id}")
+def api_list_put(list_id: str, body: ListIn) -> Dict[str, Any]:
+    if not list_exists(engine, list_id):
+        raise HTTPException(status_code=404, detail="lista no encontrada")
+    save_list(engine, list_id, body)
+    return load_list(engine, list_id, catalog_engine)
+
+
+@app.delete("/api/lists/{list_id}", status_code=204)
+def api_list_delete(list_id: str) -> Response:
+    if not delete_list(engine, list_id):
+        raise HTTPException(status_code=404, detail="lista no encontrada")
+    return Response(status_code=204)
+
+
+# ========= Vigilancias de precio y avisos (los evalúa el loader) =========
+
+@app.post("/api/watches", status_code=201)
+def api_watch_create(body: WatchIn) -> Dict[str, Any]:
+    return add_watch(engine, body)
+
+
+@app.get("/api/watches")
+def api_watches(owner: Optional[str] = None) -> List[Dict[str, Any]]:
+    return list_watches(engine, owner)
+
+
+@app.delete("/api/watches/{watch_id}", status_code=204)
+def api_watch_delete(watch_id: int) -> Response:
+    if not delete_watch(engine, watch_id):
+        raise HTTPException(status_code=404, detail="vigilancia no encontrada")
+    return Response(status_code=204)
+
+
+@app.get("/api/alerts")
+def api_alerts(after: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+               owner: Optional[str] = None) -> List[Dict[str, Any]]:
+    # Bandeja de salida para un notificador: pendientes con id > after, en orden
+    with engine.connect() as conn:
+        return pending_alerts(conn, after, limit, owner)
+
+
+@app.post("/api/alerts/ack")
+def api_alerts_ack(ids: List[int]) -> Dict[str, int]:
+    with engine.begin() as conn:
+        return {"delivered": ack_alerts(conn, ids)}
+
+
+# ========= Imágenes (caché local + miniaturas) =========
+
+_images = ImageCache()
+# Un mismo id puede cambiar de foto tras una recarga: caché larga pero revalidable (ETag)
+_IMG_CACHE_CONTROL = "public, max-age=604800, stale-while-revalidate=86400"
+
+
+@app.get("/img/{product_id}")
+def img(request: Request, product_id: str, w: int = Query(default=0, ge=0, le=2000)) -> Response:
+    row = _fetch_one("SELECT image FROM product WHERE id = :id", {"id": product_id})
+    url = (row or {}).get("image")
+    if not url:
+        return Response(status_code=404, headers={"Cache-Control": "public, max-age=3600"})
+    try:
+        data, ctype, etag = _images.get(url, w)
+    except ImageError:
+        # Sin copia local (CDN caída, URL rota…): que el navegador lo intente directamente
+        return RedirectResponse(url, status_code=302, headers={"Cache-Control": "no-store"})
+    headers = {"Cache-Control": _IMG_CACHE_CONTROL, "ETag": etag}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=ctype, headers=headers)
+
+
+@app.get("/api/images")
+def api_images() -> Dict[str, Any]:
+    # Estado de la caché de imágenes (aciertos, bytes en disco, expulsiones)
+    return _images.stats()
+
+
 # ========= HTML =========
 
 @app.get("/", response_class=HTMLResponse)
@@ -68,7 +318,7 @@ def index(request: Request, q: Optional[str] = None) -> HTMLResponse:
 @app.get("/product/{product_id}", response_class=HTMLResponse)
 def detail(request: Request, product_id: str) -> HTMLResponse:
     qsql = """
-        SELECT id, title, price_unit, price_kg, image, store, product_url
+        SELECT id, title, price_unit, price_kg, price_l, price_unit_count, image, store, product_url
         FROM product
         WHERE id = :id
     """
@@ -82,13 +332,40 @@ def detail(request: Request, product_id: str) -> HTMLResponse:
 
 # ========= API JSON =========
 
+def _parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """`fields=id,title,price_unit` → claves pedidas (en ese orden); vacío = todas."""
+    if not fields:
+        return _ITEM_FIELDS
+    out = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in out if f not in _ITEM_FIELDS]
+    if unknown or not out:
+        raise HTTPException(status_code=400, detail=f"fields desconocidos: {', '.join(unknown)}; "
+                                                    f"válidos: {', '.join(_ITEM_FIELDS)}")
+    return out
+
+
+def _shape(items: List[Dict[str, Any]], fields: Tuple[str, ...], compact: bool) -> Any:
+    # compacto: {"fields": [...], "rows": [[...], ...]} (las claves no se repiten en cada fila)
+    if compact:
+        return {"fields": list(fields), "rows": [[it[f] for f in fields] for it in items]}
+    if fields == _ITEM_FIELDS:
+        return items
+    return [{f: it[f] for f in fields} for it in items]
+
+
 @app.get("/api/products")
 def api_products(
     q: Optional[str] = None,
     store: Optional[str] = None,  # ahora puede venir "Mercadona,Bonpreu,Consum"
-    sort: Optional[str] = Query(default="recientes"),  # recientes | unit_asc | unit_desc | kg_asc | kg_desc
+    sort: Optional[str] = Query(default="recientes"),  # recientes | relevancia | unit_asc | unit_desc | kg_asc | kg_desc | l_asc | count_asc
     limit: int = Query(default=400, ge=1, le=2000),
-) -> List[Dict[str, Any]]:
+    offset: int = Query(default=0, ge=0, le=100_000),  # paginación: se salta los `offset` primeros
+    fuzzy: bool = Query(default=False),  # tolera erratas y sinónimos es/ca
+    fields: Optional[str] = None,  # "id,title,price_unit,store": solo esas claves
+    fmt: str = Query(default="objects", alias="format", pattern="^(objects|compact)$"),
+) -> Any:
+    cols = _parse_fields(fields)
+    compact = fmt == "compact"
     params: Dict[str, Any] = {}
     clauses: List[str] = []
 
@@ -107,54 +384,57 @@ def api_products(
         for i, s in enumerate(stores_list):
             params[f"s{i}"] = s
 
-    where_sql = (" WHERE " + " AND ".join(clauses)) if clauses else ""
-
-    # Base query (usamos ROWID para “recientes” en SQLite)
-    qsql = f"""
-        SELECT 
-          id, title, price_unit, price_kg, image, store, ROWID AS _rowid
-        FROM product
-        {where_sql}
-        ORDER BY ROWID DESC
-        LIMIT :limit
-    """
-    params["limit"] = limit
-    items = _fetch_all(qsql, params)
-
-    # --- Filtro por texto (mín. 2 letras) ---
-    if q and len(q.strip()) >= 2:
-        items = [it for it in items if matches_query(it["title"], q)]
-
-    # Helpers de precio
-    def _as_float(value: Any, default: float) -> float:
-        if value is None:
-            return default
-        try:
-            return float(value)
-        except Exception:
-            return default
-
-    def _price_for(it: Dict[str, Any], primary: str, secondary: str, default: float) -> float:
-        v = it.get(primary)
-        if v is None or v == 0:
-            v = it.get(secondary)
-        return _as_float(v, default)
-
-    # --- Ordenación en memoria (ya traemos pocos gracias a LIMIT) ---
     s = (sort or "recientes").lower()
-    if s == "unit_asc":
-        items.sort(key=lambda it: _price_for(it, "price_unit", "price_kg", 1e12))
-    elif s == "unit_desc":
-        items.sort(key=lambda it: _price_for(it, "price_unit", "price_kg", -1.0), reverse=True)
-    elif s == "kg_asc":
-        items.sort(key=lambda it: _price_for(it, "price_kg", "price_unit", 1e12))
-    elif s == "kg_desc":
-        items.sort(key=lambda it: _price_for(it, "price_kg", "price_unit", -1.0), reverse=True)
-    else:  # recientes
-        items.sort(key=lambda it: it.get("_rowid", 0), reverse=True)
+    if _snapshots is not None:
+        snap = _snapshots.get()
+        docs = snap.select(q, stores_list, s, fuzzy, limit, offset)
+        if compact:
+            return {"fields": list(cols), "rows": snap.rows(docs, cols)}
+        return snap.items(docs, cols)
+
+    where_sql = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    has_q = bool(q and len(q.strip()) >= 2)
+    ranked = has_q and (fuzzy or s == "relevancia")
+
+    if ranked:
+        # --- Candidatos y ranking salen del índice en memoria ---
+        rowids = _query_rowids(q, "fuzzy" if fuzzy else "relevancia", stores_list, offset + limit)[offset:]
+        items = _fetch_by_rowids(rowids, _ITEM_COLS)
+    elif has_q:
+        # --- Todos los que casan con q (mín. 2 letras), ya ordenados ---
+        rowids = _query_rowids(q, s if s in _PRICE_ORDERS else "recientes", stores_list, offset + limit)[offset:]
+        items = _fetch_by_rowids(rowids, _ITEM_COLS)
+    elif s in _PRICE_ORDERS:
+        # --- Sin q: orden por precio en SQL, sobre todo el catálogo ---
+        items = _browse_by_price(clauses, params, s, limit, offset)
+    else:
+        # Base query (usamos ROWID para “recientes” en SQLite)
+        qsql = f"""
+            SELECT 
+              {_ITEM_COLS}, ROWID AS _rowid
+            FROM product
+            {where_sql}
+            ORDER BY ROWID DESC
+            LIMIT :limit OFFSET :offset
+        """
+        params["limit"] = limit
+        params["offset"] = offset
+        items = _fetch_all(qsql, params)
+
+    # --- Ordenación en memoria: solo la relevancia/difuso + precio (la página, por relevancia) ---
+    if ranked and s in _PRICE_ORDERS:
+        col, desc = _PRICE_ORDERS[s]
+
+        def _key(it: Dict[str, Any]) -> Tuple[bool, float]:
+            v = it.get(col)
+            if v is None or v <= 0:
+                return (True, 0.0)
+            return (False, -v if desc else v)
+
+        items.sort(key=_key)
 
     # Limpia la clave interna
     for it in items:
         it.pop("_rowid", None)
 
-    return items
+    return _shape(items, cols, compact)
@@ -19,11 +19,192 @@ def _set_sqlite_pragma(dbapi_conn, conn_record):
 
 event.listen(engine, "connect", _set_sqlite_pragma)  # <-- en vez de engine.sync_engine
 
+# Columnas añadidas a product después de crear la tabla (create_all no altera tablas existentes)
+_PRODUCT_COLUMNS = {
+    "price_l": "FLOAT", "price_unit_count": "FLOAT",
+    "total_g": "FLOAT", "total_ml": "FLOAT", "total_units": "FLOAT",
+}
+_PRODUCT_INDEXED = ("price_unit", "price_kg", "price_l", "price_unit_count")
+
 def init_db():
-    from .models import Product, Category, ProductCategory
+    from .models import (Product, Category, ProductCategory, CatalogMeta, ScrapeRun, QueryStat,
+                         ShoppingList, ShoppingListItem, Watch, AlertOutbox)
     SQLModel.metadata.create_all(engine)
     # (opcional) Refuerza índices/uniques
     with engine.begin() as conn:
-        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_product_store_title ON product(store, title);"))
-        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_category_sub ON category(category, subcategory);"))
-        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_product_category_pk ON product_category(product_id, category_id);"))
+        have = {r[1] for r in conn.execute(text("PRAGMA table_info(product)"))}
+        for col, typ in _PRODUCT_COLUMNS.items():
+            if col not in have:
+                conn.execute(text(f"ALTER TABLE product ADD COLUMN {col} {typ}"))
+        for col in _PRODUCT_INDEXED:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_product_{col} ON product({col});"))
+        # Solo en tablas antiguas sin la UNIQUE en el CREATE TABLE (si no, índice repetido)
+        if not _has_unique(conn, "product", ("store", "title")):
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_product_store_title ON product(store, title);"))
+        if not _has_unique(conn, "category", ("category", "subcategory")):
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_category_sub ON category(category, subcategory);"))
+        conn.execute(text("INSERT OR IGNORE INTO catalog_meta(key, value) VALUES ('generation', 0);"))
+    if "product_id" in _columns("product_category"):
+        _migrate_integer_keys(Product, Category, ProductCategory)
+    _backfill_measures()
+    # DB sin estadísticas todavía (nunca cargada con este código): que no espere a la próxima carga
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first() is None:
+            analyze(conn)
+
+
+_BACKFILL_VERSION = 2     # 1: conservaba el €/L antiguo en price_kg de los líquidos
+
+def _backfill_measures() -> None:
+    """Una vez por DB: €/kg, €/L, €/ud y totales de las filas cargadas antes de existir esas columnas.
+
+    Se sacan del título (lleva el formato: "Leche entera 6 x 1 L") como en enrich_prices(), sin la
+    etiqueta de la web, que no se guardó. El price_kg antiguo era esa etiqueta fuera cual fuera su
+    medida (€/L, €/ud…) o el precio por unidad: solo se conserva si el título no da ni peso, ni
+    volumen, ni unidades y no es el precio. Si no, NULL, como una recarga con enrich_prices().
+    """
+    with engine.begin() as conn:
+        done = conn.execute(text("SELECT value FROM catalog_meta WHERE key = 'measures_backfill'")).first()
+        if done and int(done[0]) >= _BACKFILL_VERSION:
+            return
+        if done:
+            # versión 1 ya pasada: quita el €/L (o €/ud) que dejó en price_kg
+            n = conn.execute(text("""
+                UPDATE product SET price_kg = NULL
+                 WHERE total_g IS NULL AND price_kg IS NOT NULL
+                   AND (total_ml IS NOT NULL OR (total_units IS NOT NULL AND price_kg = price_unit_count))
+            """)).rowcount
+            if n:
+                bump_generation(conn)
+                print(f"📏 price_kg corregido en {n} productos (era €/L o €/ud)")
+            conn.execute(text("UPDATE catalog_meta SET value = :v WHERE key = 'measures_backfill'"),
+                         {"v": _BACKFILL_VERSION})
+            return
+        rows = conn.execute(text("""
+            SELECT ROWID, title, price_unit, price_kg FROM product
+             WHERE total_g IS NULL AND total_ml IS NULL AND total_units IS NULL
+               AND price_l IS NULL AND price_unit_count IS NULL
+        """)).all()
+        if rows:
+            import pandas as pd
+            from .units import parse_totals_batch
+            df = pd.DataFrame(rows, columns=["rowid", "title", "price", "old_kg"])
+            tot = parse_totals_batch(df["title"].fillna("").astype(str).str.strip())
+            g, ml, units = tot["g"], tot["ml"], tot["units"]
+            price, old_kg = pd.to_numeric(df["price"]), pd.to_numeric(df["old_kg"])
+            out = pd.DataFrame({
+                "r": df["rowid"],
+                "kg": (price * 1000.0 / g).where(g > 0).fillna(
+                    old_kg.where((old_kg != price) & ~(ml > 0) & ~(units > 0))),
+                "l": (price * 1000.0 / ml).where(ml > 0),
+                "n": (price / units).where(units > 0),
+                "g": g.where(g > 0), "ml": ml.where(ml > 0), "u": units.where(units > 0),
+            })
+            for c in ("kg", "l", "n"):
+                out[c] = pd.to_numeric(out[c], errors="coerce").round(4)
+            conn.execute(text("""
+                UPDATE product SET price_kg = :kg, price_l = :l, price_unit_count = :n,
+                       total_g = :g, total_ml = :ml, total_units = :u WHERE ROWID = :r
+            """), out.astype(object).where(out.notna(), None).to_dict("records"))
+            bump_generation(conn)   # la web rehace sus índices en memoria
+            print(f"📏 Medidas recalculadas desde el título en {len(out)} productos antiguos")
+        conn.execute(text("INSERT INTO catalog_meta(key, value) VALUES ('measures_backfill', :v)"),
+                     {"v": _BACKFILL_VERSION})
+
+
+def _columns(table: str) -> list:
+    with engine.connect() as conn:
+        return [r[1] for r in conn.execute(text(f"PRAGMA table_info({table})"))]
+
+def _has_unique(conn, table: str, cols) -> bool:
+    for idx in conn.execute(text(f"PRAGMA index_list({table})")).mappings().all():
+        if idx["unique"] and tuple(r[2] for r in conn.execute(text(f"PRAGMA index_info('{idx['name']}')"))) == tuple(cols):
+            return True
+    return False
+
+def _migrate_integer_keys(Product, Category, ProductCategory) -> None:
+    """Paso único: ids TEXT como PK → pk INTEGER + id UNIQUE, enlaces por enteros.
+
+    Se conserva el ROWID de product (y de category) como pk: el orden de "recientes",
+    la instantánea y el índice de búsqueda no cambian. Los uuids siguen siendo los mismos.
+    """
+    old = {"product": "_old_product", "category": "_old_category", "product_category": "_old_product_category"}
+    # AUTOCOMMIT + BEGIN/COMMIT a mano: pysqlite no abre transacción antes de un DDL y
+    # foreign_keys no se puede cambiar dentro de una; así todo el paso es atómico
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.exec_driver_sql("BEGIN")
+        try:
+            for table, tmp in old.items():
+                # los índices con nombre se van con la tabla vieja y chocarían con los nuevos
+                for (name,) in conn.execute(text(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL"),
+                        {"t": table}).all():
+                    conn.execute(text(f'DROP INDEX "{name}"'))
+                conn.execute(text(f"ALTER TABLE {table} RENAME TO {tmp}"))
+            SQLModel.metadata.create_all(conn, tables=[Product.__table__, Category.__table__, ProductCategory.__table__])
+            have = {r[1] for r in conn.execute(text("PRAGMA table_info(_old_product)"))}
+            cols = ", ".join(c.name for c in Product.__table__.columns if c.name in have)
+            conn.execute(text(f"INSERT INTO product(pk, {cols}) SELECT ROWID, {cols} FROM _old_product ORDER BY ROWID"))
+            conn.execute(text("""
+                INSERT INTO category(pk, id, category, subcategory)
+                SELECT ROWID, id, category, subcategory FROM _old_category ORDER BY ROWID
+            """))
+            conn.execute(text("""
+                INSERT OR IGNORE INTO product_category(product_pk, category_pk)
+                SELECT p.pk, c.pk FROM _old_product_category o
+                  JOIN product p ON p.id = o.product_id
+                  JOIN category c ON c.id = o.category_id
+            """))
+            for tmp in reversed(list(old.values())):
+                conn.execute(text(f"DROP TABLE {tmp}"))
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        finally:
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+    print("🔑 DB migrada a claves enteras (product.pk, category.pk); VACUUM recupera el espacio")
+
+
+# --- Generación del catálogo ---
+# Los loaders la incrementan en la misma transacción en la que recargan una tienda;
+# la web la consulta (lookup por PK) para saber cuándo reconstruir sus índices en memoria.
+def get_generation(conn) -> int:
+    row = conn.execute(text("SELECT value FROM catalog_meta WHERE key = 'generation'")).first()
+    return int(row[0]) if row else 0
+
+def bump_generation(conn) -> None:
+    conn.execute(text("""
+        INSERT INTO catalog_meta(key, value) VALUES ('generation', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    """))
+
+
+# --- IN (...) con muchos valores ---
+# SQLite limita el nº de variables por sentencia (999 en builds antiguos): en trozos de SQL_CHUNK.
+SQL_CHUNK = 500
+
+def in_chunks(values, prefix: str = "p"):
+    """Por cada trozo de `values`: (":p0, :p1, …", {"p0": v0, "p1": v1, …}) para un IN (...)."""
+    values = list(values)
+    for i in range(0, len(values), SQL_CHUNK):
+        chunk = values[i:i + SQL_CHUNK]
+        yield (", ".join(f":{prefix}{j}" for j in range(len(chunk))),
+               {f"{prefix}{j}": v for j, v in enumerate(chunk)})
+
+
+# --- Estadísticas del planificador (sqlite_stat1) ---
+# El loader las rehace tras cada recarga. ANALYZE entero: con muestreo (analysis_limit) la
+# selectividad de store sale muy mal y /api/products?store=…&sort=unit_asc recorre la tienda
+# por ix_product_store en vez de ir por el índice de precio (python -m pagina_web.planner).
+def analyze(conn) -> None:
+    conn.exec_driver_sql("ANALYZE")
+    conn.exec_driver_sql("PRAGMA optimize")
+
+
+# --- Lecturas del catálogo en la web ---
+# Con BARATAZO_REPLICA=1 van a una copia inmutable por generación (pagina_web/replica.py);
+# si no, es la misma `engine`. Escrituras (listas, vigilancias, contadores) siempre a `engine`.
+from .replica import CatalogEngine  # noqa: E402  (replica.py importa db.py de forma perezosa)
+catalog_engine = CatalogEngine(engine)
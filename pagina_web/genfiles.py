@@ -0,0 +1,85 @@
+# pagina_web/genfiles.py – ficheros publicados por generación del catálogo
+#
+# La instantánea compartida (snapshot.py, .bin) y la réplica de solo lectura (replica.py, .db)
+# siguen el mismo esquema: <dir>/catalog-g<generación><ext>, escrito una vez y que ya no cambia.
+#   - publish(): deja el fichero de la generación vigente (si ya está, nada) y borra los viejos
+#     (se conservan KEEP_FILES)
+#   - publish_once(): lo mismo desde la web; si falta, lo construye el primer proceso que lo
+#     necesita (fichero .lock) y el resto sigue con el anterior hasta que aparezca
+#   - publish_after_load(): para el loader, tras una recarga; si falla, ya lo hará la web
+
+import os, re, time
+from pathlib import Path
+from typing import Callable, Optional
+
+LOCK_STALE_S = 600.0      # un .lock más viejo que esto es de un proceso muerto
+KEEP_FILES = 2            # generaciones que se conservan en disco (la vigente y la anterior)
+
+
+def gen_path(directory: Path, generation: int, ext: str) -> Path:
+    return directory / f"catalog-g{generation}{ext}"
+
+
+def generation_of(path: Path) -> int:
+    return int(path.stem.split("-g")[-1])
+
+
+def publish(directory: Path, generation: int, ext: str, build: Callable[[Path], Path]) -> Path:
+    """Fichero de `generation` en `directory`; si falta, build(directory) lo escribe y devuelve
+    su ruta (su generación es la de lo que leyó, por si otra recarga se coló entre medias)."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = gen_path(directory, generation, ext)
+    if not path.exists():
+        path = build(directory)
+    prune(directory, ext, generation_of(path))
+    return path
+
+
+def publish_once(path: Path, publish: Callable[[], Path]) -> Optional[Path]:
+    """`path` si existe; si no, publish() bajo <path>.lock. None si otro proceso lo tiene."""
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = path.with_suffix(".lock")
+    if not try_lock(lock):
+        return None
+    try:
+        return publish()
+    finally:
+        try:
+            lock.unlink()
+        except OSError:
+            pass
+
+
+def prune(directory: Path, ext: str, generation: int) -> None:
+    for p in directory.glob(f"catalog-g*{ext}"):
+        m = re.fullmatch(rf"catalog-g(\d+){re.escape(ext)}", p.name)
+        if m and int(m.group(1)) <= generation - KEEP_FILES:
+            try:
+                p.unlink()   # quien aún lo tenga abierto/mapeado sigue leyéndolo (en Windows puede fallar)
+            except OSError:
+                pass
+
+
+def try_lock(lock: Path) -> bool:
+    try:
+        if time.time() - lock.stat().st_mtime > LOCK_STALE_S:
+            lock.unlink()
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def publish_after_load(publish: Callable[[], Path], what: str, icon: str) -> None:
+    """publish() con aviso; un fallo no tumba la carga (la web lo construirá ella misma)."""
+    try:
+        t0 = time.perf_counter()
+        p = publish()
+        print(f"{icon} {what[0].upper()}{what[1:]} publicada → {p} ({time.perf_counter() - t0:.1f}s)")
+    except Exception as e:
+        print(f"⚠️ No se pudo publicar la {what}: {e}")
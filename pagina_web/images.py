@@ -0,0 +1,307 @@
+# pagina_web/images.py – caché local de imágenes de producto y miniaturas (/img/{product_id})
+#
+# Las plantillas ya no enlazan las CDN de las tiendas: piden /img/<id>?w=160 y la web
+# sirve la imagen desde disco.
+#   <dir>/objects/ab/<sha256>       original, direccionado por contenido (misma foto en
+#                                   varias URLs → un solo fichero)
+#   <dir>/thumbs/ab/<sha256>-<w>.jpg miniatura de ancho w (solo con Pillow; sin él se sirve
+#                                   el original y el navegador la escala)
+#   <dir>/urls/cd/<sha1(url)>       "sha256 content-type": qué contenido tiene cada URL
+# <dir> = BARATAZO_IMG_DIR, o db/img junto a la base.
+#
+# Tamaño máximo BARATAZO_IMG_MAX_MB (512): al pasarse se borran los ficheros usados hace
+# más tiempo (LRU por mtime, que se toca en cada acierto) hasta quedar en el 90 %.
+# Descargas y miniaturas van en un pool de hilos (BARATAZO_IMG_WORKERS); dos peticiones
+# de la misma URL comparten descarga. Una URL que falla no se reintenta en FAIL_TTL_S.
+#
+#   python -m pagina_web.images [--store Mercadona] [--width 160]   # precarga el catálogo
+#
+# El loader precarga en segundo plano las imágenes de la tienda recién cargada si
+# BARATAZO_IMG_PREFETCH=1 (prefetch_in_background).
+
+import hashlib, os, threading, time, urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:  # opcional: sin Pillow no hay miniaturas
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None
+
+MAX_BYTES = int(float(os.getenv("BARATAZO_IMG_MAX_MB", "512")) * 1024 * 1024)
+WORKERS = int(os.getenv("BARATAZO_IMG_WORKERS", "4"))
+WIDTHS = (160, 320, 640)          # anchos de miniatura que se generan (se redondea hacia arriba)
+FETCH_TIMEOUT_S = 10.0
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+FAIL_TTL_S = 600.0
+USER_AGENT = "Mozilla/5.0 (Baratazo image cache)"
+
+
+def images_dir() -> Path:
+    env = os.getenv("BARATAZO_IMG_DIR")
+    if env:
+        return Path(env)
+    from .db import db_path
+    return db_path.parent / "img"
+
+
+def prefetch_enabled() -> bool:
+    return os.getenv("BARATAZO_IMG_PREFETCH", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def thumb_width(w: int) -> int:
+    """Ancho de miniatura para una petición de `w` px (0 = original)."""
+    if w <= 0 or Image is None:
+        return 0
+    return next((x for x in WIDTHS if x >= w), 0)
+
+
+class ImageError(Exception):
+    pass
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class ImageCache:
+    def __init__(self, directory: Optional[Path] = None, max_bytes: int = MAX_BYTES, workers: int = WORKERS):
+        self.dir = directory or images_dir()
+        self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="img")
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        self._failed: Dict[str, float] = {}
+        self._size: Optional[int] = None      # bytes en disco (se calcula al primer uso)
+        self.hits = 0
+        self.misses = 0
+        self.fetched_bytes = 0
+        self.evicted = 0
+
+    # ---------- rutas ----------
+    def _url_ref(self, url: str) -> Path:
+        h = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.dir / "urls" / h[:2] / h
+
+    def _object(self, digest: str) -> Path:
+        return self.dir / "objects" / digest[:2] / digest
+
+    def _thumb(self, digest: str, w: int) -> Path:
+        return self.dir / "thumbs" / digest[:2] / f"{digest}-{w}.jpg"
+
+    # ---------- servir ----------
+    def get(self, url: str, w: int = 0, timeout: float = FETCH_TIMEOUT_S + 5) -> Tuple[bytes, str, str]:
+        """(bytes, content-type, etag) de la imagen de `url` a ancho `w`. ImageError si no se puede.
+
+        Devuelve el contenido y no la ruta: la expulsión LRU puede borrar el fichero en
+        cualquier momento (son como mucho unos cientos de KB)."""
+        tw = thumb_width(w)
+        hit = self._lookup(url, tw)
+        if hit is not None:
+            with self._lock:
+                self.hits += 1
+            return hit
+        with self._lock:
+            self.misses += 1
+        try:
+            return self.submit(url, tw).result(timeout=timeout)
+        except FutureTimeout:
+            raise ImageError(f"descarga demasiado lenta: {url}") from None
+
+    def submit(self, url: str, tw: int = 0) -> Future:
+        """Descarga/miniatura en el pool; las peticiones repetidas comparten el mismo Future."""
+        key = (url, tw)
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = self._inflight[key] = self._pool.submit(self._ensure, url, tw)
+                fut.add_done_callback(lambda _f, k=key: self._done(k))
+        return fut
+
+    def _done(self, key: Tuple[str, int]) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _lookup(self, url: str, tw: int) -> Optional[Tuple[bytes, str, str]]:
+        try:
+            digest, ctype = self._url_ref(url).read_text().split(" ", 1)
+            path = self._thumb(digest, tw) if tw else self._object(digest)
+            data = path.read_bytes()
+            os.utime(path)          # LRU: marca el acceso
+        except (OSError, ValueError):
+            return None
+        return data, ("image/jpeg" if tw else ctype), f'"{digest[:16]}-{tw}"'
+
+    def _ensure(self, url: str, tw: int) -> Tuple[bytes, str, str]:
+        hit = self._lookup(url, tw)
+        if hit is not None:
+            return hit
+        ref = self._url_ref(url)
+        try:
+            digest, ctype = ref.read_text().split(" ", 1)
+            data = self._object(digest).read_bytes()
+        except (OSError, ValueError):
+            data, ctype = self._fetch(url)
+            digest = hashlib.sha256(data).hexdigest()
+            obj = self._object(digest)
+            if not obj.exists():
+                _write_atomic(obj, data)
+                self._grow(len(data))
+            _write_atomic(ref, f"{digest} {ctype}".encode("utf-8"))
+        if not tw:
+            return data, ctype, f'"{digest[:16]}-0"'
+        try:
+            thumb = self._make_thumb(data, tw)
+        except Exception:   # formato que Pillow no abre (svg, avif…): se sirve el original
+            return data, ctype, f'"{digest[:16]}-0"'
+        _write_atomic(self._thumb(digest, tw), thumb)
+        self._grow(len(thumb))
+        return thumb, "image/jpeg", f'"{digest[:16]}-{tw}"'
+
+    def _fetch(self, url: str) -> Tuple[bytes, str]:
+        failed_at = self._failed.get(url)
+        if failed_at is not None and time.monotonic() - failed_at < FAIL_TTL_S:
+            raise ImageError(f"descarga fallida hace poco: {url}")
+        try:
+            if not url.startswith(("http://", "https://")):
+                raise ImageError(f"URL no soportada: {url}")
+            req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+            with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT_S) as resp:
+                ctype = resp.headers.get_content_type()
+                data = resp.read(MAX_IMAGE_BYTES + 1)
+            if not ctype.startswith("image/"):
+                raise ImageError(f"{url} no es una imagen ({ctype})")
+            if len(data) > MAX_IMAGE_BYTES:
+                raise ImageError(f"{url} pasa de {MAX_IMAGE_BYTES // 1024 // 1024} MB")
+        except Exception as e:
+            self._failed[url] = time.monotonic()
+            raise e if isinstance(e, ImageError) else ImageError(f"{url}: {e}") from e
+        self._failed.pop(url, None)
+        with self._lock:
+            self.fetched_bytes += len(data)
+        return data, ctype
+
+    @staticmethod
+    def _make_thumb(data: bytes, w: int) -> bytes:
+        from io import BytesIO
+        with Image.open(BytesIO(data)) as im:
+            im.draft("RGB", (w, w))                 # JPEG: decodifica ya reducida
+            im = im.convert("RGBA") if im.mode in ("P", "LA") else im
+            if im.mode == "RGBA":                   # PNG con transparencia → fondo blanco
+                bg = Image.new("RGB", im.size, "white")
+                bg.paste(im, mask=im.getchannel("A"))
+                im = bg
+            im = im.convert("RGB")
+            im.thumbnail((w, w))
+            out = BytesIO()
+            im.save(out, "JPEG", quality=82, optimize=True, progressive=True)
+        return out.getvalue()
+
+    # ---------- tamaño y LRU ----------
+    def _files(self) -> List[Tuple[float, int, Path]]:
+        out = []
+        for sub in ("objects", "thumbs"):
+            for p in (self.dir / sub).rglob("*"):
+                if p.is_file() and not p.name.endswith(".tmp"):
+                    st = p.stat()
+                    out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def _grow(self, n: int) -> None:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(s for _, s, _ in self._files())
+            else:
+                self._size += n
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        """Borra lo menos usado hasta quedar en el 90 % de max_bytes. Devuelve bytes liberados."""
+        files = sorted(self._files())
+        total = sum(s for _, s, _ in files)
+        target, freed = int(self.max_bytes * 0.9), 0
+        for _, size, p in files:
+            if total - freed <= target:
+                break
+            try:
+                p.unlink()   # las refs de URL que apuntan aquí pasan a ser fallos (se re-descarga)
+                freed += size
+                self.evicted += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._size = total - freed
+        return freed
+
+    # ---------- precarga ----------
+    def prefetch(self, urls: Iterable[str], widths: Sequence[int] = (WIDTHS[0],)) -> Dict[str, int]:
+        """Descarga (y genera miniaturas de) todas las `urls`. Bloquea hasta acabar."""
+        tws = sorted({thumb_width(w) for w in widths} | {0})
+        futs = [self.submit(u, tw) for u in dict.fromkeys(u for u in urls if u) for tw in tws]
+        res = {"ok": 0, "failed": 0}
+        for f in futs:
+            try:
+                f.result()
+                res["ok"] += 1
+            except Exception:
+                res["failed"] += 1
+        return res
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "dir": str(self.dir),
+                "thumbnails": Image is not None,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "fetched_bytes": self.fetched_bytes,
+                "evicted_files": self.evicted,
+                "inflight": len(self._inflight),
+            }
+
+
+def prefetch_in_background(urls: Iterable[str], label: str = "") -> Optional[threading.Thread]:
+    """Para los loaders: precarga en un hilo (no daemon: el proceso espera a que acabe)."""
+    if not prefetch_enabled():
+        return None
+    urls = [u for u in urls if u]
+
+    def _run() -> None:
+        t0 = time.perf_counter()
+        res = ImageCache().prefetch(urls)
+        print(f"🖼️ {label} imágenes precargadas: {res['ok']} ok, {res['failed']} fallidas, "
+              f"{time.perf_counter() - t0:.1f}s")
+
+    t = threading.Thread(target=_run, name="img-prefetch")
+    t.start()
+    return t
+
+
+if __name__ == "__main__":
+    import argparse
+    from sqlalchemy import text
+    from .db import engine
+
+    ap = argparse.ArgumentParser(description="Precarga la caché de imágenes del catálogo")
+    ap.add_argument("--store", help="solo esta tienda")
+    ap.add_argument("--width", type=int, action="append", help=f"anchos de miniatura (por defecto {WIDTHS[0]})")
+    args = ap.parse_args()
+    where = " AND store = :store" if args.store else ""
+    with engine.connect() as conn:
+        urls = [r[0] for r in conn.execute(
+            text(f"SELECT image FROM product WHERE image IS NOT NULL AND image != ''{where}"),
+            {"store": args.store})]
+    cache = ImageCache()
+    t0 = time.perf_counter()
+    res = cache.prefetch(urls, widths=args.width or (WIDTHS[0],))
+    print(f"✅ {res['ok']} ok, {res['failed']} fallidas en {time.perf_counter() - t0:.1f}s → {cache.dir}")
@@ -0,0 +1,168 @@
+# pagina_web/lists.py – listas de la compra en el servidor y refresco de precios en lote
+#
+# La lista del navegador (localStorage) guarda el precio del momento en que se añadió;
+# tras una recarga del catálogo ese total ya no vale. Aquí:
+#   - fetch_products(): precios actuales de muchos ids en una sola ida a la DB
+#     (IN sobre product.id, UNIQUE; en trozos con db.in_chunks)
+#   - deltas(): precio guardado (el del navegador) vs actual, por producto
+#   - save_list() / load_list(): listas por id (tablas shopping_list / shopping_list_item);
+#     al añadir un producto se copia su precio de ese momento (y se conserva en cada PUT
+#     posterior), al leer se devuelven los deltas.
+# Los ids de producto (uuid5 de tienda+título) sobreviven a las recargas, así que una
+# lista sigue apuntando al mismo producto mientras la tienda no le cambie el nombre.
+
+import secrets
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+from sqlalchemy import text
+
+from .db import in_chunks
+
+BATCH_MAX = 2000          # ids por petición (como el limit de /api/products)
+LIST_MAX_ITEMS = 500
+BATCH_FIELDS = ("id", "title", "store", "price_unit", "price_kg", "price_l", "price_unit_count")
+
+
+# ---------- cuerpos de las peticiones ----------
+class BatchRequest(BaseModel):
+    ids: List[str] = Field(max_length=BATCH_MAX)
+    # precio guardado por id (el de la lista del navegador): si viene, se devuelven deltas
+    prices: Optional[Dict[str, Optional[float]]] = None
+
+
+class ListItemIn(BaseModel):
+    id: str
+    qty: int = Field(default=1, ge=1, le=999)
+
+
+class ListIn(BaseModel):
+    name: str = Field(default="", max_length=120)
+    items: List[ListItemIn] = Field(default_factory=list, max_length=LIST_MAX_ITEMS)
+
+
+# ---------- precios actuales ----------
+def fetch_products(conn, ids: Iterable[str], columns: Sequence[str] = BATCH_FIELDS) -> Dict[str, Dict[str, Any]]:
+    """id → fila de product (solo `columns`) para los ids que existen."""
+    ids = list(dict.fromkeys(ids))
+    cols = ", ".join(columns)
+    out: Dict[str, Dict[str, Any]] = {}
+    for ph, params in in_chunks(ids):
+        for r in conn.execute(text(f"SELECT {cols} FROM product WHERE id IN ({ph})"), params).mappings():
+            out[r["id"]] = dict(r)
+    return out
+
+
+def _delta(saved: Optional[float], now: Optional[float]) -> Optional[float]:
+    if saved is None or now is None:
+        return None
+    return round(now - saved, 4)
+
+
+def deltas(ids: Sequence[str], current: Dict[str, Dict[str, Any]],
+           saved: Dict[str, Optional[float]]) -> Dict[str, Any]:
+    """Respuesta de /api/products/batch: filas actuales (en el orden de `ids`) + cambios de precio."""
+    items, missing, changed = [], [], 0
+    for pid in dict.fromkeys(ids):
+        row = current.get(pid)
+        if row is None:
+            missing.append(pid)
+            continue
+        if pid in saved:
+            d = _delta(saved[pid], row["price_unit"])
+            row = {**row, "saved_price": saved[pid], "delta": d}
+            changed += bool(d)
+        items.append(row)
+    return {"items": items, "missing": missing, "changed": changed}
+
+
+# ---------- listas ----------
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def new_list_id() -> str:
+    return secrets.token_urlsafe(12)
+
+
+def save_list(engine, list_id: str, body: ListIn) -> None:
+    """Crea o sustituye la lista `list_id`. Los productos que ya estaban conservan el precio
+    guardado; los nuevos copian el actual."""
+    now = _now()
+    qty = {}
+    for it in body.items:                     # repetidos: se suman
+        qty[it.id] = qty.get(it.id, 0) + it.qty
+    with engine.begin() as conn:
+        current = fetch_products(conn, qty, ("id", "title", "store", "price_unit"))
+        old = {r["product_id"]: r for r in conn.execute(text("""
+            SELECT product_id, title, store, price_unit FROM shopping_list_item WHERE list_id = :id
+        """), {"id": list_id}).mappings()}
+        conn.execute(text("""
+            INSERT INTO shopping_list(id, name, created_at, updated_at) VALUES (:id, :name, :now, :now)
+            ON CONFLICT(id) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at
+        """), {"id": list_id, "name": body.name, "now": now})
+        conn.execute(text("DELETE FROM shopping_list_item WHERE list_id = :id"), {"id": list_id})
+        rows = []
+        for pos, (pid, q) in enumerate(qty.items()):
+            p, o = current.get(pid) or {}, old.get(pid)
+            rows.append({"l": list_id, "p": pid, "pos": pos, "q": q,
+                         "t": p.get("title") or (o["title"] if o else ""),
+                         "s": p.get("store") or (o["store"] if o else ""),
+                         "pr": o["price_unit"] if o else p.get("price_unit")})
+        if rows:
+            conn.execute(text("""
+                INSERT INTO shopping_list_item(list_id, product_id, position, qty, title, store, price_unit)
+                VALUES (:l, :p, :pos, :q, :t, :s, :pr)
+            """), rows)
+
+
+def load_list(engine, list_id: str, catalog=None) -> Optional[Dict[str, Any]]:
+    """Lista con precio guardado, precio actual y delta por producto, y los totales.
+
+    `catalog`: engine del que leer los precios actuales (la réplica de la web); por defecto `engine`.
+    """
+    with engine.connect() as conn:
+        head = conn.execute(text("SELECT id, name, created_at, updated_at FROM shopping_list WHERE id = :id"),
+                            {"id": list_id}).mappings().first()
+        if head is None:
+            return None
+        saved = conn.execute(text("""
+            SELECT product_id, qty, title, store, price_unit FROM shopping_list_item
+             WHERE list_id = :id ORDER BY position
+        """), {"id": list_id}).mappings().all()
+    with (catalog or engine).connect() as conn:
+        current = fetch_products(conn, [r["product_id"] for r in saved])
+
+    items: List[Dict[str, Any]] = []
+    total_saved = total_now = 0.0
+    changed = missing = 0
+    for r in saved:
+        now = current.get(r["product_id"])
+        price = now["price_unit"] if now else None
+        d = _delta(r["price_unit"], price)
+        changed += bool(d)
+        missing += now is None
+        total_saved += (r["price_unit"] or 0.0) * r["qty"]
+        total_now += (price if price is not None else r["price_unit"] or 0.0) * r["qty"]
+        items.append({
+            "id": r["product_id"], "qty": r["qty"],
+            "title": now["title"] if now else r["title"], "store": r["store"],
+            "saved_price": r["price_unit"], "price_unit": price, "delta": d,
+            "available": now is not None,
+        })
+    return {
+        **dict(head), "items": items, "changed": changed, "missing": missing,
+        "total_saved": round(total_saved, 2), "total_now": round(total_now, 2),
+    }
+
+
+def list_exists(engine, list_id: str) -> bool:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT 1 FROM shopping_list WHERE id = :id"), {"id": list_id}).first() is not None
+
+
+def delete_list(engine, list_id: str) -> bool:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM shopping_list_item WHERE list_id = :id"), {"id": list_id})
+        return conn.execute(text("DELETE FROM shopping_list WHERE id = :id"), {"id": list_id}).rowcount > 0
@@ -0,0 +1,318 @@
+# pagina_web/metrics.py
+# Métricas de la web: latencia por ruta (histogramas) partida en
+#   sql       – tiempo dentro del cursor (eventos before/after_cursor_execute del engine)
+#   python    – resto del endpoint (filtros, índice de búsqueda, ordenación…)
+#   serialize – lo que queda hasta la respuesta (validación, jsonable_encoder, render JSON)
+# Se exponen en /metrics (texto Prometheus; ?format=json para un resumen legible)
+# y en la cabecera Server-Timing de cada respuesta (visible en las DevTools).
+#
+# Perfilador por muestreo, opt-in: con BARATAZO_PROFILING=1 en el servidor, una
+# petición con la cabecera "X-Baratazo-Profile: 1" se muestrea cada ~1 ms y deja
+# un fichero de pilas plegadas (flamegraph.pl / speedscope) en BARATAZO_PROFILE_DIR;
+# su nombre vuelve en la cabecera X-Baratazo-Profile y se descarga en /debug/profile/{name}.
+
+import functools, inspect, os, re, sys, threading, time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# Cubos en ms (acumulativos, estilo Prometheus)
+BUCKETS_MS: Tuple[float, ...] = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+PHASES = ("total", "sql", "python", "serialize")
+
+PROFILE_HEADER = "x-baratazo-profile"
+PROFILE_INTERVAL = float(os.getenv("BARATAZO_PROFILE_INTERVAL", "0.001"))
+PROFILE_DIR = Path(os.getenv("BARATAZO_PROFILE_DIR", Path(__file__).resolve().parents[1] / "profiles"))
+
+
+def _profiling_enabled() -> bool:
+    return os.getenv("BARATAZO_PROFILING", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+# ========= Estado por petición =========
+
+@dataclass
+class RequestTimer:
+    sql: float = 0.0
+    queries: int = 0
+    endpoint: float = 0.0
+    # hilo que hay que muestrear: el del event loop o, mientras corre el endpoint, el del threadpool
+    active_tid: int = 0
+    samples: Optional[Counter] = None
+
+_timer: ContextVar[Optional[RequestTimer]] = ContextVar("baratazo_request_timer", default=None)
+
+
+# ========= Histogramas =========
+
+@dataclass
+class Histogram:
+    counts: List[int] = field(default_factory=lambda: [0] * (len(BUCKETS_MS) + 1))
+    total: float = 0.0
+    n: int = 0
+
+    def observe(self, ms: float) -> None:
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += ms
+        self.n += 1
+
+    def quantile(self, q: float) -> float:
+        """Aproximado: límite superior del cubo que contiene el cuantil."""
+        if not self.n:
+            return 0.0
+        target, acc = q * self.n, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else float("inf")
+        return float("inf")
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hist: Dict[Tuple[str, str, str], Histogram] = {}   # (método, ruta, fase)
+        self.status: Counter = Counter()                        # (método, ruta, código)
+        self.queries: Counter = Counter()                       # (método, ruta)
+
+    def record(self, method: str, route: str, code: int, phases: Dict[str, float], queries: int) -> None:
+        with self._lock:
+            for ph, ms in phases.items():
+                h = self.hist.get((method, route, ph))
+                if h is None:
+                    h = self.hist[(method, route, ph)] = Histogram()
+                h.observe(ms)
+            self.status[(method, route, code)] += 1
+            self.queries[(method, route)] += queries
+
+    def prometheus(self) -> str:
+        out = [
+            "# HELP baratazo_http_phase_ms Latencia por ruta y fase (total, sql, python, serialize), en ms.",
+            "# TYPE baratazo_http_phase_ms histogram",
+        ]
+        with self._lock:
+            for (m, r, ph), h in sorted(self.hist.items()):
+                lbl = f'method="{m}",route="{r}",phase="{ph}"'
+                acc = 0
+                for b, c in zip(BUCKETS_MS, h.counts):
+                    acc += c
+                    out.append(f'baratazo_http_phase_ms_bucket{{{lbl},le="{b:g}"}} {acc}')
+                out.append(f'baratazo_http_phase_ms_bucket{{{lbl},le="+Inf"}} {h.n}')
+                out.append(f"baratazo_http_phase_ms_sum{{{lbl}}} {h.total:.3f}")
+                out.append(f"baratazo_http_phase_ms_count{{{lbl}}} {h.n}")
+            out += ["# HELP baratazo_http_responses_total Respuestas por ruta y código.",
+                    "# TYPE baratazo_http_responses_total counter"]
+            for (m, r, code), n in sorted(self.status.items()):
+                out.append(f'baratazo_http_responses_total{{method="{m}",route="{r}",code="{code}"}} {n}')
+            out += ["# HELP baratazo_http_sql_queries_total Sentencias SQL ejecutadas por ruta.",
+                    "# TYPE baratazo_http_sql_queries_total counter"]
+            for (m, r), n in sorted(self.queries.items()):
+                out.append(f'baratazo_http_sql_queries_total{{method="{m}",route="{r}"}} {n}')
+        return "\n".join(out) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        res: Dict[str, Any] = {}
+        with self._lock:
+            for (m, r, ph), h in sorted(self.hist.items()):
+                d = res.setdefault(f"{m} {r}", {"count": 0, "sql_queries": self.queries[(m, r)]})
+                if ph == "total":
+                    d["count"] = h.n
+                d[ph] = {"avg_ms": round(h.total / h.n, 3) if h.n else 0.0,
+                         "p50_ms": h.quantile(0.5), "p95_ms": h.quantile(0.95), "p99_ms": h.quantile(0.99)}
+        return res
+
+
+registry = Registry()
+
+
+# ========= SQL =========
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_bz_t0", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("_bz_t0")
+    if not stack:
+        return
+    dt = time.perf_counter() - stack.pop()
+    t = _timer.get()
+    if t is not None:
+        t.sql += dt
+        t.queries += 1
+
+
+# ========= Endpoint cronometrado =========
+
+class TimedRoute(APIRoute):
+    """APIRoute que cronometra la función del endpoint (para separar python/serialize)."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+
+def _timed(fn: Callable[..., Any]) -> Callable[..., Any]:
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapper(*args, **kwargs):
+            t = _timer.get()
+            t0 = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                if t is not None:
+                    t.endpoint += time.perf_counter() - t0
+        return awrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Los endpoints síncronos corren en el threadpool: el contexto (y el timer) se copia
+        t = _timer.get()
+        t0 = time.perf_counter()
+        if t is not None:
+            prev, t.active_tid = t.active_tid, threading.get_ident()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if t is not None:
+                t.endpoint += time.perf_counter() - t0
+                t.active_tid = prev
+    return wrapper
+
+
+# ========= Perfilador por muestreo =========
+
+def _fold(frame) -> str:
+    parts = []
+    while frame is not None:
+        co = frame.f_code
+        parts.append(f"{Path(co.co_filename).stem}:{co.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, t: RequestTimer):
+        super().__init__(daemon=True, name="baratazo-sampler")
+        self.t = t
+        self.stop = threading.Event()
+
+    def run(self) -> None:
+        samples = self.t.samples
+        while not self.stop.wait(PROFILE_INTERVAL):
+            frame = sys._current_frames().get(self.t.active_tid)
+            if frame is not None:
+                samples[_fold(frame)] += 1
+
+
+def _write_profile(route: str, samples: Counter) -> str:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^a-zA-Z0-9]+", "_", route).strip("_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{slug}.folded"
+    with open(PROFILE_DIR / name, "w", encoding="utf-8") as f:
+        for stack, n in samples.most_common():
+            f.write(f"{stack} {n}\n")
+    return name
+
+
+# ========= Middleware ASGI =========
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        t = RequestTimer(active_tid=threading.get_ident())
+        token = _timer.set(t)
+        sampler = None
+        if _profiling_enabled():
+            for k, v in scope.get("headers") or ():
+                if k == PROFILE_HEADER.encode() and v.strip() not in (b"", b"0"):
+                    t.samples = Counter()
+                    sampler = _Sampler(t)
+                    sampler.start()
+                    break
+
+        t0 = time.perf_counter()
+        code = 500
+        profile_name: Optional[str] = None
+
+        async def send_wrapper(message):
+            nonlocal code, profile_name
+            if message["type"] == "http.response.start":
+                code = message["status"]
+                total = time.perf_counter() - t0
+                headers = list(message.get("headers") or [])
+                py = max(t.endpoint - t.sql, 0.0)
+                ser = max(total - t.endpoint, 0.0)
+                headers.append((b"server-timing", (
+                    f"sql;dur={t.sql * 1000:.2f}, python;dur={py * 1000:.2f}, "
+                    f"serialize;dur={ser * 1000:.2f}, total;dur={total * 1000:.2f}").encode()))
+                if sampler is not None:
+                    sampler.stop.set()
+                    sampler.join()
+                    route = scope.get("route")
+                    profile_name = _write_profile(getattr(route, "path", scope.get("path", "")), t.samples)
+                    headers.append((PROFILE_HEADER.encode(), profile_name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timer.reset(token)
+            if sampler is not None and sampler.is_alive():
+                sampler.stop.set()
+            total = time.perf_counter() - t0
+            route = scope.get("route")
+            # Plantilla de la ruta ("/product/{product_id}") para no disparar la cardinalidad
+            path = getattr(route, "path", None) or "<sin ruta>"
+            if path not in ("/metrics",):
+                registry.record(scope.get("method", ""), path, code, {
+                    "total": total * 1000,
+                    "sql": t.sql * 1000,
+                    "python": max(t.endpoint - t.sql, 0.0) * 1000,
+                    "serialize": max(total - t.endpoint, 0.0) * 1000,
+                }, t.queries)
+
+
+# ========= Instalación =========
+
+def instrument_engine(engine) -> None:
+    """Cuenta el tiempo de SQL de `engine` (también para engines que se abren después)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def install(app: FastAPI, engine) -> None:
+    """Engancha métricas a `app` y al `engine`. Llamar antes de declarar las rutas."""
+    app.router.route_class = TimedRoute
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics(format: str = "prometheus"):
+        if format == "json":
+            return registry.summary()
+        return PlainTextResponse(registry.prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/debug/profile/{name}", include_in_schema=False)
+    def profile_file(name: str):
+        if not _profiling_enabled() or not re.fullmatch(r"[\w.-]+\.folded", name):
+            raise HTTPException(status_code=404)
+        p = PROFILE_DIR / name
+        if not p.is_file():
+            raise HTTPException(status_code=404)
+        return PlainTextResponse(p.read_text(encoding="utf-8"))
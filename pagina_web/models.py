@@ -1,9 +1,11 @@
 # models.py
 from __future__ import annotations
 from typing import Optional
-from uuid import uuid5, NAMESPACE_URL
-import re
-from sqlmodel import SQLModel, Field, UniqueConstraint
+from datetime import datetime
+from uuid import UUID, uuid5, NAMESPACE_URL
+import hashlib, re
+import pandas as pd
+from sqlmodel import SQLModel, Field, UniqueConstraint, Index
 
 
 # --- helpers de IDs deterministas ---
@@ -21,15 +23,45 @@ def make_category_id(category: str, subcategory: str) -> str:
     return str(uuid5(NAMESPACE_URL, base))
 
 
+# --- versión vectorizada (loaders): mismos ids, bit a bit, que las de arriba ---
+# Normaliza la columna entera con .str y calcula el uuid5 una sola vez por clave distinta
+# (los enlaces repiten el mismo producto en varias categorías).
+def _norm_series(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str).str.strip().str.lower().str.replace(r"\s+", " ", regex=True)
+
+def _uuid5_many(bases: pd.Series) -> pd.Series:
+    ns = NAMESPACE_URL.bytes
+    uniq = pd.unique(bases)
+    # uuid5 = sha1(namespace + nombre)[:16] con los bits de versión/variante
+    ids = [str(UUID(bytes=hashlib.sha1(ns + b.encode()).digest()[:16], version=5)) for b in uniq]
+    return pd.Series(ids, index=uniq).reindex(bases.to_numpy()).set_axis(bases.index)
+
+def make_product_ids(store: pd.Series, title: pd.Series) -> pd.Series:
+    return _uuid5_many(_norm_series(store) + "|" + _norm_series(title))
+
+def make_category_ids(category: pd.Series, subcategory: pd.Series) -> pd.Series:
+    return _uuid5_many(_norm_series(category) + ">" + _norm_series(subcategory))
+
+
 # --- Tablas ---
+# Claves internas INTEGER (alias del ROWID) y el uuid estable como columna UNIQUE: la
+# web, las listas y los avisos siguen hablando en uuids; los enlaces van por enteros.
 class Product(SQLModel, table=True):
     __tablename__ = "product"
+    pk: Optional[int] = Field(default=None, primary_key=True)
     # ID determinista (uuid v5 de store+title)
-    id: str = Field(primary_key=True, default=None)
+    id: str = Field(unique=True)
     title: str = Field(index=True)
     store: str = Field(index=True)
-    price_unit: Optional[float] = None
-    price_kg: Optional[float] = None
+    price_unit: Optional[float] = Field(default=None, index=True)
+    # €/medida normalizados (precio / total del formato); NULL si no aplica
+    price_kg: Optional[float] = Field(default=None, index=True)
+    price_l: Optional[float] = Field(default=None, index=True)
+    price_unit_count: Optional[float] = Field(default=None, index=True)
+    # Totales del formato ("6 x 1 L" → 6000 ml, 6 uds.)
+    total_g: Optional[float] = None
+    total_ml: Optional[float] = None
+    total_units: Optional[float] = None
     image: Optional[str] = None
     product_url: Optional[str] = None
 
@@ -41,8 +73,9 @@ class Product(SQLModel, table=True):
 
 class Category(SQLModel, table=True):
     __tablename__ = "category"
+    pk: Optional[int] = Field(default=None, primary_key=True)
     # ID determinista (uuid v5 de category>subcategory)
-    id: str = Field(primary_key=True, default=None)
+    id: str = Field(unique=True)
     category: str
     subcategory: str
     __table_args__ = (
@@ -52,5 +85,92 @@ class Category(SQLModel, table=True):
 
 class ProductCategory(SQLModel, table=True):
     __tablename__ = "product_category"
-    product_id: str = Field(foreign_key="product.id", primary_key=True)
-    category_id: str = Field(foreign_key="category.id", primary_key=True)
+    # Par de enteros en una tabla WITHOUT ROWID: la PK es la tabla (producto → categorías)
+    # y el índice inverso sirve categoría → productos
+    product_pk: int = Field(foreign_key="product.pk", primary_key=True)
+    category_pk: int = Field(foreign_key="category.pk", primary_key=True)
+    __table_args__ = (
+        Index("ix_product_category_category", "category_pk", "product_pk"),
+        {"sqlite_with_rowid": False},
+    )
+
+
+class CatalogMeta(SQLModel, table=True):
+    __tablename__ = "catalog_meta"
+    # Pares clave/valor del catálogo; "generation" sube en cada recarga de tienda
+    key: str = Field(primary_key=True)
+    value: int = 0
+
+
+class ScrapeRun(SQLModel, table=True):
+    __tablename__ = "scrape_run"
+    # Histórico de ejecuciones de scrapers/loaders (scrapers/telemetry.py)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    store: str = Field(index=True)
+    started_at: datetime = Field(index=True)
+    duration_s: float = 0.0
+    status: str = "ok"
+    items: int = 0
+    duplicates: int = 0
+    retries: int = 0
+    report_json: str = ""
+
+
+class QueryStat(SQLModel, table=True):
+    __tablename__ = "query_stat"
+    # Búsquedas por día (normalizadas); ranking de pagina_web/popular.py
+    query: str = Field(primary_key=True)
+    day: str = Field(primary_key=True)   # YYYY-MM-DD
+    hits: int = 0
+
+
+class ShoppingList(SQLModel, table=True):
+    __tablename__ = "shopping_list"
+    # Listas guardadas en el servidor (pagina_web/lists.py); el id aleatorio hace de enlace
+    id: str = Field(primary_key=True)
+    name: str = ""
+    created_at: datetime
+    updated_at: datetime = Field(index=True)
+
+
+class ShoppingListItem(SQLModel, table=True):
+    __tablename__ = "shopping_list_item"
+    list_id: str = Field(foreign_key="shopping_list.id", primary_key=True)
+    # Sin FK a product: una recarga borra y vuelve a insertar los productos de la tienda
+    product_id: str = Field(primary_key=True)
+    position: int = 0
+    qty: int = 1
+    # Copia al guardar: referencia de los deltas y lo que se enseña si el producto desaparece
+    title: str = ""
+    store: str = ""
+    price_unit: Optional[float] = None
+
+
+class Watch(SQLModel, table=True):
+    __tablename__ = "watch"
+    # Vigilancia de precio (pagina_web/alerts.py): un producto o una búsqueda guardada
+    id: Optional[int] = Field(default=None, primary_key=True)
+    product_id: Optional[str] = Field(default=None, index=True)   # sin FK, como las listas
+    query: Optional[str] = None       # normalizada
+    store: Optional[str] = None
+    metric: str = "price_unit"        # price_unit | price_kg | price_l
+    max_price: Optional[float] = None
+    owner: str = Field(default="", index=True)
+    created_at: datetime
+
+
+class AlertOutbox(SQLModel, table=True):
+    __tablename__ = "alert_outbox"
+    # Avisos pendientes de entregar; los escribe el loader, los lee un notificador
+    id: Optional[int] = Field(default=None, primary_key=True)
+    watch_id: int = Field(index=True)
+    owner: str = ""
+    product_id: str
+    title: str = ""
+    store: str = ""
+    metric: str = "price_unit"
+    old_price: Optional[float] = None
+    new_price: Optional[float] = None
+    max_price: Optional[float] = None
+    created_at: datetime
+    delivered_at: Optional[datetime] = Field(default=None, index=True)
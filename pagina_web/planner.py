@@ -0,0 +1,479 @@
+# pagina_web/planner.py – diagnóstico de planes de consulta: EXPLAIN QUERY PLAN + consejos de índices
+#
+#   python -m pagina_web.planner                 # sobre una copia de la DB configurada (no la toca)
+#   python -m pagina_web.planner --db otra.db --repeat 51
+#   python -m pagina_web.planner --apply         # además: ANALYZE + crea los índices sugeridos en la DB
+#
+# Repite las consultas de la app (SHAPES: /api/products sin q, ficha, lote, listas, avisos,
+# populares y las del loader) con parámetros sacados de los datos, y para cada una mira el
+# plan: SCAN de una tabla sin índice (recorrido entero) o USE TEMP B-TREE (ordenar aparte).
+# Sobre una copia (API de backup): mide (antes), ANALYZE + PRAGMA optimize, prueba índices
+# candidatos para las que siguen marcadas (igualdades → orden/rango → columnas leídas) y se
+# queda con el que quita marcas, y vuelve a medir (después). El plan decide; el tiempo (mediana
+# de --repeat) solo confirma: el índice tiene que ganar por encima del ruido de la propia medida
+# y no hacer más lenta ninguna otra consulta. Un índice que solo gana tiempo no se sugiere.
+# También señala índices que ninguna consulta usa o que sobran (quitarlos no cambia ningún plan).
+# Las consultas marcadas full_ok leen la tabla entera a propósito (p. ej. el índice en memoria).
+
+import argparse, re, sqlite3, statistics, sys, tempfile, time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+from .snapshot import ITEM_FIELDS, PRICE_COLS, PRICE_ORDERS
+from .lists import BATCH_FIELDS
+
+MIN_GAIN = 0.2            # un índice nuevo tiene que ahorrar al menos un 20% en su consulta
+MIN_SAVED_MS = 1.0        # … y al menos esto (en consultas de ~1 ms el 20% es ruido)
+                          # … y sin solaparse con la medida de antes (ver _clearly_less)
+SPARE_MIN_ROWS = 1000     # en tablas más pequeñas no se opina sobre índices sobrantes
+_ITEMS = ", ".join(ITEM_FIELDS)
+_IN = 50                  # tamaño de las listas IN (lote de ids, ROWIDs de una página)
+
+
+@dataclass
+class Shape:
+    """Una consulta de la app y lo que haría falta indexar para servirla sin recorrer ni ordenar."""
+    name: str
+    sql: str
+    params: Callable[[Dict], Dict]
+    table: str = ""
+    eq: Tuple[str, ...] = ()      # columnas con = / IN (primero en el índice)
+    rng: Tuple[str, ...] = ()     # columna con rango (>, <)
+    order: Tuple[str, ...] = ()   # ORDER BY como columnas de índice (ROWID → pk)
+    cover: Tuple[str, ...] = ()   # el resto de columnas leídas (índice cubriente)
+    full_ok: bool = False         # lee la tabla entera a propósito
+    write: bool = False           # DELETE/UPDATE: se mide dentro de un SAVEPOINT que se deshace
+
+
+def _ph(prefix: str, n: int) -> str:
+    return ", ".join(f":{prefix}{i}" for i in range(n))
+
+
+def _many(prefix: str, values: Sequence) -> Dict:
+    return {f"{prefix}{i}": v for i, v in enumerate(values)}
+
+
+def _price_shapes() -> List[Shape]:
+    """/api/products sin q y por precio (_browse_by_price): todas y con filtro de tiendas."""
+    out = []
+    for sort, (col, desc) in PRICE_ORDERS.items():
+        d = "DESC" if desc else "ASC"
+        # ROWID DESC de desempate: el índice (col) va en ROWID ascendente, así que solo sirve al revés
+        order = (col, "pk") if desc else (col, "pk DESC")
+        out.append(Shape(f"products.{sort}", f"""
+            SELECT {_ITEMS}, ROWID AS _rowid FROM product WHERE {col} > 0
+             ORDER BY {col} {d}, ROWID DESC LIMIT :limit OFFSET :offset""",
+            lambda s: {"limit": 400, "offset": 0}, "product", rng=(col,), order=order))
+        out.append(Shape(f"products.{sort}+stores", f"""
+            SELECT {_ITEMS}, ROWID AS _rowid FROM product WHERE store IN ({_ph('s', 2)}) AND {col} > 0
+             ORDER BY {col} {d}, ROWID DESC LIMIT :limit OFFSET :offset""",
+            lambda s: {**_many("s", s["stores"]), "limit": 400, "offset": 0},
+            "product", eq=("store",), rng=(col,), order=order))
+    for col in PRICE_COLS:
+        # la cola de la página: los que no tienen precio en esa columna, por recientes
+        out.append(Shape(f"products.no_{col}", f"""
+            SELECT {_ITEMS}, ROWID AS _rowid FROM product WHERE ({col} IS NULL OR {col} <= 0)
+             ORDER BY ROWID DESC LIMIT :limit OFFSET :offset""",
+            lambda s: {"limit": 400, "offset": 0}, "product", full_ok=True))
+    return out
+
+
+SHAPES: List[Shape] = [
+    # ---------- web: catálogo ----------
+    Shape("products.recientes", f"SELECT {_ITEMS}, ROWID AS _rowid FROM product ORDER BY ROWID DESC LIMIT :limit OFFSET :offset",
+          lambda s: {"limit": 400, "offset": 0}, "product", full_ok=True),
+    Shape("products.recientes+stores", f"""
+        SELECT {_ITEMS}, ROWID AS _rowid FROM product WHERE store IN ({_ph('s', 2)})
+         ORDER BY ROWID DESC LIMIT :limit OFFSET :offset""",
+          lambda s: {**_many("s", s["stores"]), "limit": 400, "offset": 0}, "product", eq=("store",)),
+    *_price_shapes(),
+    Shape("products.by_rowids", f"SELECT {_ITEMS}, ROWID AS _rowid FROM product WHERE ROWID IN ({_ph('r', _IN)})",
+          lambda s: _many("r", s["rowids"]), "product"),
+    Shape("catalog.load", f"SELECT ROWID, title, store, {', '.join(PRICE_COLS)} FROM product ORDER BY ROWID",
+          lambda s: {}, "product", full_ok=True),
+    Shape("stores", "SELECT DISTINCT store FROM product ORDER BY store", lambda s: {}, "product", full_ok=True),
+    Shape("product.detail", """
+        SELECT id, title, price_unit, price_kg, price_l, price_unit_count, image, store, product_url
+          FROM product WHERE id = :id""", lambda s: {"id": s["ids"][0]}, "product", eq=("id",)),
+    Shape("products.batch", f"SELECT {', '.join(BATCH_FIELDS)} FROM product WHERE id IN ({_ph('p', _IN)})",
+          lambda s: _many("p", s["ids"]), "product", eq=("id",)),
+    # ---------- web: listas, vigilancias, avisos, populares ----------
+    Shape("list.items", """
+        SELECT product_id, qty, title, store, price_unit FROM shopping_list_item
+         WHERE list_id = :id ORDER BY position""", lambda s: {"id": s["list_id"]},
+          "shopping_list_item", eq=("list_id",), order=("position",)),
+    Shape("watches.owner", """
+        SELECT id, product_id, query, store, metric, max_price, owner, created_at FROM watch
+         WHERE owner = :o ORDER BY id""", lambda s: {"o": s["owner"]}, "watch", eq=("owner",)),
+    Shape("alerts.pending", """
+        SELECT id, watch_id, owner, product_id, title, store, metric, old_price, new_price, max_price, created_at
+          FROM alert_outbox WHERE delivered_at IS NULL AND id > :after ORDER BY id LIMIT :limit""",
+          lambda s: {"after": 0, "limit": 100}, "alert_outbox", eq=("delivered_at",)),
+    Shape("popular.top", """
+        SELECT query, SUM(hits) AS hits FROM query_stat WHERE day >= :since
+         GROUP BY query HAVING SUM(hits) >= :min_hits ORDER BY hits DESC, query LIMIT :n""",
+          lambda s: {"since": s["since"], "min_hits": 2, "n": 50}, "query_stat", full_ok=True),
+    # ---------- loader (scrapers/guardar.py, scrapers/validate.py, alerts.evaluate) ----------
+    Shape("load.before", "SELECT id, price_unit, price_kg, price_l, price_unit_count FROM product WHERE store = :store",
+          lambda s: {"store": s["store"]}, "product", eq=("store",)),
+    Shape("load.wipe_links", """
+        DELETE FROM product_category WHERE product_pk IN (SELECT pk FROM product WHERE store = :store)""",
+          lambda s: {"store": s["store"]}, "product", eq=("store",), write=True),
+    Shape("load.wipe", "DELETE FROM product WHERE store = :store", lambda s: {"store": s["store"]},
+          "product", eq=("store",), write=True),
+    Shape("load.pks", "SELECT id, pk FROM product WHERE store = :store", lambda s: {"store": s["store"]},
+          "product", eq=("store",), cover=("id",)),
+    Shape("load.categories", "SELECT id, pk FROM category", lambda s: {}, "category", full_ok=True),
+    Shape("validate.history", """
+        SELECT p.pk, p.title, p.price_unit, p.price_kg, p.price_l, p.price_unit_count, pc.category_pk
+          FROM product p LEFT JOIN product_category pc ON pc.product_pk = p.pk WHERE p.store = :store""",
+          lambda s: {"store": s["store"]}, "product", eq=("store",)),
+    Shape("alerts.by_product", f"""
+        SELECT id, product_id, query, store, metric, max_price, owner FROM watch
+         WHERE product_id IN ({_ph('p', _IN)})""", lambda s: _many("p", s["ids"]), "watch", eq=("product_id",)),
+    Shape("alerts.searches", """
+        SELECT id, product_id, query, store, metric, max_price, owner FROM watch WHERE query IS NOT NULL""",
+          lambda s: {}, "watch", full_ok=True),
+]
+
+
+# ---------- planes ----------
+_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")   # SCAN sin índice (con índice: "... USING ...")
+
+
+def plan(conn: sqlite3.Connection, shape: Shape, params: Dict) -> List[str]:
+    return [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + shape.sql, params)]
+
+
+def flags(lines: Sequence[str]) -> List[str]:
+    """Marcas de un plan: 'scan <tabla>' (recorrido entero) y 'temp b-tree' (ordenar/agrupar aparte)."""
+    out = []
+    for ln in lines:
+        m = _SCAN.match(ln.strip())
+        if m:
+            out.append(f"scan {m.group(1)}")
+        elif "TEMP B-TREE" in ln:
+            out.append("temp b-tree " + ln.split(" FOR ", 1)[-1].lower())
+    return out
+
+
+def used_indexes(lines: Sequence[str]) -> List[str]:
+    return re.findall(r"USING (?:COVERING )?INDEX (\w+)", " ".join(lines))
+
+
+class Timing(NamedTuple):
+    ms: float     # mediana
+    lo: float     # cuartil 1
+    hi: float     # cuartil 3
+
+
+def timed(conn: sqlite3.Connection, shape: Shape, params: Dict, repeat: int) -> Timing:
+    """Mediana y cuartiles de `repeat` ejecuciones en ms, tras una de calentamiento.
+    Las escrituras se deshacen (SAVEPOINT) para dejar la copia igual."""
+    times = []
+    for i in range(1 + max(1, min(repeat, 5) if shape.write else repeat)):
+        if shape.write:
+            conn.execute("SAVEPOINT planner")
+        t0 = time.perf_counter()
+        conn.execute(shape.sql, params).fetchall()
+        if i:
+            times.append((time.perf_counter() - t0) * 1000)
+        if shape.write:
+            conn.execute("ROLLBACK TO planner")
+            conn.execute("RELEASE planner")
+    times.sort()
+    n = len(times)
+    return Timing(statistics.median(times), times[n // 4], times[min(n - 1, (3 * n) // 4)])
+
+
+def _clearly_less(a: Timing, b: Timing) -> bool:
+    """a más rápida que b por encima del ruido: la mediana gana ≥ MIN_GAIN y ≥ MIN_SAVED_MS, y
+    las medidas no se solapan (el cuartil 3 de a por debajo del cuartil 1 de b)."""
+    return a.ms <= b.ms * (1 - MIN_GAIN) and b.ms - a.ms >= MIN_SAVED_MS and a.hi < b.lo
+
+
+@dataclass
+class Result:
+    shape: Shape
+    plan: List[str]
+    flags: List[str]
+    t: Timing
+
+    @property
+    def ms(self) -> float:
+        return self.t.ms
+
+
+def measure(conn: sqlite3.Connection, samples: Dict, repeat: int,
+            shapes: Sequence[Shape] = SHAPES) -> Dict[str, Result]:
+    out = {}
+    for sh in shapes:
+        p = sh.params(samples)
+        lines = plan(conn, sh, p)
+        out[sh.name] = Result(sh, lines, flags(lines), timed(conn, sh, p, repeat))
+    return out
+
+
+def samples(conn: sqlite3.Connection) -> Dict:
+    """Parámetros reales: la tienda con más productos, dos tiendas, ids y ROWIDs repartidos."""
+    stores = [r[0] for r in conn.execute("SELECT store FROM product GROUP BY store ORDER BY COUNT(*) DESC LIMIT 2")]
+    n = conn.execute("SELECT MAX(ROWID) FROM product").fetchone()[0] or 0
+    step = max(1, n // _IN)
+    picked = conn.execute(f"SELECT ROWID, id FROM product WHERE ROWID % {step} = 0 LIMIT {_IN}").fetchall()
+    picked += [(0, "")] * (_IN - len(picked))
+    one = lambda sql: (conn.execute(sql).fetchone() or ("",))[0]
+    return {
+        "store": stores[0] if stores else "", "stores": (stores * 2)[:2] if stores else ["", ""],
+        "rowids": [r[0] for r in picked], "ids": [r[1] for r in picked],
+        "list_id": one("SELECT list_id FROM shopping_list_item LIMIT 1"),
+        "owner": one("SELECT owner FROM watch LIMIT 1"),
+        "since": (date.today() - timedelta(days=6)).isoformat(),
+    }
+
+
+# ---------- estadísticas ----------
+def analyze(conn: sqlite3.Connection) -> None:
+    """ANALYZE + PRAGMA optimize: lo mismo que db.analyze() tras cada carga."""
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+
+
+# ---------- índices ----------
+def indexes(conn: sqlite3.Connection) -> Dict[str, Tuple[str, List[str], bool]]:
+    """nombre → (tabla, columnas, unique); las de restricciones (autoindex) incluidas."""
+    out = {}
+    for tbl, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        for _, name, unique, *_ in conn.execute(f'PRAGMA index_list("{tbl}")'):
+            cols = [r[2] or "pk" for r in conn.execute(f'PRAGMA index_xinfo("{name}")') if r[5]]
+            out[name] = (tbl, cols, bool(unique))
+    return out
+
+
+def candidates(sh: Shape) -> List[Tuple[str, ...]]:
+    """Índices a probar: igualdades, luego orden (o rango) y, si cabe, las columnas leídas."""
+    heads = [sh.eq + sh.order, sh.eq + sh.rng] if sh.order else [sh.eq + sh.rng]
+    out: List[Tuple[str, ...]] = []
+    for h in heads:
+        for c in (h, h + tuple(x for x in sh.cover if x not in h)):
+            if c and c not in out:
+                out.append(c)
+    return out
+
+
+def index_name(table: str, cols: Sequence[str]) -> str:
+    return f"ix_{table}_" + "_".join(c.replace(" DESC", "_desc") for c in cols)
+
+
+def index_sql(table: str, cols: Sequence[str]) -> str:
+    return f'CREATE INDEX IF NOT EXISTS {index_name(table, cols)} ON "{table}" ({", ".join(cols)})'
+
+
+@dataclass
+class Advice:
+    shape: str
+    index: str
+    sql: str
+    before_ms: float
+    after_ms: float
+    flags_before: List[str]
+    flags_after: List[str]
+
+
+def _regressions(conn: sqlite3.Connection, results: Dict[str, Result], smp: Dict, repeat: int) -> List[str]:
+    """Consultas cuyo plan cambia con el índice de prueba y ganan marcas o van claramente más
+    lentas (un índice nuevo puede parecerle al planificador mejor que el que ya usaban)."""
+    out = []
+    for name, r in results.items():
+        p = r.shape.params(smp)
+        lines = plan(conn, r.shape, p)
+        if lines == r.plan:
+            continue
+        if len(flags(lines)) > len(r.flags) or _clearly_less(r.t, timed(conn, r.shape, p, repeat)):
+            out.append(name)
+    return out
+
+
+def advise(conn: sqlite3.Connection, results: Dict[str, Result], smp: Dict, repeat: int) -> List[Advice]:
+    """Para cada consulta marcada (y no full_ok), el candidato que le quita más marcas sin añadir
+    ninguna, gana claramente (_clearly_less) y no empeora ninguna otra. Sin marcas no hay consejo."""
+    have = {(t, tuple(c)) for t, c, _ in indexes(conn).values()}
+    out: List[Advice] = []
+    for name, res in results.items():
+        sh = res.shape
+        if sh.full_ok or not sh.table or not res.flags:
+            continue
+        p = sh.params(smp)
+        best, best_t = None, None
+        for cols in candidates(sh):
+            if (sh.table, tuple(c.split()[0] for c in cols)) in have and not any(" DESC" in c for c in cols):
+                continue
+            conn.execute("SAVEPOINT advise")
+            try:
+                conn.execute(index_sql(sh.table, cols))
+                conn.execute(f"ANALYZE {index_name(sh.table, cols)}")   # sin estadísticas se sobrestima
+                lines = plan(conn, sh, p)
+                fl = flags(lines)
+                if index_name(sh.table, cols) not in used_indexes(lines) or len(fl) >= len(res.flags) \
+                        or not set(fl) <= set(res.flags):
+                    continue
+                if best is not None and len(fl) > len(best.flags_after):
+                    continue
+                t = timed(conn, sh, p, repeat)
+                # a igualdad de marcas, el primero (menos columnas) salvo que otro gane claramente
+                better = best is None or len(fl) < len(best.flags_after) \
+                    or _clearly_less(t, best_t)
+                if better and _clearly_less(t, res.t):
+                    worse = _regressions(conn, results, smp, repeat)
+                    if worse:
+                        print(f"   ({index_name(sh.table, cols)} descartado: empeora {', '.join(worse)})")
+                    else:
+                        best, best_t = Advice(name, index_name(sh.table, cols), index_sql(sh.table, cols),
+                                              res.ms, t.ms, res.flags, fl), t
+            finally:
+                conn.execute("ROLLBACK TO advise")
+                conn.execute("RELEASE advise")
+        if best is not None and all(a.sql != best.sql for a in out):
+            out.append(best)
+    return out
+
+
+def unused(conn: sqlite3.Connection, results: Dict[str, Result], smp: Dict) -> Tuple[List[str], List[str]]:
+    """(sin uso, sobrantes): ningún plan los usa / al quitarlos ningún plan gana marcas.
+
+    Solo en tablas con SPARE_MIN_ROWS filas o más: con menos, cualquier plan vale."""
+    big = {t for t, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+           if conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] >= SPARE_MIN_ROWS}
+    idx = {n: v for n, v in indexes(conn).items() if not n.startswith("sqlite_autoindex") and v[0] in big}
+    used = {i for r in results.values() for i in used_indexes(r.plan)}
+    tables = {r.shape.table for r in results.values()}
+    never = sorted(n for n, (t, _, _) in idx.items() if t in tables and n not in used)
+    spare = []
+    for name in sorted(n for n in idx if n in used):
+        conn.execute("SAVEPOINT spare")
+        try:
+            conn.execute(f'DROP INDEX "{name}"')
+            worse = any(len(flags(plan(conn, r.shape, r.shape.params(smp)))) > len(r.flags)
+                        for r in results.values() if name in used_indexes(r.plan))
+        finally:
+            conn.execute("ROLLBACK TO spare")
+            conn.execute("RELEASE spare")
+        if not worse:
+            spare.append(name)
+    return never, spare
+
+
+# ---------- informe ----------
+def _missing_schema(conn: sqlite3.Connection) -> List[str]:
+    """Tablas/columnas de SHAPES que no están (DB de antes de init_db)."""
+    tables = {t for t, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    out = sorted({sh.table for sh in SHAPES if sh.table and sh.table not in tables})
+    if "product_category" in tables and \
+            "product_pk" not in {r[1] for r in conn.execute("PRAGMA table_info(product_category)")}:
+        out.append("product_category.product_pk")
+    return out
+
+
+def _copy(src: Path, dst: Path) -> None:
+    s, d = sqlite3.connect(f"file:{src.as_posix()}?mode=ro", uri=True), sqlite3.connect(dst)
+    try:
+        s.backup(d)
+    finally:
+        s.close()
+        d.close()
+
+
+def report(before: Dict[str, Result], after: Dict[str, Result]) -> None:
+    print(f"{'consulta':30} {'antes ms':>9} {'después':>9} {'cambio':>7}  marcas antes → después")
+    for name, b in before.items():
+        a = after[name]
+        ch = f"{(a.ms - b.ms) / b.ms:+.0%}" if b.ms else ""
+        if a.plan == b.plan and not _clearly_less(a.t, b.t) and not _clearly_less(b.t, a.t):
+            ch = "≈"   # mismo plan y diferencia dentro del ruido
+        mark = ", ".join(b.flags) or "—"
+        if a.flags != b.flags:
+            mark += " → " + (", ".join(a.flags) or "—")
+        print(f"{name:30} {b.ms:9.2f} {a.ms:9.2f} {ch:>7}  {mark}{' (a propósito)' if b.shape.full_ok and b.flags else ''}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Planes de las consultas de la app, ANALYZE y consejos de índices")
+    ap.add_argument("--db", type=Path, help="DB a diagnosticar (por defecto la de pagina_web.db)")
+    ap.add_argument("--repeat", type=int, default=31, help="mediana de N ejecuciones")
+    ap.add_argument("--apply", action="store_true", help="ANALYZE y crea los índices sugeridos en la DB")
+    ap.add_argument("--plans", action="store_true", help="imprime el plan completo de cada consulta")
+    args = ap.parse_args()
+    if args.db is None:
+        from .db import db_path
+        args.db = db_path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "planner.db"
+        _copy(args.db, path)
+        # sin caché de sentencias: un EXPLAIN ya preparado no ve los índices que se crean/quitan después
+        conn = sqlite3.connect(path, cached_statements=0)
+        missing = _missing_schema(conn)
+        if missing:
+            conn.close()
+            print(f"{args.db}: falta {', '.join(missing)}; la web lo crea/migra al arrancar "
+                  f"(o python -c \"from pagina_web.db import init_db; init_db()\")")
+            return 1
+        smp = samples(conn)
+        had_stats = bool(conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone())
+        before = measure(conn, smp, args.repeat)
+        t0 = time.perf_counter()
+        analyze(conn)
+        analyze_ms = (time.perf_counter() - t0) * 1000
+        analyzed = measure(conn, smp, args.repeat)
+        advice = advise(conn, analyzed, smp, args.repeat)
+        for a in advice:
+            conn.execute(a.sql)
+        analyze(conn)
+        after = measure(conn, smp, args.repeat)
+        # todos juntos, como en _regressions(): ninguna consulta con más marcas, ni con otro plan y
+        # claramente más lenta (las escrituras pagan el mantenimiento del índice; eso se da por bueno)
+        worse = [n for n, a in after.items() if len(a.flags) > len(analyzed[n].flags)
+                 or (a.plan != analyzed[n].plan and not a.shape.write
+                     and _clearly_less(analyzed[n].t, a.t))] if advice else []
+        never, spare = unused(conn, after, smp)
+        idx = indexes(conn)
+        conn.close()
+
+    if args.plans:
+        for name, r in after.items():
+            print(f"{name}:\n  " + "\n  ".join(r.plan))
+    print(f"{args.db}: {'con' if had_stats else 'sin'} estadísticas (sqlite_stat1); "
+          f"ANALYZE + PRAGMA optimize {analyze_ms:.0f} ms; después = con ANALYZE"
+          + (f" y {len(advice)} índices sugeridos" if advice else ""))
+    report(before, after)
+    print()
+    for a in advice:
+        # los que ya nadie usa y el nuevo cubre (mismas primeras columnas): se pueden quitar
+        new = idx.get(a.index, ("", [], False))
+        replaces = [n for n in never if idx[n][0] == new[0] and new[1][:len(idx[n][1])] == idx[n][1]]
+        print(f"💡 {a.shape}: {a.before_ms:.2f} → {a.after_ms:.2f} ms "
+              f"({', '.join(a.flags_before)} → {', '.join(a.flags_after) or '—'})\n   {a.sql};"
+              + (f"\n   (sustituye a {', '.join(replaces)})" if replaces else ""))
+    if not advice:
+        print("✅ Ningún índice nuevo gana lo suficiente")
+    if never:
+        print(f"🗑  Sin uso en estas consultas: {', '.join(never)}")
+    if spare:
+        print(f"🗑  Sobrantes (quitarlos no empeora ningún plan): {', '.join(spare)}")
+
+    if worse:
+        print(f"⚠️  Con todos los índices sugeridos empeora {', '.join(worse)}: --apply no los crea")
+        advice = []
+    if args.apply:
+        with sqlite3.connect(args.db) as conn:
+            for a in advice:
+                conn.execute(a.sql)
+            analyze(conn)
+        print(f"✅ {args.db}: ANALYZE" + (f" + {len(advice)} índices creados" if advice else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
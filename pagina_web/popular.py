@@ -0,0 +1,148 @@
+# pagina_web/popular.py – resultados precalculados de las búsquedas más frecuentes
+#
+# Unas pocas búsquedas (leche, pan, huevos, aceite, agua…) son casi todo el tráfico.
+# - Cada búsqueda se cuenta normalizada (mismos tokens ⇒ mismo resultado) y los
+#   contadores se vuelcan por día a la tabla query_stat: sobreviven reinicios y
+#   se suman entre workers.
+# - Para las TOP_N más buscadas de los últimos WINDOW_DAYS se guarda en memoria
+#   la lista completa de ROWIDs en cada orden (todas las tiendas; el filtro por
+#   tienda se aplica al servir, no cambia el orden).
+# - Se rematerializa en segundo plano cuando cambia la generación del catálogo
+#   (tras cada recarga) y cada REFRESH_S, recogiendo los cambios del ranking.
+#
+# BARATAZO_POPULAR_TOP=0 desactiva la caché (los contadores siguen).
+
+import os, threading, time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from .utils import tokens
+
+TOP_N = int(os.getenv("BARATAZO_POPULAR_TOP", "50"))
+REFRESH_S = float(os.getenv("BARATAZO_POPULAR_REFRESH_S", "60"))
+WINDOW_DAYS = 7
+MIN_HITS = 3          # por debajo no compensa materializar
+
+# Órdenes que se materializan (los de /api/products; "fuzzy" = modo difuso)
+ORDERS = ("recientes", "relevancia", "fuzzy", "unit_asc", "unit_desc", "kg_asc", "kg_desc", "l_asc", "count_asc")
+
+# snapshot() → (generación, orden(query, orden) → ROWIDs), ambos del mismo catálogo
+Snapshot = Callable[[], Tuple[int, Callable[[str, str], np.ndarray]]]
+
+
+def query_key(q: Optional[str]) -> str:
+    """Forma canónica de una búsqueda: el buscador solo mira sus tokens."""
+    return " ".join(tokens(q))
+
+
+class PopularCache:
+    def __init__(self, engine, snapshot: Snapshot, top_n: int = TOP_N,
+                 refresh_s: float = REFRESH_S, min_hits: int = MIN_HITS):
+        self.engine = engine
+        self._snapshot = snapshot
+        self.top_n, self.refresh_s, self.min_hits = top_n, refresh_s, min_hits
+        self._lock = threading.Lock()
+        self._pending: Counter = Counter()          # aún sin volcar a query_stat
+        self._entries: Dict[Tuple[str, str], np.ndarray] = {}
+        self._generation: Optional[int] = None
+        self._top: List[str] = []
+        self._last_refresh = float("-inf")
+        self._refreshing = False
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- servir ----------
+    def record(self, key: str) -> None:
+        if key:
+            with self._lock:
+                self._pending[key] += 1
+
+    def get(self, key: str, order: str, generation: int) -> Optional[np.ndarray]:
+        """ROWIDs materializados de (búsqueda, orden), o None si no están o son de otra generación."""
+        with self._lock:
+            arr = self._entries.get((key, order)) if generation == self._generation else None
+            if arr is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return arr
+
+    def maybe_refresh(self, generation: int) -> None:
+        """Lanza la rematerialización si cambió el catálogo o toca por tiempo (no bloquea)."""
+        if self.top_n <= 0:
+            return
+        with self._lock:
+            due = generation != self._generation or time.monotonic() - self._last_refresh >= self.refresh_s
+            if not due or self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True, name="popular-refresh").start()
+
+    # ---------- contadores ----------
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        today = date.today().isoformat()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("""
+                    INSERT INTO query_stat(query, day, hits) VALUES (:q, :day, :n)
+                    ON CONFLICT(query, day) DO UPDATE SET hits = hits + excluded.hits
+                """), [{"q": q, "day": today, "n": n} for q, n in pending.items()])
+        except Exception:
+            with self._lock:           # DB ocupada (recarga en curso): se reintenta en el próximo volcado
+                self._pending.update(pending)
+            raise
+
+    def top_queries(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        since = (date.today() - timedelta(days=WINDOW_DAYS - 1)).isoformat()
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT query, SUM(hits) AS hits FROM query_stat
+                 WHERE day >= :since
+                 GROUP BY query HAVING SUM(hits) >= :min_hits
+                 ORDER BY hits DESC, query LIMIT :n
+            """), {"since": since, "min_hits": self.min_hits, "n": n or self.top_n}).all()
+        return [(r[0], int(r[1])) for r in rows]
+
+    # ---------- materialización ----------
+    def _refresh(self) -> None:
+        try:
+            self.flush()
+            top = [q for q, _ in self.top_queries()]
+            gen, order = self._snapshot()
+            with self._lock:
+                old = self._entries if gen == self._generation else {}
+            # Las que siguen en el top y son de esta generación se reutilizan
+            entries = {}
+            for q in top:
+                for o in ORDERS:
+                    arr = old.get((q, o))
+                    entries[(q, o)] = arr if arr is not None else order(q, o)
+            with self._lock:
+                self._entries, self._generation, self._top = entries, gen, top
+        except Exception as e:
+            print(f"⚠️ No se pudo refrescar la caché de búsquedas populares: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._last_refresh = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "generation": self._generation,
+                "queries": list(self._top),
+                "entries": len(self._entries),
+                "rowids": int(sum(a.size for a in self._entries.values())),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+            }
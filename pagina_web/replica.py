@@ -0,0 +1,190 @@
+# pagina_web/replica.py – réplica de solo lectura del catálogo para la web (BARATAZO_REPLICA=1)
+#
+# Tras cada recarga, el loader copia baratazo.db con la API de backup de SQLite (una lectura
+# coherente), deja solo las tablas del catálogo, la pasa por ANALYZE + VACUUM y la publica
+# como <dir>/catalog-g<generación>.db: se escribe con otro nombre y se renombra al final,
+# así que un fichero publicado está siempre completo y no cambia nunca más.
+# <dir> = BARATAZO_REPLICA_DIR, o db/replica junto a la base.
+#
+# La web lee product/category de ahí (db.catalog_engine) abriendo la réplica con
+# mode=ro&immutable=1: sin bloqueos de SQLite, así que ni la carga en curso (borrado +
+# inserción de una tienda) ni su escritura la frenan ni se ven a medias. Un hilo mira la
+# generación de la DB principal cada POLL_S; cuando sube, abre la réplica nueva y suelta la
+# anterior (las peticiones en curso terminan con sus conexiones). Publicación, .lock y
+# limpieza de generaciones viejas: pagina_web/genfiles.py, como la instantánea compartida.
+# Listas, vigilancias y contadores siguen en la DB principal.
+#
+#   python -m pagina_web.replica    # publica la réplica de la generación actual
+
+import os, sqlite3, threading, time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from sqlalchemy import create_engine
+
+from . import genfiles
+
+POLL_S = float(os.getenv("BARATAZO_REPLICA_POLL_S", "1.0"))
+CATALOG_TABLES = ("product", "category", "product_category", "catalog_meta")
+
+
+def replica_enabled() -> bool:
+    return os.getenv("BARATAZO_REPLICA", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def replica_dir() -> Path:
+    env = os.getenv("BARATAZO_REPLICA_DIR")
+    if env:
+        return Path(env)
+    from .db import db_path
+    return db_path.parent / "replica"
+
+
+def replica_path(generation: int, directory: Optional[Path] = None) -> Path:
+    return genfiles.gen_path(directory or replica_dir(), generation, ".db")
+
+
+def _generation(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'generation'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def build(source: Path, directory: Path) -> Path:
+    """Copia `source` (backup API), deja el catálogo, ANALYZE + VACUUM y la publica."""
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / f"catalog-build-{os.getpid()}-{threading.get_ident()}.tmp"
+    src = sqlite3.connect(f"file:{source.as_posix()}?mode=ro", uri=True)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst)   # una transacción de lectura: la copia es de una sola generación
+        src.close()
+        gen = _generation(dst)
+        tables = [r[0] for r in dst.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        for t in tables:
+            if t not in CATALOG_TABLES:
+                dst.execute(f'DROP TABLE "{t}"')
+        dst.commit()
+        dst.execute("ANALYZE")   # estadísticas frescas: el planificador elige bien los índices
+        dst.commit()
+        dst.execute("VACUUM")
+        dst.close()
+        path = replica_path(gen, directory)
+        os.replace(tmp, path)    # publicación atómica: nadie tiene abierto ese nombre aún
+        return path
+    except BaseException:
+        src.close()
+        dst.close()
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def publish(engine, directory: Optional[Path] = None) -> Path:
+    """Deja en disco la réplica de la generación actual (si ya está, no hace nada)."""
+    from .db import db_path, get_generation
+    with engine.connect() as conn:
+        gen = get_generation(conn)
+    return genfiles.publish(directory or replica_dir(), gen, ".db", lambda d: build(db_path, d))
+
+
+def open_replica(path: Path):
+    # immutable=1: SQLite no toma bloqueos ni mira si el fichero cambia (no cambia nunca)
+    return create_engine(f"sqlite:///file:{path.as_posix()}?mode=ro&immutable=1&uri=true",
+                         connect_args={"check_same_thread": False})
+
+
+class CatalogEngine:
+    """Engine de lectura del catálogo: la réplica vigente con BARATAZO_REPLICA=1, si no la principal.
+
+    Se usa como un Engine (connect/begin). La primera vez arranca el hilo que sigue la generación.
+    """
+
+    def __init__(self, primary, poll_s: float = POLL_S, enabled: Optional[bool] = None):
+        self.primary = primary
+        self.poll_s = poll_s
+        self.enabled = replica_enabled() if enabled is None else enabled
+        self.generation: Optional[int] = None
+        self.path: Optional[Path] = None
+        self._engine = None
+        self._hooks: List[Callable] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- como un Engine ----------
+    def connect(self):
+        return self.current().connect()
+
+    def begin(self):
+        return self.current().begin()
+
+    def on_open(self, hook: Callable) -> None:
+        """hook(engine) para cada engine de réplica que se abra (p. ej. métricas de SQL)."""
+        self._hooks.append(hook)
+        if self._engine is not None:
+            hook(self._engine)
+
+    def current(self):
+        if not self.enabled:
+            return self.primary
+        if self._engine is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._watch, daemon=True, name="replica-watch")
+                    self._thread.start()
+                    self.refresh()
+        # sin réplica todavía (otro proceso la está construyendo): la principal
+        return self._engine or self.primary
+
+    # ---------- renovación ----------
+    def _next(self, gen: int) -> Optional[Path]:
+        """Réplica de la generación `gen`; None si otro proceso la está publicando."""
+        path = replica_path(gen)
+        return genfiles.publish_once(path, lambda: publish(self.primary, path.parent))
+
+    def refresh(self) -> Optional[bool]:
+        """Cambia de réplica si subió la generación. True si hubo cambio, None si aún no se pudo."""
+        from .db import get_generation
+        with self.primary.connect() as conn:
+            gen = get_generation(conn)
+        if self.generation == gen and self._engine is not None:
+            return False
+        path = self._next(gen)
+        if path is None:
+            return None
+        new = open_replica(path)
+        for hook in self._hooks:
+            hook(new)
+        old, self._engine = self._engine, new   # cambio atómico: las conexiones abiertas siguen con la anterior
+        self.generation, self.path = genfiles.generation_of(path), path
+        if old is not None:
+            old.dispose()
+        print(f"📚 Réplica del catálogo: generación {self.generation} ({path.stat().st_size / 1e6:.1f} MB)")
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ No se pudo renovar la réplica del catálogo: {e}")
+
+
+def publish_if_enabled(engine) -> None:
+    """Para el loader: tras una recarga, publica la réplica si la web lee de ella."""
+    if replica_enabled():
+        genfiles.publish_after_load(lambda: publish(engine), "réplica del catálogo", "📚")
+
+
+if __name__ == "__main__":
+    from .db import engine, init_db
+    init_db()
+    t0 = time.perf_counter()
+    p = publish(engine)
+    print(f"✅ {p} ({p.stat().st_size / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s)")
@@ -0,0 +1,409 @@
+import hashlib
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .utils import normalize, tokens, _token_match
+
+
+# Sinónimos / traducciones (es <-> ca). Cada grupo son formas ya normalizadas
+# (sin tildes, minúsculas) que se consideran equivalentes al buscar.
+SYNONYM_GROUPS: List[Set[str]] = [
+    {"queso", "quesos", "formatge", "formatges"},
+    {"leche", "llet"},
+    {"pan", "pa"},
+    {"huevo", "huevos", "ou", "ous"},
+    {"aceite", "oli"},
+    {"agua", "aigua"},
+    {"pollo", "pollastre"},
+    {"vino", "vinos", "vi", "vins"},
+    {"cerveza", "cervezas", "cervesa", "cerveses"},
+    {"yogur", "yogures", "iogurt", "iogurts"},
+    {"mantequilla", "mantega"},
+    {"azucar", "sucre"},
+    {"arroz", "arros"},
+    {"tomate", "tomates", "tomaquet", "tomaquets"},
+    {"manzana", "manzanas", "poma", "pomes"},
+    {"naranja", "naranjas", "taronja", "taronges"},
+    {"platano", "platanos", "platan", "platans"},
+    {"jamon", "pernil"},
+    {"atun", "tonyina"},
+    {"galleta", "galletas", "galeta", "galetes"},
+    {"patata", "patatas", "patates"},
+    {"zumo", "suc"},
+    {"pescado", "peix"},
+    {"carne", "carn"},
+    {"cebolla", "ceba"},
+    {"fresa", "fresas", "maduixa", "maduixes"},
+    {"harina", "farina"},
+    {"limpiador", "netejador"},
+]
+
+# SymSpell: solo se indexan los borrados del prefijo (acota memoria y tiempo)
+PREFIX_LEN = 7
+
+# Ranking tipo BM25 (títulos cortos → saturación y normalización suaves)
+BM25_K1 = 1.2
+BM25_B = 0.5
+POS_DECAY = 0.5        # peso del token según posición: 1 / (1 + POS_DECAY * pos)
+PARTIAL_WEIGHT = 0.6   # "semi" ⊂ "semidesnatada" puntúa menos que un token exacto
+
+
+def pack_strings(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Textos → (blob UTF-8 uint8, offsets int64)."""
+    enc = [(v or "").encode("utf-8") for v in values]
+    offsets = np.zeros(len(enc) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in enc], out=offsets[1:])
+    return np.frombuffer(b"".join(enc), dtype=np.uint8), offsets
+
+
+def unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = blob.tobytes()
+    off = offsets.tolist()
+    return [raw[off[i]:off[i + 1]].decode("utf-8") for i in range(len(off) - 1)]
+
+
+def _stable_hash(s: str) -> int:
+    # hash() de Python cambia entre procesos; este no (el índice se comparte entre workers)
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _build_synonyms(groups: Iterable[Set[str]]) -> Dict[str, Set[str]]:
+    out: Dict[str, Set[str]] = {}
+    for g in groups:
+        norm = {normalize(w) for w in g if normalize(w)}
+        for w in norm:
+            out.setdefault(w, set()).update(norm - {w})
+    return out
+
+
+SYNONYMS = _build_synonyms(SYNONYM_GROUPS)
+
+
+def max_distance(tok: str) -> int:
+    """
+    Distancia de edición tolerada según longitud:
+    - cortas (<=3): ninguna  → pan ≠ par
+    - medias (4-7): 1        → yougur ~ yogur, chorico ~ chorizo
+    - largas (>=8): 2
+    """
+    n = len(tok)
+    if n <= 3:
+        return 0
+    if n <= 7:
+        return 1
+    return 2
+
+
+def _deletes(word: str, max_d: int) -> Set[str]:
+    """Todas las variantes de `word` con hasta `max_d` borrados (incluida la propia)."""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_d):
+        nxt: Set[str] = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= out
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Damerau-Levenshtein (OSA) con corte: devuelve `limit + 1` en cuanto se
+    sabe que la distancia supera `limit`.
+    """
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if abs(la - lb) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(lb + 1))
+    for i in range(1, la + 1):
+        cur = [i] + [0] * lb
+        row_min = cur[0]
+        for j in range(1, lb + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[lb] if prev[lb] <= limit else limit + 1
+
+
+class SearchIndex:
+    """
+    Índice en memoria sobre los títulos del catálogo.
+
+    - Vocabulario de tokens (utils.tokens) con listas de apariciones por doc.
+    - Índice de borrados tipo SymSpell sobre el vocabulario para tolerar erratas.
+
+    El coste de expandir una búsqueda depende del tamaño del vocabulario, no del
+    número de productos; luego solo se recorren los docs que contienen los
+    tokens candidatos.
+    """
+
+    # Arrays que definen el índice por completo: se pueden volcar a fichero y
+    # mapear desde varios procesos sin copiarlos (pagina_web/snapshot.py).
+    ARRAYS = ("rowids", "store_codes", "store_blob", "store_off", "doc_ptr", "doc_tok", "doc_pos",
+              "post_ptr", "post_docs", "vocab_blob", "vocab_off", "del_keys", "del_tids")
+
+    def __init__(self, docs: Iterable[Tuple[int, str, str]]):
+        # docs: (rowid, title, store)
+        rowids: List[int] = []
+        stores: List[str] = []
+        doc_tokens: List[List[int]] = []
+        vocab: List[str] = []
+        tid_of: Dict[str, int] = {}
+        postings: List[List[int]] = []
+
+        for rowid, title, store in docs:
+            d = len(rowids)
+            rowids.append(int(rowid))
+            stores.append(store or "")
+            tids: List[int] = []
+            for t in tokens(title):
+                tid = tid_of.get(t)
+                if tid is None:
+                    tid = len(vocab)
+                    tid_of[t] = tid
+                    vocab.append(t)
+                    postings.append([])
+                tids.append(tid)
+                p = postings[tid]
+                if not p or p[-1] != d:
+                    p.append(d)
+            doc_tokens.append(tids)
+
+        # --- Todo a arrays: CSR doc → tokens y token → docs ---
+        n_docs = len(rowids)
+        a: Dict[str, np.ndarray] = {"rowids": np.asarray(rowids, dtype=np.int64)}
+        names = sorted(set(stores))
+        code = {st: i for i, st in enumerate(names)}
+        a["store_codes"] = np.fromiter((code[st] for st in stores), dtype=np.uint8, count=n_docs)
+        a["store_blob"], a["store_off"] = pack_strings(names)
+        lens = np.fromiter((len(t) for t in doc_tokens), dtype=np.int64, count=n_docs)
+        a["doc_ptr"] = np.zeros(n_docs + 1, dtype=np.int64)
+        np.cumsum(lens, out=a["doc_ptr"][1:])
+        total = int(a["doc_ptr"][-1])
+        a["doc_tok"] = np.fromiter((t for ts in doc_tokens for t in ts), dtype=np.int32, count=total)
+        a["doc_pos"] = np.fromiter((i for ts in doc_tokens for i in range(len(ts))), dtype=np.int32, count=total)
+        plens = np.fromiter((len(p) for p in postings), dtype=np.int64, count=len(vocab))
+        a["post_ptr"] = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(plens, out=a["post_ptr"][1:])
+        a["post_docs"] = np.fromiter((d for p in postings for d in p), dtype=np.int32, count=int(plens.sum()))
+        a["vocab_blob"], a["vocab_off"] = pack_strings(vocab)
+
+        # Borrados SymSpell: hash estable del borrado → tid (ordenado, se busca con searchsorted)
+        dels: List[Tuple[int, int]] = []
+        for tid, w in enumerate(vocab):
+            d = max_distance(w)
+            if d == 0:
+                continue
+            dels.extend((_stable_hash(v), tid) for v in _deletes(w[:PREFIX_LEN], d))
+        dels.sort()
+        a["del_keys"] = np.fromiter((k for k, _ in dels), dtype=np.uint64, count=len(dels))
+        a["del_tids"] = np.fromiter((t for _, t in dels), dtype=np.int32, count=len(dels))
+        self._attach(a)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "SearchIndex":
+        """Índice sobre arrays ya construidos (p. ej. mapeados de un fichero); no los copia."""
+        ix = cls.__new__(cls)
+        ix._attach(arrays)
+        return ix
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return dict(self._arrays)
+
+    def _attach(self, a: Dict[str, np.ndarray]) -> None:
+        # Lo que crece con el nº de productos se queda en los arrays; en Python solo
+        # queda lo que crece con el vocabulario.
+        self._arrays = a
+        self._rowids_np = a["rowids"]
+        self._store_codes = a["store_codes"]
+        self.store_names = unpack_strings(a["store_blob"], a["store_off"])
+        self._doc_ptr, self._doc_tok, self._doc_pos = a["doc_ptr"], a["doc_tok"], a["doc_pos"]
+        lens = np.diff(self._doc_ptr)
+        n_docs = lens.size
+        self._doc_len = lens.astype(np.float32)
+        self._avg_len = float(lens.mean()) if n_docs else 1.0
+        self.vocab: List[str] = unpack_strings(a["vocab_blob"], a["vocab_off"])
+        self._tid: Dict[str, int] = {t: i for i, t in enumerate(self.vocab)}
+        ptr, docs = a["post_ptr"], a["post_docs"]
+        self._post_np = [docs[ptr[t]:ptr[t + 1]] for t in range(len(self.vocab))]
+        df = np.diff(ptr).astype(np.float64)
+        # IDF por token del vocabulario (variante BM25, siempre > 0)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self._del_keys, self._del_tids = a["del_keys"], a["del_tids"]
+
+    def __len__(self) -> int:
+        return int(self._rowids_np.size)
+
+    def _deleted_tids(self, v: str) -> np.ndarray:
+        k = np.uint64(_stable_hash(v))
+        lo = np.searchsorted(self._del_keys, k, side="left")
+        hi = np.searchsorted(self._del_keys, k, side="right")
+        return self._del_tids[lo:hi]
+
+    def _store_codes_for(self, stores: Sequence[str]) -> List[int]:
+        want = set(stores)
+        return [i for i, st in enumerate(self.store_names) if st in want]
+
+    # ---------- expansión de tokens ----------
+    def _exact_tids(self, q: str) -> Set[int]:
+        """Tokens del vocabulario que casan con `q` según la regla de matches_query."""
+        if len(q) <= 3:
+            tid = self._tid.get(q)
+            return {tid} if tid is not None else set()
+        return {tid for tid, t in enumerate(self.vocab) if _token_match(q, t)}
+
+    def expand_fuzzy(self, q: str) -> Dict[int, int]:
+        """
+        token de búsqueda → {tid: distancia}. Incluye coincidencias exactas /
+        substring (0), sinónimos/traducciones (0) y erratas dentro de max_distance.
+        """
+        out: Dict[int, int] = {}
+        for w in {q} | SYNONYMS.get(q, set()):
+            for tid in self._exact_tids(w):
+                out[tid] = 0
+
+        d = max_distance(q)
+        if d == 0:
+            return out
+        seen: Set[int] = set()
+        for v in _deletes(q[:PREFIX_LEN], d):
+            for tid in self._deleted_tids(v).tolist():
+                if tid in out or tid in seen:
+                    continue
+                seen.add(tid)
+                dist = edit_distance(q, self.vocab[tid], d)
+                if dist <= d:
+                    out[tid] = dist
+        return out
+
+    # ---------- búsqueda ----------
+    def _store_ok(self, stores: Optional[Sequence[str]]):
+        if not stores:
+            return lambda d: True
+        codes = set(self._store_codes_for(stores))
+        sc = self._store_codes
+        return lambda d: int(sc[d]) in codes
+
+    def search_fuzzy(self, query: str, stores: Optional[Sequence[str]] = None) -> List[int]:
+        """
+        Devuelve ROWIDs ordenados por relevancia difusa:
+        1) más tokens de la búsqueda cubiertos,
+        2) menor distancia de edición total,
+        3) más recientes (ROWID mayor).
+        """
+        q_tokens = tokens(query)
+        if not q_tokens:
+            return []
+        store_ok = self._store_ok(stores)
+
+        # doc → [tokens cubiertos, distancia acumulada]
+        acc: Dict[int, List[int]] = {}
+        for q in q_tokens:
+            best: Dict[int, int] = {}
+            for tid, dist in self.expand_fuzzy(q).items():
+                for d in self._post_np[tid].tolist():
+                    if dist < best.get(d, 99):
+                        best[d] = dist
+            for d, dist in best.items():
+                a = acc.get(d)
+                if a is None:
+                    acc[d] = [1, dist]
+                else:
+                    a[0] += 1
+                    a[1] += dist
+
+        hits = [(d, a[0], a[1]) for d, a in acc.items() if store_ok(d)]
+        rowids = self._rowids_np
+        hits.sort(key=lambda h: (-h[1], h[2], -int(rowids[h[0]])))
+        return [int(rowids[d]) for d, _, _ in hits]
+
+    # ---------- ranking por relevancia ----------
+    def candidates(self, query: str, stores: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Docs (índices internos) que cumplen matches_query(title, query): todas las
+        palabras de la búsqueda casan con algún token del título.
+        """
+        q_tokens = tokens(query)
+        if not q_tokens:
+            return np.arange(len(self), dtype=np.int32)
+        docs: Optional[np.ndarray] = None
+        for q in q_tokens:
+            tids = self._exact_tids(q)
+            if not tids:
+                return np.empty(0, dtype=np.int32)
+            hit = np.unique(np.concatenate([self._post_np[t] for t in tids]))
+            docs = hit if docs is None else np.intersect1d(docs, hit, assume_unique=True)
+            if docs.size == 0:
+                return docs
+        if stores:
+            docs = docs[np.isin(self._store_codes[docs], self._store_codes_for(stores))]
+        return docs
+
+    def score(self, query: str, docs: np.ndarray) -> np.ndarray:
+        """
+        Puntuación BM25 vectorizada sobre `docs`. Por cada palabra de la búsqueda
+        se toma el mejor token del título, ponderado por:
+        - IDF del token,
+        - exacto (1.0) vs substring (PARTIAL_WEIGHT),
+        - posición en el título (antes = mejor),
+        y se aplica la saturación/normalización por longitud de BM25.
+        """
+        scores = np.zeros(docs.size, dtype=np.float32)
+        q_tokens = tokens(query)
+        if docs.size == 0 or not q_tokens:
+            return scores
+
+        # Aplana los tokens de los docs candidatos (segmentos contiguos)
+        starts = self._doc_ptr[docs]
+        lens = self._doc_ptr[docs + 1] - starts
+        seg_starts = np.zeros(docs.size, dtype=np.int64)
+        np.cumsum(lens[:-1], out=seg_starts[1:])
+        flat = np.arange(int(lens.sum()), dtype=np.int64) - np.repeat(seg_starts - starts, lens)
+        tok = self._doc_tok[flat]
+        pos_w = 1.0 / (1.0 + POS_DECAY * self._doc_pos[flat].astype(np.float32))
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._doc_len[docs] / self._avg_len)
+
+        w = np.zeros(len(self.vocab), dtype=np.float32)
+        for q in q_tokens:
+            w[:] = 0.0
+            for tid in self._exact_tids(q):
+                w[tid] = self.idf[tid] * (1.0 if self.vocab[tid] == q else PARTIAL_WEIGHT)
+            hit_w = w[tok]
+            best = np.maximum.reduceat(hit_w * pos_w, seg_starts)
+            tf = np.add.reduceat((hit_w > 0).astype(np.float32), seg_starts)
+            scores += best * (tf * (BM25_K1 + 1.0)) / (tf + norm)
+        return scores
+
+    def rowids_of(self, docs: np.ndarray) -> np.ndarray:
+        """ROWIDs de los docs internos `docs`."""
+        return self._rowids_np[docs]
+
+    def in_stores(self, rowids: np.ndarray, stores: Sequence[str]) -> np.ndarray:
+        """Máscara: qué `rowids` (todos del índice) son de alguna de `stores`."""
+        docs = np.searchsorted(self._rowids_np, rowids)
+        return np.isin(self._store_codes[docs], self._store_codes_for(stores))
+
+    def search_ranked(self, query: str, stores: Optional[Sequence[str]] = None) -> List[int]:
+        """ROWIDs que cumplen matches_query, de más a menos relevante (empate → más reciente)."""
+        docs = self.candidates(query, stores)
+        if docs.size == 0:
+            return []
+        scores = self.score(query, docs)
+        order = np.lexsort((-self._rowids_np[docs], -scores))
+        return self._rowids_np[docs[order]].tolist()
@@ -0,0 +1,412 @@
+# pagina_web/snapshot.py – catálogo en memoria, en columnas, para servir /api/products sin SQLite
+#
+# Modo opcional (BARATAZO_SNAPSHOT). Al arrancar y tras cada recarga se lee `product`
+# una vez y se guarda en arrays de NumPy:
+#   - textos (id, título, imagen) en un blob UTF-8 + offsets (un array por columna, no objetos)
+#   - tienda como código (uint8) + tabla de nombres
+#   - precios en float32 (NaN = sin dato)
+#   - permutaciones ya ordenadas por cada orden de precio y "recientes", y su inversa
+#     (rango) para ordenar subconjuntos (resultados de q) con un argsort pequeño
+#   - tokens por producto: los arrays del SearchIndex construido con las mismas filas
+# Una petición = máscaras booleanas + cortes de permutaciones; nada de SQL.
+#
+#   BARATAZO_SNAPSHOT=1       cada proceso construye la suya en memoria
+#   BARATAZO_SNAPSHOT=shared  (uvicorn --workers N) la instantánea se escribe una vez en
+#                             <dir>/catalog-g<generación>.bin y cada worker la mapea (mmap,
+#                             solo lectura): las páginas las comparte el sistema operativo,
+#                             así que la memoria no crece con el nº de workers.
+#                             <dir> = BARATAZO_SNAPSHOT_DIR, o db/snapshot junto a la base.
+#
+# Un hilo vigila la generación del catálogo (catalog_meta, la sube el loader) cada POLL_S;
+# si cambia, prepara la nueva instantánea aparte y la cambia de golpe (una asignación):
+# las peticiones en curso siguen con la anterior. En modo shared el fichero lo publica
+# el loader al acabar (publish()); si falta, lo construye el primer worker que lo
+# necesita (fichero .lock) y el resto sigue con la anterior hasta que aparezca.
+#
+#   python -m pagina_web.snapshot    # publica la instantánea de la generación actual
+
+import json, mmap, os, re, threading, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from . import genfiles
+from .db import get_generation
+from .search import SearchIndex, pack_strings, unpack_strings
+
+POLL_S = float(os.getenv("BARATAZO_SNAPSHOT_POLL_S", "1.0"))
+
+# orden → (columna, descendente). Sin precio para esa medida (NULL o 0) → al final,
+# nunca con el precio de otra medida. Empates → más reciente.
+PRICE_ORDERS: Dict[str, Tuple[str, bool]] = {
+    "unit_asc": ("price_unit", False),
+    "unit_desc": ("price_unit", True),
+    "kg_asc": ("price_kg", False),
+    "kg_desc": ("price_kg", True),
+    "l_asc": ("price_l", False),
+    "count_asc": ("price_unit_count", False),
+}
+PRICE_COLS = ("price_unit", "price_kg", "price_l", "price_unit_count")
+TEXT_COLS = ("id", "title", "image")
+# Claves de cada producto en /api/products (y su orden en el formato compacto)
+ITEM_FIELDS = ("id", "title", "price_unit", "price_kg", "price_l", "price_unit_count", "image", "store")
+ORDERS = ("recientes",) + tuple(PRICE_ORDERS)
+
+_SHARED_WITH_INDEX = ("rowids", "store_codes", "store_blob", "store_off")
+_MAGIC = b"BZSNAP01"
+_ALIGN = 64
+
+
+def snapshot_mode() -> str:
+    """'' (desactivado), 'memory' o 'shared'."""
+    v = os.getenv("BARATAZO_SNAPSHOT", "0").strip().lower()
+    if v == "shared":
+        return "shared"
+    return "memory" if v in ("1", "true", "yes", "on", "memory") else ""
+
+
+def snapshot_enabled() -> bool:
+    return snapshot_mode() != ""
+
+
+def snapshot_dir() -> Path:
+    env = os.getenv("BARATAZO_SNAPSHOT_DIR")
+    if env:
+        return Path(env)
+    from .db import db_path
+    return db_path.parent / "snapshot"
+
+
+def snapshot_path(generation: int, directory: Optional[Path] = None) -> Path:
+    return genfiles.gen_path(directory or snapshot_dir(), generation, ".bin")
+
+
+def price_key(v: np.ndarray, desc: bool) -> np.ndarray:
+    """Clave de orden ascendente: sin dato (NaN o <= 0) → +inf."""
+    return np.where(np.isnan(v) | (v <= 0), np.inf, -v if desc else v)
+
+
+# ========= Fichero: cabecera JSON + arrays alineados =========
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def write_arrays(path: Path, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+    """Escribe `arrays` en `path` (vía .tmp + os.replace: nadie ve un fichero a medias)."""
+    layout, end = {}, 0
+    for name, arr in arrays.items():
+        start = _aligned(end)
+        layout[name] = [arr.dtype.str, list(arr.shape), start]
+        end = start + arr.nbytes
+    header = json.dumps({"meta": meta, "arrays": layout}).encode("utf-8")
+    base = _aligned(len(_MAGIC) + 8 + len(header))
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, arr in arrays.items():
+            f.seek(base + layout[name][2])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(base + end)
+    os.replace(tmp, path)
+
+
+def map_arrays(path: Path) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Mapea `path` en solo lectura: los arrays apuntan a las páginas del fichero, sin copiar."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(_MAGIC)] != _MAGIC:
+        raise ValueError(f"{path} no es una instantánea del catálogo")
+    hlen = int.from_bytes(mm[len(_MAGIC):len(_MAGIC) + 8], "little")
+    header = json.loads(mm[len(_MAGIC) + 8:len(_MAGIC) + 8 + hlen].decode("utf-8"))
+    base = _aligned(len(_MAGIC) + 8 + hlen)
+    arrays = {}
+    for name, (dtype, shape, start) in header["arrays"].items():
+        count = int(np.prod(shape)) if shape else 1
+        arrays[name] = np.frombuffer(mm, dtype=np.dtype(dtype), count=count, offset=base + start).reshape(shape)
+    return arrays, header["meta"]
+
+
+# ========= Instantánea =========
+
+class CatalogSnapshot:
+    """Vista sobre un diccionario plano de arrays (propios o mapeados de un fichero)."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], generation: int,
+                 build_s: float = 0.0, source: str = "memory"):
+        self.arrays = arrays
+        self.generation = generation
+        self.build_s = build_s
+        self.source = source
+        self.rowids = arrays["rowids"]
+        self.n = int(self.rowids.size)
+        self.text = {c: (arrays[f"text.{c}.blob"], arrays[f"text.{c}.off"]) for c in TEXT_COLS}
+        self.store_names: List[str] = unpack_strings(arrays["store_blob"], arrays["store_off"])
+        self.store_codes = arrays["store_codes"]
+        self.prices = {c: arrays[f"price.{c}"] for c in PRICE_COLS}
+        self.perms = {o: arrays[f"perm.{o}"] for o in ORDERS}
+        self.ranks = {o: arrays[f"rank.{o}"] for o in ORDERS}
+        ix = {k: arrays[k] for k in _SHARED_WITH_INDEX}
+        ix.update((k[3:], v) for k, v in arrays.items() if k.startswith("ix."))
+        self.index = SearchIndex.from_arrays(ix)
+
+    @classmethod
+    def build(cls, rows: Sequence[Tuple], generation: int) -> "CatalogSnapshot":
+        # rows: (ROWID, id, title, image, store, *PRICE_COLS), ordenadas por ROWID
+        t0 = time.perf_counter()
+        n = len(rows)
+        a: Dict[str, np.ndarray] = {"rowids": np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)}
+        for i, c in enumerate(TEXT_COLS):
+            a[f"text.{c}.blob"], a[f"text.{c}.off"] = pack_strings([r[1 + i] for r in rows])
+        names = sorted({r[4] or "" for r in rows})
+        code = {s: i for i, s in enumerate(names)}
+        a["store_blob"], a["store_off"] = pack_strings(names)
+        a["store_codes"] = np.fromiter((code[r[4] or ""] for r in rows), dtype=np.uint8, count=n)
+
+        prices64 = {c: np.array([r[5 + i] for r in rows], dtype=np.float64) for i, c in enumerate(PRICE_COLS)}
+        for c, v in prices64.items():
+            a[f"price.{c}"] = v.astype(np.float32)
+
+        # Permutaciones: docs en cada orden (las claves en float64, igual que en modo SQL)
+        a["perm.recientes"] = np.arange(n - 1, -1, -1, dtype=np.int32)
+        for order, (col, desc) in PRICE_ORDERS.items():
+            a[f"perm.{order}"] = np.lexsort((-a["rowids"], price_key(prices64[col], desc))).astype(np.int32)
+        for order in ORDERS:
+            rank = np.empty(n, dtype=np.int32)
+            rank[a[f"perm.{order}"]] = np.arange(n, dtype=np.int32)
+            a[f"rank.{order}"] = rank
+
+        # El índice codifica rowids y tiendas igual: esos arrays no se guardan dos veces
+        for k, v in SearchIndex((r[0], r[2], r[4]) for r in rows).to_arrays().items():
+            if k not in _SHARED_WITH_INDEX:
+                a[f"ix.{k}"] = v
+        return cls(a, generation, build_s=time.perf_counter() - t0)
+
+    @classmethod
+    def load(cls, engine) -> "CatalogSnapshot":
+        # Generación y filas en la misma transacción de lectura: la instantánea es coherente
+        with engine.connect() as conn:
+            with conn.begin():
+                gen = get_generation(conn)
+                rows = conn.execute(text(
+                    f"SELECT ROWID, {', '.join(TEXT_COLS)}, store, {', '.join(PRICE_COLS)} "
+                    "FROM product ORDER BY ROWID"
+                )).all()
+        return cls.build(rows, gen)
+
+    @classmethod
+    def open(cls, path: Path) -> "CatalogSnapshot":
+        arrays, meta = map_arrays(path)
+        return cls(arrays, int(meta["generation"]), build_s=float(meta.get("build_s", 0.0)), source=str(path))
+
+    def save(self, path: Path) -> None:
+        write_arrays(path, self.arrays, {"generation": self.generation, "build_s": self.build_s})
+
+    # ---------- consultas ----------
+    def _store_table(self, stores: Sequence[str]) -> Optional[np.ndarray]:
+        """Tabla código de tienda → ¿pedida? (indexar con store_codes da la máscara)."""
+        if not stores:
+            return None
+        table = np.zeros(256, dtype=bool)
+        table[[i for i, s in enumerate(self.store_names) if s in set(stores)]] = True
+        return table
+
+    def _top(self, docs: np.ndarray, order: str, limit: int) -> np.ndarray:
+        """Los `limit` primeros de `docs` según la permutación de `order`."""
+        rank = self.ranks[order][docs]
+        if docs.size > limit:
+            part = np.argpartition(rank, limit)[:limit]
+            docs, rank = docs[part], rank[part]
+        return docs[np.argsort(rank)]
+
+    def select(self, q: Optional[str], stores: Sequence[str], sort: str, fuzzy: bool, limit: int,
+               offset: int = 0) -> np.ndarray:
+        """Docs a devolver, en orden; misma semántica que /api/products en modo SQL."""
+        has_q = bool(q and len(q.strip()) >= 2)
+        ranked = has_q and (fuzzy or sort == "relevancia")
+        order = sort if sort in PRICE_ORDERS else "recientes"
+
+        if ranked:
+            found = self.index.search_fuzzy(q, stores) if fuzzy else self.index.search_ranked(q, stores)
+            docs = np.searchsorted(self.rowids, np.asarray(found[offset:offset + limit], dtype=np.int64))
+            if sort in PRICE_ORDERS:   # la página (por relevancia), por precio (empate → relevancia)
+                col, desc = PRICE_ORDERS[sort]
+                docs = docs[np.argsort(price_key(self.prices[col][docs], desc), kind="stable")]
+            return docs
+        if offset:
+            return self.select(q, stores, sort, fuzzy, offset + limit)[offset:]
+        if has_q:
+            return self._top(self.index.candidates(q, stores), order, limit)
+        perm = self.perms[order]
+        table = self._store_table(stores)
+        if table is None:
+            return perm[:limit]
+        # Solo se filtra el trozo de la permutación necesario para llenar `limit`
+        out: List[np.ndarray] = []
+        need, start, step = limit, 0, max(4 * limit, 1024)
+        while need > 0 and start < self.n:
+            chunk = perm[start:start + step]
+            hit = chunk[table[self.store_codes[chunk]]][:need]
+            out.append(hit)
+            need -= hit.size
+            start += step
+            step *= 2
+        return np.concatenate(out) if out else perm[:0]
+
+    def columns(self, docs: np.ndarray, fields: Sequence[str] = ITEM_FIELDS) -> Dict[str, List[Any]]:
+        """Valores de `fields` para `docs`, por columna (solo se decodifican las pedidas)."""
+        cols: Dict[str, List[Any]] = {}
+        for c in fields:
+            if c in self.text:
+                blob, off = self.text[c]
+                starts, ends = off[docs].tolist(), off[docs + 1].tolist()
+                vals = [blob[a:b].tobytes().decode("utf-8") for a, b in zip(starts, ends)]
+                cols[c] = vals if c == "title" else [v or None for v in vals]
+            elif c in self.prices:
+                # float32 → float con los decimales de la DB (precios con <= 4)
+                vals = np.round(self.prices[c][docs].astype(np.float64), 4).tolist()
+                cols[c] = [None if v != v else v for v in vals]
+            elif c == "store":
+                cols[c] = [self.store_names[k] for k in self.store_codes[docs].tolist()]
+        return cols
+
+    def items(self, docs: np.ndarray, fields: Sequence[str] = ITEM_FIELDS) -> List[Dict[str, Any]]:
+        """Filas de la respuesta (mismas claves que el SELECT de /api/products)."""
+        cols = self.columns(docs, fields)
+        return [dict(zip(fields, row)) for row in zip(*(cols[c] for c in fields))]
+
+    def rows(self, docs: np.ndarray, fields: Sequence[str] = ITEM_FIELDS) -> List[List[Any]]:
+        """Igual que items() pero como listas en el orden de `fields` (formato compacto)."""
+        cols = self.columns(docs, fields)
+        return [list(row) for row in zip(*(cols[c] for c in fields))]
+
+    # ---------- memoria ----------
+    def nbytes(self) -> Dict[str, int]:
+        groups: Dict[str, int] = {}
+        for name, arr in self.arrays.items():
+            g = "search_index" if name.startswith("ix.") else name.split(".")[0].split("_")[0]
+            groups[g] = groups.get(g, 0) + int(arr.nbytes)
+        return groups
+
+    def stats(self) -> Dict[str, Any]:
+        b = self.nbytes()
+        return {
+            "generation": self.generation,
+            "rows": self.n,
+            "stores": self.store_names,
+            "source": self.source,
+            "build_s": round(self.build_s, 3),
+            "bytes": b,
+            "total_bytes": sum(b.values()),
+        }
+
+
+def process_memory() -> Dict[str, int]:
+    """RSS / PSS / privada / compartida del proceso (Linux: /proc/self/smaps_rollup); {} si no hay."""
+    try:
+        raw = Path("/proc/self/smaps_rollup").read_text()
+    except OSError:
+        return {}
+    kb = {k: int(v) for k, v in re.findall(r"^(\w+):\s+(\d+) kB", raw, re.M)}
+    return {
+        "rss_bytes": kb.get("Rss", 0) * 1024,
+        "pss_bytes": kb.get("Pss", 0) * 1024,
+        "private_bytes": (kb.get("Private_Clean", 0) + kb.get("Private_Dirty", 0)) * 1024,
+        "shared_bytes": (kb.get("Shared_Clean", 0) + kb.get("Shared_Dirty", 0)) * 1024,
+    }
+
+
+# ========= Ficheros compartidos entre workers (pagina_web/genfiles.py) =========
+
+def publish(engine, directory: Optional[Path] = None) -> Path:
+    """Deja en disco la instantánea de la generación actual (si ya está, no hace nada)."""
+    def build(d: Path) -> Path:
+        snap = CatalogSnapshot.load(engine)
+        path = snapshot_path(snap.generation, d)
+        snap.save(path)
+        return path
+    with engine.connect() as conn:
+        gen = get_generation(conn)
+    return genfiles.publish(directory or snapshot_dir(), gen, ".bin", build)
+
+
+class SnapshotHolder:
+    """Instantánea vigente + hilo que la renueva cuando cambia la generación."""
+
+    def __init__(self, engine, poll_s: float = POLL_S, mode: Optional[str] = None):
+        self.engine = engine
+        self.poll_s = poll_s
+        self.mode = mode or snapshot_mode() or "memory"
+        self.current: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self) -> CatalogSnapshot:
+        snap = self.current
+        if snap is None:
+            with self._lock:
+                while self.current is None:
+                    if self.refresh() is None:
+                        time.sleep(0.1)   # shared: otro worker está escribiendo el fichero
+                snap = self.current
+        return snap
+
+    def _next(self, gen: int) -> Optional[CatalogSnapshot]:
+        """Instantánea de la generación `gen`; None si otro worker la está publicando."""
+        if self.mode != "shared":
+            return CatalogSnapshot.load(self.engine)
+        path = snapshot_path(gen)
+        path = genfiles.publish_once(path, lambda: publish(self.engine, path.parent))
+        return None if path is None else CatalogSnapshot.open(path)
+
+    def refresh(self) -> Optional[bool]:
+        """Renueva si la generación cambió. True si hubo cambio, None si aún no se pudo."""
+        with self.engine.connect() as conn:
+            gen = get_generation(conn)
+        snap = self.current
+        if snap is not None and snap.generation == gen:
+            return False
+        new = self._next(gen)
+        if new is None:
+            return None
+        self.current = new   # cambio atómico: quien ya tenía la anterior la sigue usando
+        mb = sum(new.nbytes().values()) / 1e6
+        print(f"📦 Catálogo en memoria ({self.mode}): generación {new.generation}, {new.n} productos, "
+              f"{mb:.1f} MB, {new.build_s:.2f}s")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, **self.get().stats(), "process": process_memory()}
+
+    def start(self) -> None:
+        self.get()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, daemon=True, name="snapshot-watch")
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ No se pudo renovar el catálogo en memoria: {e}")
+
+
+def publish_if_shared(engine) -> None:
+    """Para el loader: tras una recarga, publica la instantánea si los workers la comparten."""
+    if snapshot_mode() == "shared":
+        genfiles.publish_after_load(lambda: publish(engine), "instantánea del catálogo", "📦")
+
+
+if __name__ == "__main__":
+    from .db import engine, init_db
+    init_db()
+    t0 = time.perf_counter()
+    p = publish(engine)
+    print(f"✅ {p} ({p.stat().st_size / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s)")
@@ -0,0 +1,242 @@
+# units.py – números en formato es-ES, cantidades ("6 x 1,5 L") y €/kg|l|ud
+# Compartido por los scrapers y por la DB (init_db rellena medidas antiguas). Patrones compilados una sola vez a nivel de módulo.
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+# ---------- números ----------
+# Número "de precio": 1.234,56 | 1,5 | 1.5 | 12
+_PRICE_NUM = r"\d{1,3}(?:\.\d{3})*(?:,\d+)|\d+,\d+|\d+(?:\.\d+)?"
+_PRICE_NUM_RE = re.compile(rf"({_PRICE_NUM})")
+_PRICE_EUR_RE = re.compile(rf"({_PRICE_NUM})(?=\s*(?:€|euros?))", re.I)
+_WS_RE = re.compile(r"\s+")
+
+
+def to_float_es(s: Optional[str]) -> Optional[float]:
+    """'1.234,5' → 1234.5 · '1,5' → 1.5 · '1.5' → 1.5 (sin coma, el punto es decimal)."""
+    if s is None:
+        return None
+    s = s.strip()
+    if "," in s and "." in s:
+        s = s.replace(".", "").replace(",", ".")
+    elif "," in s:
+        s = s.replace(",", ".")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def first_num_es(s: Optional[str]) -> Optional[float]:
+    """Primer número del texto (ej. '1,95 €' → 1.95)."""
+    if not s:
+        return None
+    s = str(s).replace("\xa0", " ").replace("€", "")
+    m = _PRICE_NUM_RE.search(s)
+    return to_float_es(m.group(1)) if m else None
+
+
+def price_es(s: Optional[str]) -> Optional[float]:
+    """
+    Precio de una etiqueta: prioriza el número pegado a '€'/'euros';
+    si no hay, el último número del texto.
+    """
+    if not s:
+        return None
+    s = str(s).replace("\xa0", " ").strip()
+    m = _PRICE_EUR_RE.search(s)
+    if m:
+        return to_float_es(m.group(1))
+    found = _PRICE_NUM_RE.findall(s)
+    return to_float_es(found[-1]) if found else None
+
+
+# ---------- cantidades ----------
+W_FACTORS = {"mg": 0.001, "g": 1.0, "gr": 1.0, "kg": 1000.0}
+V_FACTORS = {"ml": 1.0, "cl": 10.0, "dl": 100.0, "l": 1000.0, "lt": 1000.0}
+
+# Tokenizador de una sola pasada: número (con unidad opcional) o separador 'x'.
+# La unidad termina en frontera de palabra o justo antes de una 'x' (ej. "6x1l");
+# una 'x' dentro de una palabra ("extra", "fix") no separa tramos.
+_QTY_TOKEN_RE = re.compile(
+    r"(?P<num>\d+(?:[.,]\d+)*)"
+    r"(?:\s*(?P<unit>mg|kg|gr?|ml|cl|dl|lt|g|l"
+    r"|uds?|unidades?|servicios?|rollos?|latas?|botellas?|bricks?)(?=x|\b))?"
+    r"|(?P<sep>[×*]|(?<![^\W\d_])x(?![^\W\d_]))"
+)
+
+_W, _V, _U = 1, 2, 3
+_ZERO = (0.0, 0.0, 0)
+
+
+def _unit_kind(unit: Optional[str]) -> int:
+    if not unit:
+        return 0
+    if unit in W_FACTORS:
+        return _W
+    if unit in V_FACTORS:
+        return _V
+    return _U
+
+
+_Token = Tuple[float, str, int, int, int]
+
+
+def tokenize_quantity(text: str) -> List[List[_Token]]:
+    """
+    Parte el texto en tramos separados por 'x'/'×'/'*'. Cada tramo es la lista
+    de números encontrados como (valor, unidad, tipo, inicio, fin).
+    """
+    parts: List[List[_Token]] = [[]]
+    for m in _QTY_TOKEN_RE.finditer(text):
+        if m.group("sep"):
+            parts.append([])
+            continue
+        val = to_float_es(m.group("num"))
+        if val is None:
+            continue
+        unit = m.group("unit") or ""
+        parts[-1].append((val, unit, _unit_kind(unit), m.start(), m.end()))
+    return parts
+
+
+def _first_of(part, kind):
+    for tok in part:
+        if tok[2] == kind:
+            return tok
+    return None
+
+
+def _last_of(part, kind):
+    for tok in reversed(part):
+        if tok[2] == kind:
+            return tok
+    return None
+
+
+def _mult(parts) -> float:
+    """
+    Producto del número pegado a cada 'x' (el último de cada tramo, ignorando
+    ceros): "Cerveza 1897 6 latas x 330 ml" → 6, no 1897.
+    """
+    mult = 1.0
+    for p in parts:
+        if p and p[-1][0]:
+            mult *= p[-1][0]
+    return mult
+
+
+def _pack_mult(text: str, toks, tok) -> float:
+    """
+    "pack 4 latas 330 ml": unidades en plural pegadas (solo espacios) justo antes
+    del par peso/volumen multiplican. "4 ud. (480 g)" NO: el total ya viene dado;
+    "Torres 5 Botella 700 ml" tampoco (singular = envase, no recuento).
+    """
+    i = toks.index(tok)
+    if i > 0:
+        prev = toks[i - 1]
+        if prev[2] == _U and prev[1].endswith("s") and prev[0] and not text[prev[4]:tok[3]].strip():
+            return prev[0]
+    return 1.0
+
+
+def _as_total(tok, mult: float = 1.0) -> Tuple[float, float, int]:
+    val, unit, kind = tok[0], tok[1], tok[2]
+    if kind == _W:
+        return (val * W_FACTORS[unit] * mult, 0.0, 0)
+    return (0.0, val * V_FACTORS[unit] * mult, 0)
+
+
+def parse_totals(format_text: Optional[str]) -> Tuple[float, float, int]:
+    """
+    Totales (g, ml, unidades) de un texto de formato.
+
+    Regla simple:
+      - Si hay 'x' => multiplica factores y usa la unidad del último tramo.
+      - Si NO hay 'x' => prioriza pares (número + unidad) de PESO/VOLUMEN; si no hay, usa unidades.
+    """
+    if not format_text:
+        return _ZERO
+    t = _WS_RE.sub(" ", str(format_text).lower()).strip()
+    parts = tokenize_quantity(t)
+
+    # 1) Caso con multiplicador (x/×/*)
+    if len(parts) > 1:
+        last = parts[-1]
+        fw, fv = _first_of(last, _W), _first_of(last, _V)
+        if fw and (not fv or fw[3] > fv[3]):
+            return _as_total(fw, _mult(parts[:-1]))
+        if fv:
+            return _as_total(fv, _mult(parts[:-1]))
+        u = _first_of(last, _U)
+        if u:
+            return (0.0, 0.0, int(round(_mult(parts[:-1]) * (u[0] or 1.0))))
+        return _ZERO
+
+    # 2) Sin 'x': el último par de peso o volumen (suele ser el más específico)
+    toks = parts[0]
+    lw, lv = _last_of(toks, _W), _last_of(toks, _V)
+    if lv and (not lw or lv[3] > lw[3]):
+        return _as_total(lv, _pack_mult(t, toks, lv))
+    if lw:
+        return _as_total(lw, _pack_mult(t, toks, lw))
+
+    # 3) Unidades (uds, botellas, etc.)
+    u = _first_of(toks, _U)
+    if u:
+        return (0.0, 0.0, int(round(u[0])))
+
+    # 4) Último recurso: un número suelto se toma como unidades
+    if toks:
+        return (0.0, 0.0, int(round(toks[0][0])))
+    return _ZERO
+
+
+def parse_totals_simple(format_text: Optional[str]) -> Dict[str, float]:
+    """Como parse_totals, en dict {"g", "ml", "units"}."""
+    g, ml, units = parse_totals(format_text)
+    return {"g": g, "ml": ml, "units": units}
+
+
+def price_per_from_label(text: Optional[str]) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """Etiqueta de la web ('1,20 €/kg') → (€/kg, €/l, €/ud); solo uno suele venir relleno."""
+    if not text:
+        return (None, None, None)
+    txt = text.lower()
+    val = price_es(text)
+    return (
+        val if ("€/kg" in txt or "€ / kg" in txt) else None,
+        val if ("€/l" in txt or "€ / l" in txt) else None,
+        val if ("€/ud" in txt or "€/unidad" in txt) else None,
+    )
+
+
+# ---------- API batch ----------
+def _batch(fn, values: Iterable, columns: List[str]):
+    """
+    Aplica `fn` a cada valor, calculando una sola vez cada texto distinto
+    (los formatos se repiten mucho). Devuelve DataFrame (mismo índice si
+    `values` es una Series) con `columns`.
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+    cache: Dict = {}
+    rows = []
+    for v in values:
+        key = v if isinstance(v, str) else None
+        r = cache.get(key)
+        if r is None:
+            r = cache[key] = fn(key)
+        rows.append(r)
+    return pd.DataFrame.from_records(rows, columns=columns, index=index)
+
+
+def parse_totals_batch(values: Iterable) -> pd.DataFrame:
+    """Lista/Series de formatos → DataFrame con columnas g, ml, units."""
+    return _batch(parse_totals, values, ["g", "ml", "units"])
+
+
+def price_per_from_label_batch(values: Iterable) -> pd.DataFrame:
+    """Lista/Series de etiquetas €/kg|l|ud → DataFrame con columnas ppkg, ppl, ppunit."""
+    return _batch(price_per_from_label, values, ["ppkg", "ppl", "ppunit"])
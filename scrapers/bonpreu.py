@@ -1,20 +1,21 @@
 # ================== BONPREU – "FORMATGES I VINS" (scroll inteligente) ==================
 # pip install -U selenium pandas webdriver-manager
 
-import re, time
+import time
 import pandas as pd
-from typing import Optional
-from collections import deque
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver import ActionChains
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
+
+from scrapers import telemetry
+from scrapers.browser import build_driver, PageMeter
+from pagina_web.units import first_num_es
+from scrapers.retry import retry_call
+from scrapers.scroll import ScrollController, ScrollStats
+from scrapers.fingerprint import Fingerprints, JS_PROBE_TOTAL, PROBE_CARDS, listing_fingerprint, probe_stable
 
 ROOT = "https://www.compraonline.bonpreuesclat.cat/categories?source=navigation"
 TARGET_SUBSTR = "formatges-i-vins"
@@ -22,55 +23,13 @@ TARGET_SUBSTR = "formatges-i-vins"
 HEADLESS = False
 LOAD_IMAGES = False
 
-PAUSE = 0.28
-STABLE_ROUNDS = 6
+PAUSE = 0.10            # espera mínima entre pasos (el resto lo ajusta ScrollController)
+STABLE_ROUNDS = 3       # pasos sin nuevos, ya abajo del todo, para dar la categoría por acabada
 MAX_SCROLL_STEPS = 400
-SCROLL_STEP_PX = 600
-
-def _num_es(s: Optional[str]):
-    if not s:
-        return None
-    s = str(s).replace("\xa0", " ").replace("€", "").strip()
-    m = re.search(r"(\d{1,3}(?:\.\d{3})*(?:,\d+)|\d+,\d+|\d+(?:\.\d+)?)", s)
-    if not m:
-        return None
-    t = m.group(1)
-    if "," in t and "." in t:
-        t = t.replace(".", "").replace(",", ".")
-    elif "," in t:
-        t = t.replace(",", ".")
-    try:
-        return float(t)
-    except:
-        return None
+SCROLL_STEP_PX = 600    # solo para el plan B (_scroll_anywhere) si el scroll por JS no avanza
 
-def _build_driver(headless=True, load_images=False):
-    opts = Options()
-    if headless:
-        opts.add_argument("--headless=new")
-        opts.add_argument("--window-size=1400,1000")
-    else:
-        opts.add_argument("--start-maximized")
-        opts.add_argument("--window-size=1400,1000")
-    opts.page_load_strategy = "eager"
-    prefs = {"intl.accept_languages": "es-ES,ca-ES,es"}
-    if not load_images:
-        prefs["profile.managed_default_content_settings.images"] = 2
-        opts.add_argument("--blink-settings=imagesEnabled=false")
-    opts.add_experimental_option("prefs", prefs)
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--disable-notifications")
-    try:
-        driver = webdriver.Chrome(options=opts)
-    except (SessionNotCreatedException, WebDriverException):
-        from webdriver_manager.chrome import ChromeDriverManager
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=opts)
-    driver.set_page_load_timeout(40)
-    driver.implicitly_wait(0)
-    return driver
+CARD_SELECTOR = 'div.product-card-container, [data-test="fop-card"], article[data-test="product-card"]'
+SCROLL_CONTAINER = 'div[data-test="infinite-scroll-component"]'
 
 def _accept_cookies(driver):
     try:
@@ -188,13 +147,37 @@ def _scroll_anywhere(driver, step=SCROLL_STEP_PX):
     except Exception:
         pass
 
-def _scrape_category_virtualized(url: str) -> pd.DataFrame:
-    driver = _build_driver(headless=HEADLESS, load_images=LOAD_IMAGES)
+def _probe_fingerprint(driver) -> str:
+    # primeras tarjetas pintadas (url o nombre + precio) y el total de la cabecera, sin scroll
+    # (la lista es virtualizada: contar tarjetas en el DOM no daría el total)
+    def _probe():
+        batch = driver.execute_script(JS_SCRAPE_VISIBLE) or []
+        cards = [(b.get("product_url") or b.get("name"), b.get("price_text")) for b in batch[:PROBE_CARDS]]
+        return cards, driver.execute_script(JS_PROBE_TOTAL, ["h1", "h2", "[data-test='page-header']"])
+    try:
+        cards, total = probe_stable(_probe)
+    except Exception:
+        return ""
+    return listing_fingerprint(cards, total) if cards else ""
+
+def _scrape_category_virtualized(url: str, meter: "PageMeter | None" = None,
+                                 fps: "Fingerprints | None" = None):
+    """Raspa una categoría (lista virtualizada). Devuelve (DataFrame, ScrollStats).
+    Con `fps`, si la huella de las primeras tarjetas no ha cambiado reutiliza las filas."""
+    driver = build_driver("bonpreu", headless=HEADLESS, load_images=LOAD_IMAGES)
     rows, seen = [], set()
     try:
-        driver.get(url)
-        _accept_cookies(driver)
-        time.sleep(1.0)
+        with telemetry.span("navigate", url):
+            driver.get(url)
+        with telemetry.span("wait", url):
+            _accept_cookies(driver)
+            time.sleep(1.0)
+
+        fp = _probe_fingerprint(driver) if fps is not None else ""
+        prev = fps.reuse(url, fp) if fps is not None else None
+        if prev is not None:
+            print(f"= {len(prev)} productos de {url} (sin cambios, reutilizados)")
+            return pd.DataFrame(prev), ScrollStats(label=url, items=len(prev), stop_reason="unchanged")
 
         # Click focus al body/main antes del primer scroll
         try:
@@ -202,13 +185,12 @@ def _scrape_category_virtualized(url: str) -> pd.DataFrame:
         except Exception:
             pass
 
-        stable = 0
-        steps = 0
-        last_total = 0
-
-        while stable < STABLE_ROUNDS and steps < MAX_SCROLL_STEPS:
+        def _extract() -> int:
             # raspa lo visible AHORA
-            batch = driver.execute_script(JS_SCRAPE_VISIBLE)
+            try:
+                batch = driver.execute_script(JS_SCRAPE_VISIBLE) or []
+            except Exception:
+                batch = []
             new_added = 0
             for b in batch:
                 name = (b.get("name") or "").strip()
@@ -220,7 +202,7 @@ def _scrape_category_virtualized(url: str) -> pd.DataFrame:
                 seen.add(key)
                 rows.append({
                     "name": name,
-                    "price": _num_es(b.get("price_text", "")),
+                    "price": first_num_es(b.get("price_text", "")),
                     "price_text": b.get("price_text", ""),
                     "price_per_unit_text": b.get("ppu_text", ""),
                     "offer": b.get("offer", ""),
@@ -229,40 +211,57 @@ def _scrape_category_virtualized(url: str) -> pd.DataFrame:
                     "category_url": url,
                 })
                 new_added += 1
+            return new_added
 
-            total = len(rows)
-            if new_added == 0 or total == last_total:
-                stable += 1
-            else:
-                stable = 0
-                last_total = total
-
-            _scroll_anywhere(driver, SCROLL_STEP_PX)
-            time.sleep(PAUSE)
-            steps += 1
+        ctrl = ScrollController(
+            driver,
+            item_selector=CARD_SELECTOR,
+            container_selector=SCROLL_CONTAINER,
+            virtualized=True,
+            min_wait=PAUSE,
+            stable_rounds=STABLE_ROUNDS,
+            max_steps=MAX_SCROLL_STEPS,
+            nudge=lambda: _scroll_anywhere(driver, SCROLL_STEP_PX),
+            label=url,
+        )
+        stats = ctrl.run(_extract)
+        net = meter.sample(driver, url) if meter is not None else None
 
         df = pd.DataFrame(rows)
         if not df.empty:
+            n = len(df)
             df.drop_duplicates(subset=["product_url","name","price_text"], inplace=True)
+            telemetry.count("duplicates", n - len(df))
             df.reset_index(drop=True, inplace=True)
-        print(f"🧮 {len(df)} productos extraídos de {url}")
-        return df
+        if fps is not None:
+            fps.save(url, fp, df.to_dict("records"))
+        print(f"🧮 {len(df)} productos extraídos de {url} en {stats.seconds:.1f}s "
+              f"({stats.steps} pasos, fin: {stats.stop_reason})"
+              + (f" · {net.requests} peticiones, {net.bytes / 1024:.0f} KB" if net else ""))
+        return df, stats
     finally:
         try: driver.quit()
         except: pass
 
-def scrape_bonpreu(headless: bool = True) -> pd.DataFrame:
+@telemetry.run("Bonpreu")
+def scrape_bonpreu(headless: bool = True, root: str = ROOT) -> pd.DataFrame:
+    """`root`: portada de categorías (otra URL = ej. benchmarks/fixture_server.py)."""
     global HEADLESS
     HEADLESS = headless
 
-    base = _build_driver(headless=HEADLESS, load_images=False)
+    meter = PageMeter()
+    fps = Fingerprints("Bonpreu")
+    base = build_driver("bonpreu", headless=HEADLESS, load_images=False)
     try:
-        base.get(ROOT)
-        _accept_cookies(base)
-        WebDriverWait(base, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "a[data-test='root-category-link']"))
-        )
+        with telemetry.span("navigate", root):
+            base.get(root)
+        with telemetry.span("wait", root):
+            _accept_cookies(base)
+            WebDriverWait(base, 20).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "a[data-test='root-category-link']"))
+            )
         cat_urls = _get_left_sidebar_category_links(base)
+        meter.sample(base, root)
     finally:
         try: base.quit()
         except: pass
@@ -271,16 +270,30 @@ def scrape_bonpreu(headless: bool = True) -> pd.DataFrame:
     if not cat_urls:
         return pd.DataFrame(columns=["name","price","price_text","price_per_unit_text","offer","img_url","product_url","category_url"])
 
-    dfs = []
+    dfs, scroll_stats = [], []
     for url in cat_urls:
-        df = _scrape_category_virtualized(url)
+        # cada intento abre su propio Chrome: un fallo no arrastra al siguiente
+        try:
+            df, st = retry_call(lambda: _scrape_category_virtualized(url, meter, fps), label=url)
+        except Exception as e:
+            telemetry.count("errors")
+            print(f"⚠️ Error en {url}: {e}")
+            continue
+        scroll_stats.append(st.as_dict())
         if not df.empty: dfs.append(df)
 
     if dfs:
         final = pd.concat(dfs, ignore_index=True)
+        n = len(final)
         final.drop_duplicates(subset=["product_url","name","price_text"], inplace=True)
+        telemetry.count("duplicates", n - len(final))
     else:
         final = pd.DataFrame(columns=["name","price","price_text","price_per_unit_text","offer","img_url","product_url","category_url"])
+    telemetry.count("items", len(final))
+    final.attrs["scroll_stats"] = scroll_stats   # tiempo de scroll por categoría
+    final.attrs["page_stats"] = [p.as_dict() for p in meter.pages]
+    print(meter.report("Bonpreu"))
+    print(f"♻️ {fps.summary()}")
     return final
 
 if __name__ == "__main__":
@@ -0,0 +1,394 @@
+# browser.py – fábrica común de Chrome para los scrapers
+#
+# - Flags "ligeros" (sin extensiones, sync, traducción, throttling de timers en segundo plano…).
+# - Bloqueo de peticiones por CDP (Network.setBlockedURLs): fuentes, vídeo, analítica,
+#   publicidad y, si no hacen falta, imágenes. Cada tienda tiene su perfil y su lista
+#   de excepciones (`allow`: grupos o patrones que NO se bloquean).
+# - PageMeter: peticiones y bytes por página (Resource Timing), para medir el ahorro.
+#
+#   BARATAZO_BLOCK=0  → desactiva el bloqueo (para comparar bytes/tiempos con y sin).
+# - BrowserLimits: tope de Chrome vivos y de memoria entre todas las tiendas; con
+#   set_limits() (scrapers/run.py) build_driver espera turno antes de arrancar otro.
+
+import os, threading, time
+from dataclasses import dataclass, asdict, field, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
+
+from scrapers import telemetry
+
+try:  # opcional: memoria real de cada Chrome (sin él, /proc en Linux o una estimación)
+    import psutil
+except ImportError:  # pragma: no cover
+    psutil = None
+
+# ---------- qué se bloquea ----------
+# Patrones de Network.setBlockedURLs ('*' comodín). Agrupados para poder
+# permitir un grupo entero por tienda.
+BLOCK_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "images": ("*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.ico", "*.bmp"),
+    "fonts": ("*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*fonts.googleapis.com*", "*fonts.gstatic.com*"),
+    "media": ("*.mp4", "*.webm", "*.m3u8", "*.mp3", "*youtube.com/embed*", "*vimeo.com*"),
+    "css": ("*.css",),
+    "analytics": (
+        "*google-analytics.com*", "*googletagmanager.com*", "*analytics.google.com*",
+        "*hotjar.com*", "*clarity.ms*", "*segment.io*", "*segment.com*", "*mixpanel.com*",
+        "*newrelic.com*", "*nr-data.net*", "*datadoghq*", "*sentry.io*", "*quantummetric*",
+        "*contentsquare*", "*dynatrace*",
+    ),
+    "ads": (
+        "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*",
+        "*facebook.net*", "*facebook.com/tr*", "*connect.facebook*", "*criteo*",
+        "*taboola*", "*outbrain*", "*bing.com/bat*", "*tiktok.com*", "*pinterest*",
+    ),
+}
+
+# Flags comunes: menos procesos/servicios de fondo y sin frenar timers en
+# pestañas "ocultas" (headless), que retrasan el scroll infinito.
+LEAN_FLAGS: Tuple[str, ...] = (
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-notifications",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--disable-component-update",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--mute-audio",
+)
+
+
+@dataclass(frozen=True)
+class BrowserProfile:
+    window_size: str = "1400,1000"
+    lang: str = "es-ES"
+    accept_languages: str = "es-ES,es"
+    user_agent: Optional[str] = None
+    load_images: bool = False
+    # grupos de BLOCK_GROUPS que se bloquean (las imágenes dependen de load_images)
+    block: Tuple[str, ...] = ("fonts", "media", "analytics", "ads")
+    # grupos o patrones concretos que NO se bloquean aunque estén arriba
+    allow: Tuple[str, ...] = ()
+    extra_block: Tuple[str, ...] = ()
+    page_load_timeout: Optional[int] = None
+
+    def blocked_urls(self) -> List[str]:
+        groups = list(self.block) + ([] if self.load_images else ["images"])
+        urls: List[str] = []
+        for g in groups:
+            if g in self.allow:
+                continue
+            urls.extend(p for p in BLOCK_GROUPS.get(g, ()) if p not in self.allow)
+        urls.extend(p for p in self.extra_block if p not in self.allow)
+        return list(dict.fromkeys(urls))
+
+
+# El CSS no se bloquea en ninguna tienda: el scroll virtualizado (Bonpreu), el
+# centinela de Mercadona y los clics del menú de Consum dependen del layout.
+STORE_PROFILES: Dict[str, BrowserProfile] = {
+    "mercadona": BrowserProfile(
+        window_size="1366,900", accept_languages="es-ES,es",
+        load_images=True, page_load_timeout=30,
+    ),
+    "bonpreu": BrowserProfile(
+        accept_languages="es-ES,ca-ES,es", page_load_timeout=40,
+    ),
+    "consum": BrowserProfile(
+        user_agent=("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"),
+    ),
+}
+
+
+# ---------- límites (varias tiendas a la vez) ----------
+BROWSER_MB = 700.0        # memoria que se reserva por Chrome mientras no se pueda medir
+LIMIT_POLL_S = 1.0
+
+
+def _available_mb() -> Optional[float]:
+    if psutil is not None:
+        return psutil.virtual_memory().available / 2**20
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _tree_rss_mb(pid: int) -> Optional[float]:
+    """RSS de chromedriver + todos sus descendientes (Chrome y sus renderers)."""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            return sum(p.memory_info().rss for p in [root, *root.children(recursive=True)]) / 2**20
+        except psutil.Error:
+            return None
+    try:
+        children: Dict[int, List[int]] = {}
+        rss: Dict[int, int] = {}
+        page = os.sysconf("SC_PAGE_SIZE")
+        for d in Path("/proc").iterdir():
+            if not d.name.isdigit():
+                continue
+            try:
+                ppid = int((d / "stat").read_text().rsplit(")", 1)[1].split()[1])
+                rss[int(d.name)] = int((d / "statm").read_text().split()[1]) * page
+            except (OSError, ValueError, IndexError):
+                continue
+            children.setdefault(ppid, []).append(int(d.name))
+    except (OSError, ValueError, AttributeError):
+        return None
+    if pid not in rss:
+        return None
+    total, todo = 0, [pid]
+    while todo:
+        p = todo.pop()
+        total += rss.get(p, 0)
+        todo.extend(children.get(p, ()))
+    return total / 2**20
+
+
+class BrowserLimits:
+    """
+    Turnos para arrancar Chrome: como mucho `max_browsers` vivos (0 = sin tope) y, con
+    `max_memory_mb`, solo si lo que ocupan los vivos (medido; si no se puede, BROWSER_MB
+    cada uno) + BROWSER_MB cabe en el presupuesto y el sistema tiene esa memoria libre.
+    Sin ningún Chrome vivo se arranca siempre (si no, nadie liberaría nada).
+    """
+
+    def __init__(self, max_browsers: int = 0, max_memory_mb: float = 0, browser_mb: float = BROWSER_MB):
+        self.max_browsers = max_browsers
+        self.max_memory_mb = max_memory_mb
+        self.browser_mb = browser_mb
+        self._cond = threading.Condition()
+        self._live: Dict[int, Optional[int]] = {}   # id(driver) → pid de chromedriver
+        self._pending = 0                            # arrancando (aún sin pid)
+        self.peak = 0
+        self.waited_s = 0.0
+
+    def _used_mb(self) -> float:
+        used = self._pending * self.browser_mb
+        for pid in self._live.values():
+            mb = _tree_rss_mb(pid) if pid else None
+            used += self.browser_mb if mb is None else mb
+        return used
+
+    def _fits(self) -> bool:
+        n = len(self._live) + self._pending
+        if n == 0:
+            return True
+        if self.max_browsers and n >= self.max_browsers:
+            return False
+        if self.max_memory_mb:
+            if self._used_mb() + self.browser_mb > self.max_memory_mb:
+                return False
+            avail = _available_mb()
+            if avail is not None and avail < self.browser_mb:
+                return False
+        return True
+
+    def acquire(self) -> None:
+        t0 = time.perf_counter()
+        with self._cond:
+            while not self._fits():
+                self._cond.wait(LIMIT_POLL_S)   # la memoria puede bajar sin que nadie avise
+            self._pending += 1
+            self.peak = max(self.peak, len(self._live) + self._pending)
+        dt = time.perf_counter() - t0
+        if dt > 0.01:
+            self.waited_s += dt
+            telemetry.observe("wait", dt, "browser slot")
+
+    def started(self, driver) -> None:
+        try:
+            pid = driver.service.process.pid
+        except AttributeError:
+            pid = None
+        with self._cond:
+            self._pending -= 1
+            self._live[id(driver)] = pid
+
+    def release(self, driver=None) -> None:
+        with self._cond:
+            if driver is None:
+                self._pending -= 1          # no llegó a arrancar
+            elif self._live.pop(id(driver), "gone") == "gone":
+                return                      # quit() dos veces
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {"live": len(self._live), "peak": self.peak, "waited_s": round(self.waited_s, 1),
+                    "max_browsers": self.max_browsers, "max_memory_mb": self.max_memory_mb,
+                    "used_mb": round(self._used_mb())}
+
+
+_limits: Optional[BrowserLimits] = None
+
+
+def set_limits(limits: Optional[BrowserLimits]) -> None:
+    """Activa (o quita, con None) los límites para todos los build_driver del proceso."""
+    global _limits
+    _limits = limits
+
+
+def _blocking_enabled() -> bool:
+    return os.environ.get("BARATAZO_BLOCK", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def build_driver(store: Optional[str] = None, headless: bool = True,
+                 profile: Optional[BrowserProfile] = None, **overrides) -> webdriver.Chrome:
+    """
+    Chrome listo para rascar: perfil de la tienda (o `profile`), flags ligeros,
+    bloqueo por CDP y Resource Timing sin límite de 250 entradas.
+    `overrides` sustituye campos del perfil (ej. load_images=False).
+    """
+    prof = profile or STORE_PROFILES.get(store or "", BrowserProfile())
+    if overrides:
+        prof = replace(prof, **overrides)
+
+    opts = Options()
+    if headless:
+        opts.add_argument("--headless=new")
+    else:
+        opts.add_argument("--start-maximized")
+    opts.add_argument(f"--window-size={prof.window_size}")
+    opts.add_argument(f"--lang={prof.lang}")
+    for f in LEAN_FLAGS:
+        opts.add_argument(f)
+    if prof.user_agent:
+        opts.add_argument(f"user-agent={prof.user_agent}")
+    opts.page_load_strategy = "eager"
+    prefs = {"intl.accept_languages": prof.accept_languages}
+    if not prof.load_images:
+        prefs["profile.managed_default_content_settings.images"] = 2
+        opts.add_argument("--blink-settings=imagesEnabled=false")
+    opts.add_experimental_option("prefs", prefs)
+
+    limits = _limits
+    if limits is not None:
+        limits.acquire()
+    try:
+        with telemetry.span("driver_start", store or ""):
+            try:
+                driver = webdriver.Chrome(options=opts)  # Selenium Manager
+            except (SessionNotCreatedException, WebDriverException):
+                telemetry.count("driver_fallbacks")
+                from webdriver_manager.chrome import ChromeDriverManager
+                service = Service(ChromeDriverManager().install())
+                driver = webdriver.Chrome(service=service, options=opts)
+    except BaseException:
+        if limits is not None:
+            limits.release()
+        raise
+    if limits is not None:
+        limits.started(driver)
+        _quit = driver.quit
+
+        def quit():   # devuelve el turno al cerrar (los scrapers siempre hacen quit en finally)
+            try:
+                _quit()
+            finally:
+                limits.release(driver)
+        driver.quit = quit
+
+    if prof.page_load_timeout:
+        driver.set_page_load_timeout(prof.page_load_timeout)
+    driver.implicitly_wait(0)
+
+    try:
+        if _blocking_enabled():
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": prof.blocked_urls()})
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+            "source": "try { performance.setResourceTimingBufferSize(100000); } catch (e) {}"
+        })
+    except Exception as e:
+        print(f"⚠️ CDP no disponible, sin bloqueo de peticiones: {e}")
+    return driver
+
+
+# ---------- medición por página ----------
+JS_NET_TOTALS = r"""
+const nav = performance.getEntriesByType('navigation')[0];
+const res = performance.getEntriesByType('resource');
+let bytes = 0;
+for (const r of res) bytes += (r.transferSize || r.encodedBodySize || 0);
+const navBytes = nav ? (nav.transferSize || nav.encodedBodySize || 0) : 0;
+return {
+  origin: performance.timeOrigin,
+  requests: res.length + (nav ? 1 : 0),
+  bytes: bytes + navBytes,
+  dcl_ms: nav ? nav.domContentLoadedEventEnd : 0,
+};
+"""
+
+
+@dataclass
+class PageStats:
+    label: str = ""
+    requests: int = 0
+    bytes: int = 0
+    dcl_ms: float = 0.0
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass
+class PageMeter:
+    """
+    Acumula peticiones/bytes por página. Funciona igual con navegaciones
+    completas (driver.get) que en SPA: si el documento no ha cambiado, cuenta
+    solo lo descargado desde la última muestra.
+    Bytes = transferSize (encodedBodySize si el origen no lo expone; 0 en cachés).
+    """
+    pages: List[PageStats] = field(default_factory=list)
+    _last: Tuple[float, int, int] = (0.0, 0, 0)
+
+    def sample(self, driver, label: str = "") -> Optional[PageStats]:
+        try:
+            t = driver.execute_script(JS_NET_TOTALS) or {}
+        except Exception:
+            return None
+        origin, req, byt = t.get("origin", 0.0), int(t.get("requests", 0)), int(t.get("bytes", 0))
+        if origin == self._last[0]:
+            st = PageStats(label, req - self._last[1], byt - self._last[2], 0.0)
+        else:
+            st = PageStats(label, req, byt, float(t.get("dcl_ms") or 0.0))
+        self._last = (origin, req, byt)
+        self.pages.append(st)
+        return st
+
+    def summary(self) -> Dict:
+        n = len(self.pages)
+        req = sum(p.requests for p in self.pages)
+        byt = sum(p.bytes for p in self.pages)
+        return {
+            "pages": n,
+            "requests": req,
+            "bytes": byt,
+            "requests_per_page": req / n if n else 0.0,
+            "kb_per_page": byt / n / 1024 if n else 0.0,
+            "blocking": _blocking_enabled(),
+        }
+
+    def report(self, store: str = "") -> str:
+        s = self.summary()
+        return (f"🌐 {store} red: {s['pages']} páginas, {s['requests']} peticiones "
+                f"({s['requests_per_page']:.0f}/pág), {s['bytes'] / 1048576:.1f} MB "
+                f"({s['kb_per_page']:.0f} KB/pág){'' if s['blocking'] else ' [sin bloqueo]'}")
@@ -7,14 +7,18 @@ from dataclasses import dataclass, asdict
 from typing import List, Dict, Set, Callable, Iterable, Optional
 import pandas as pd
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver import ActionChains
 
+from scrapers import telemetry
+from scrapers.browser import build_driver, PageMeter
+from pagina_web.units import first_num_es
+from scrapers.retry import retry_call
+from scrapers.fingerprint import Fingerprints, PROBE_CARDS, listing_fingerprint, probe_stable
+
 
 BASE = "https://tienda.consum.es/es"
 
@@ -52,26 +56,6 @@ MAX_PAGES_CAP = 200
 TIME_SLEEP = 2.5
 
 # ---------- Utils ----------
-def _chrome_driver(headless: bool = True) -> webdriver.Chrome:
-    o = Options()
-    if headless: o.add_argument("--headless=new")
-    o.add_argument("--window-size=1400,1000")
-    o.add_argument("--disable-gpu"); o.add_argument("--no-sandbox"); o.add_argument("--disable-dev-shm-usage")
-    o.add_argument("--lang=es-ES")
-    o.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    o.page_load_strategy = "eager"
-    return webdriver.Chrome(options=o)
-
-
-_num = re.compile(r"(\d{1,3}(?:\.\d{3})*(?:,\d+)|\d+,\d+|\d+(?:\.\d+)?)")
-def _first_num(t: str) -> Optional[float]:
-    if not t: return None
-    m = _num.search(t.replace("\xa0"," "))
-    if not m: return None
-    val = m.group(1).replace(".","").replace(",",".")
-    try: return float(val)
-    except: return None
-
 def _js_scroll_bottom(drv): drv.execute_script("window.scrollTo(0, 10000);")
 
 def _get_page_param(url: str) -> int:
@@ -236,6 +220,7 @@ def _click_next_page(drv, timeout: int = 12) -> bool:
         time.sleep(0.1)
 
     # Intento 2: click en hijo interno (icono)
+    telemetry.count("click_fallbacks")
     try:
         child = btn.find_element(By.XPATH, ".//span[contains(@class,'tol-icon-component')] | .//cmp-svg-viewer | .//*[name()='svg']")
         drv.execute_script("arguments[0].scrollIntoView({block:'center'});", child)
@@ -257,6 +242,7 @@ def _click_next_page(drv, timeout: int = 12) -> bool:
         time.sleep(0.1)
 
     # Intento 3: ráfaga de eventos JS sobre el <a>
+    telemetry.count("click_fallbacks")
     try:
         js = """
         const el = arguments[0];
@@ -438,96 +424,148 @@ def _read_total_pages_from_pagination(drv) -> Optional[int]:
         pass
     return None
 
-def _discover_total_pages(drv, cat_url_page1: str, log: Callable[[str],None]|None=None) -> int:
-    drv.get(cat_url_page1); time.sleep(TIME_SLEEP); _accept_cookies(drv)
+def _probe_cards(drv) -> List[tuple]:
+    # huella: url + precio de las tarjetas de la página abierta (sin scroll)
+    return probe_stable(lambda: [(r.get("href"), r.get("priceText"))
+                                 for r in _parse_cards_batch_js(drv)[:PROBE_CARDS]])
+
+def _discover_total_pages(drv, cat_url_page1: str, log: Callable[[str],None]|None=None,
+                          on_page1: Callable[[], None]|None=None) -> int:
+    with telemetry.span("navigate", cat_url_page1):
+        drv.get(cat_url_page1)
+    with telemetry.span("wait", cat_url_page1):
+        time.sleep(TIME_SLEEP); _accept_cookies(drv)
+    if on_page1: on_page1()
     total = _read_total_pages_from_pagination(drv)
     if total:
         return min(total, MAX_PAGES_CAP)
     pages = 1
     while pages < MAX_PAGES_CAP:
         nxt = _with_page(cat_url_page1, pages + 1)
-        drv.get(nxt); time.sleep(TIME_SLEEP)
-        if not _wait_products_present(drv):
+        with telemetry.span("navigate", nxt):
+            drv.get(nxt)
+        with telemetry.span("wait", nxt):
+            time.sleep(TIME_SLEEP)
+            present = _wait_products_present(drv)
+        if not present:
             break
         pages += 1
         if log: log(f"➡️ Detectada página {pages}")
     return pages
 
-def _scrape_category(drv, cat_url: str, log: Callable[[str],None]|None=None) -> List[ConsumItem]:
+def _scrape_category(drv, cat_url: str, log: Callable[[str],None]|None=None,
+                     meter: PageMeter|None=None, fps: Fingerprints|None=None) -> List[ConsumItem]:
     cat_url_p1 = _page1(cat_url)
-    total_pages = _discover_total_pages(drv, cat_url_p1, log)
+    first: List[tuple] = []
+    total_pages = _discover_total_pages(drv, cat_url_p1, log,
+                                        on_page1=(lambda: first.extend(_probe_cards(drv))) if fps else None)
     if total_pages == 0:
         if log: log("⛔ Sin productos en page=1. Siguiente categoría.")
         return []
 
+    # Misma huella (nº de páginas + tarjetas de la 1ª) que la última vez → filas guardadas
+    fp = listing_fingerprint(first, total_pages) if first else ""
+    prev = fps.reuse(cat_url, fp) if fps else None
+    if prev is not None:
+        if log: log(f"= {len(prev)} productos (sin cambios, reutilizados)")
+        return [ConsumItem(**r) for r in prev]
+
     if log: log(f"📄 Páginas detectadas: {total_pages}")
     items: List[ConsumItem] = []
     seen_urls: Set[str] = set()
 
-    drv.get(_with_page(cat_url_p1, 1))
-    time.sleep(TIME_SLEEP); time.sleep(TIME_SLEEP)
+    with telemetry.span("navigate", cat_url_p1):
+        drv.get(_with_page(cat_url_p1, 1))
+    with telemetry.span("wait", cat_url_p1):
+        time.sleep(TIME_SLEEP); time.sleep(TIME_SLEEP)
 
     for p in range(1, total_pages + 1):
-        _scroll_until_stable(drv, log)
+        page_label = f"{cat_url} p{p}"
+        with telemetry.span("scroll", page_label):
+            _scroll_until_stable(drv, log)
         cards = drv.find_elements(By.XPATH, XPATH_PRODUCT_CARD)
         if log: log(f"✅ Página {p}/{total_pages}: DOM={len(cards)}")
 
-        rows = _parse_cards_batch_js(drv)
+        with telemetry.span("extract", page_label):
+            rows = _parse_cards_batch_js(drv)
         for r in rows:
             u = (r.get("href") or "")
+            if u in seen_urls:
+                telemetry.count("duplicates")
             if not u or u in seen_urls: 
                 continue
             seen_urls.add(u)
             items.append(ConsumItem(
                 name=r.get("name") or "",
                 brand=r.get("brand") or "",
-                price=_first_num((r.get("priceText") or "").replace("\xa0"," ")),
+                price=first_num_es(r.get("priceText") or ""),
                 price_text=r.get("priceText") or "",
                 ppu_text=r.get("ppu") or "",
                 image=r.get("img") or ""
             ))
+        if meter is not None: meter.sample(drv, page_label)
 
         if p < total_pages:
-            ok = _click_next_page(drv, timeout=WAIT_PAGE)
+            with telemetry.span("navigate", page_label):
+                ok = _click_next_page(drv, timeout=WAIT_PAGE)
             if not ok:
                 if log: log("⛔ No avanzó con 'Siguiente'. Corto categoría.")
                 break
             time.sleep(SLEEP_BETWEEN_PAGES)
 
+    if fps:
+        fps.save(cat_url, fp, [asdict(x) for x in items])
     return items
 
 # ---------- API pública ----------
+@telemetry.run("Consum")
 def scrape_consum(headless: bool = True,
                   out_csv: Optional[str] = None,
                   limit_categories: Optional[int] = None,
                   categories: Optional[Iterable[str]] = None,
-                  progress: Optional[Callable[[str], None]] = print) -> pd.DataFrame:
-    drv = _chrome_driver(headless=headless)
+                  progress: Optional[Callable[[str], None]] = print,
+                  base: str = BASE) -> pd.DataFrame:
+    drv = build_driver("consum", headless=headless)
+    meter = PageMeter()
+    fps = Fingerprints("Consum")
     rows: List[Dict] = []
     try:
-        drv.get(BASE); _accept_cookies(drv)
+        with telemetry.span("navigate", base):
+            drv.get(base)
+        with telemetry.span("wait", "cookies"):
+            _accept_cookies(drv)
         cats = list(categories) if categories else _open_menu_and_get_categories(drv)
+        meter.sample(drv, base)
         if progress: progress(f"📂 Categorías detectadas: {len(cats)}")
         if limit_categories: cats = cats[:limit_categories]
 
         for i, cat in enumerate(cats, 1):
             if progress: progress(f"\n---- [{i}/{len(cats)}] {cat} ----")
             try:
-                items = _scrape_category(drv, cat, log=progress)
-                rows.extend([asdict(x) for x in items])
-                if progress: progress(f"🧺 {len(items)} productos")
+                n0 = len(meter.pages)
+                items = retry_call(lambda: _scrape_category(drv, cat, log=progress, meter=meter, fps=fps),
+                                   label=cat, log=progress)
+                rows.extend([{**asdict(x), "category_url": cat} for x in items])
+                net = meter.pages[n0:]
+                if progress: progress(f"🧺 {len(items)} productos · {sum(x.requests for x in net)} peticiones, "
+                                      f"{sum(x.bytes for x in net) / 1024:.0f} KB")
             except Exception as e:
+                telemetry.count("errors")
                 if progress: progress(f"⚠️ Error en {cat}: {e}")
     finally:
         drv.quit()
+    if progress: progress(meter.report("Consum"))
+    if progress: progress(f"♻️ {fps.summary()}")
 
     df = pd.DataFrame(rows)
+    telemetry.count("items", len(df))
     if not df.empty:
-        cols = ["name","brand","price","price_text","ppu_text","image"]
+        cols = ["name","brand","price","price_text","ppu_text","image","category_url"]
         df = df.reindex(columns=cols)
         if out_csv:
             df.to_csv(out_csv, index=False, encoding="utf-8-sig")
             if progress: progress(f"\n✅ Guardado: {out_csv} ({len(df)} filas)")
     else:
         if progress: progress("\n⚠️ No se capturaron productos.")
+    df.attrs["page_stats"] = [p.as_dict() for p in meter.pages]
     return df
@@ -0,0 +1,140 @@
+# fingerprint.py – huella barata por categoría para no volver a rascar lo que no ha cambiado
+#
+#   fps = Fingerprints("Mercadona")                      # una por tienda y ejecución
+#   fp = listing_fingerprint(cards, total)                # primeras tarjetas (id/nombre, precio) + total
+#   rows = fps.reuse(key, fp)                             # filas de la última vez si nada ha cambiado
+#   if rows is None:
+#       rows = rascar_entera(); fps.save(key, fp, rows)
+#
+# La huella sale de lo que ya está en pantalla al abrir la categoría, sin scroll: las
+# primeras PROBE_CARDS tarjetas y el total (nº de páginas, de productos…) si la web lo da.
+# Si coincide con la de la última extracción completa, se reutilizan sus filas.
+# Riesgo asumido: un cambio de precio por debajo de las primeras tarjetas no se ve hasta la
+# siguiente pasada completa. Por eso cada categoría se rasca entera al menos cada
+# FULL_EVERY_DAYS días (BARATAZO_FULL_EVERY_DAYS, 7), repartidas por días según su clave para
+# que no caigan todas a la vez, y siempre con BARATAZO_FULL_REFRESH=1 (run.py --full).
+#
+# Ficheros: <dir>/<tienda>/<sha1(clave)>.json.gz = {key, fingerprint, full_at, rows}, con
+# <dir> = BARATAZO_FP_DIR o db/fingerprints junto a la base de datos. Fuera de SQLite a
+# propósito: las tiendas rascan en paralelo mientras otra está cargando (un solo escritor).
+
+import gzip, hashlib, json, os, time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from scrapers import telemetry
+
+PROBE_CARDS = 24
+
+# Total que la web pinta sin scroll ("1.234 productes", "56 productos", "12 resultats");
+# null si no hay. Sin él, un cambio por debajo de las primeras tarjetas no se ve.
+JS_PROBE_TOTAL = r"""
+const sels = arguments[0] || [];
+for (const s of ["[data-test='product-count']", "[data-testid='product-count']", ...sels]) {
+  for (const el of document.querySelectorAll(s)) {
+    const m = (el.textContent || "").replace(/\s+/g, " ").match(/(\d[\d.]*)\s*(productes|productos|resultats|resultados)/i);
+    if (m) return parseInt(m[1].replace(/\./g, ""), 10);
+  }
+}
+return null;
+"""
+FULL_EVERY_DAYS = int(os.environ.get("BARATAZO_FULL_EVERY_DAYS", "7"))
+FORCE_FULL = os.environ.get("BARATAZO_FULL_REFRESH", "0").strip().lower() in ("1", "true", "yes", "on")
+
+T = TypeVar("T")
+
+
+def fp_dir() -> Path:
+    env = os.environ.get("BARATAZO_FP_DIR")
+    if env:
+        return Path(env)
+    from pagina_web.db import db_path
+    return db_path.parent / "fingerprints"
+
+
+def listing_fingerprint(cards: Iterable[Sequence[Any]], total: Any = None) -> str:
+    """sha1 de las primeras PROBE_CARDS tarjetas (en orden) y del total."""
+    h = hashlib.sha1(f"{total}\x1d".encode())
+    for i, card in enumerate(cards):
+        if i >= PROBE_CARDS:
+            break
+        h.update(("\x1f".join(str(v) for v in card) + "\x1e").encode())
+    return h.hexdigest()
+
+
+def probe_stable(fn: Callable[[], T], tries: int = 6, pause: float = 0.25) -> T:
+    """Llama a fn() hasta que devuelve lo mismo dos veces seguidas (la lista ya pintada)."""
+    last = fn()
+    for _ in range(tries - 1):
+        time.sleep(pause)
+        cur = fn()
+        if cur == last:
+            return cur
+        last = cur
+    return last
+
+
+def _day_slot(key: str, every: int) -> int:
+    return int(hashlib.sha1(key.encode()).hexdigest()[:8], 16) % every
+
+
+class Fingerprints:
+    def __init__(self, store: str, directory: Optional[Path] = None,
+                 full_every_days: Optional[int] = None, force: Optional[bool] = None):
+        self.store = store
+        self.dir = (directory or fp_dir()) / store.lower()
+        self.full_every = max(1, full_every_days or FULL_EVERY_DAYS)
+        self.force = FORCE_FULL if force is None else force
+        self.reused = self.full = 0
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{hashlib.sha1(key.encode()).hexdigest()}.json.gz"
+
+    def _due(self, key: str, full_at: str, today: date) -> bool:
+        """¿Toca pasada completa? Al cumplir full_every días, o antes en su día del ciclo."""
+        try:
+            age = (today - datetime.fromisoformat(full_at).date()).days
+        except (TypeError, ValueError):
+            return True
+        if age >= self.full_every:
+            return True
+        return age >= 1 and _day_slot(key, self.full_every) == today.toordinal() % self.full_every
+
+    def reuse(self, key: str, fingerprint: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """Filas guardadas de `key` si la huella no ha cambiado y no toca pasada completa."""
+        if self.force or not fingerprint:
+            return None
+        try:
+            with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get("key") != key or saved.get("fingerprint") != fingerprint:
+            return None
+        if self._due(key, saved.get("full_at"), datetime.now(timezone.utc).date()):
+            return None
+        self.reused += 1
+        telemetry.count("categories_unchanged")
+        return saved.get("rows") or []
+
+    def save(self, key: str, fingerprint: Optional[str], rows: List[Dict[str, Any]]) -> None:
+        """Tras una extracción completa: huella + filas para la próxima vez."""
+        self.full += 1
+        telemetry.count("categories_full")
+        if not fingerprint or not rows:   # sin filas no hay nada que reutilizar
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp{os.getpid()}")
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump({"key": key, "fingerprint": fingerprint,
+                           "full_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                           "rows": rows}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la huella de {self.store} / {key}: {e}")
+
+    def summary(self) -> str:
+        return f"{self.store}: {self.reused} categorías sin cambios (reutilizadas), {self.full} rascadas enteras"
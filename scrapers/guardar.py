@@ -0,0 +1,202 @@
+# guardar.py – carga de una tienda en la DB (borra lo suyo y recarga), común a las tres
+#
+#   reload_store("Consum", from_consum(df_consum))
+#
+# reload_store() recibe el DataFrame ya normalizado (LOAD_COLUMNS); los from_<tienda>()
+# pasan la salida de cada scraper a ese formato. ADAPTERS: nombre de tienda → adaptador.
+# En una sola transacción: borrado de la tienda, productos, categorías, enlaces, avisos de
+# precio y generación (si algo falla, la tienda se queda como estaba).
+# Antes de tocar nada, scrapers/validate.py: si algo no cuadra (muchas menos filas, precios
+# nulos…) se lanza ValidationError y la tienda se queda como estaba.
+
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sqlmodel import Session
+from sqlalchemy import insert, text
+
+from pagina_web.db import engine, init_db, bump_generation, analyze
+from pagina_web.snapshot import publish_if_shared
+from pagina_web.replica import publish_if_enabled as publish_replica
+from pagina_web.images import prefetch_in_background
+from pagina_web.alerts import METRICS as ALERT_METRICS, evaluate as evaluate_alerts, price_changes
+from scrapers import telemetry, validate as quality
+from pagina_web.models import (
+    Product, Category, ProductCategory,
+    make_product_ids, make_category_ids
+)
+
+# Columnas de medida que se guardan tal cual en product
+MEASURE_COLS = ("price_kg", "price_l", "price_unit_count", "total_g", "total_ml", "total_units")
+LOAD_COLUMNS = ("title", "price_unit", *MEASURE_COLS, "image", "product_url", "category", "subcategory")
+
+
+def _col_or(df: pd.DataFrame, name: str, default_value):
+    """Devuelve df[name] si existe; si no, una Series llena con default_value."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series([default_value] * len(df), index=df.index)
+
+def _records(df: pd.DataFrame):
+    """Filas como dicts con None en vez de NaN (executemany)."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def _text(df: pd.DataFrame, name: str) -> pd.Series:
+    return _col_or(df, name, "").fillna("").astype(str)
+
+def _frame(df: pd.DataFrame, title, price, image, product_url, category, subcategory) -> pd.DataFrame:
+    return pd.DataFrame({
+        "title": title.astype(str).str.strip(),
+        "price_unit": pd.to_numeric(price, errors="coerce"),
+        **{c: pd.to_numeric(_col_or(df, c, np.nan), errors="coerce") for c in MEASURE_COLS},
+        "image": image, "product_url": product_url, "category": category, "subcategory": subcategory,
+    })
+
+def _with_measures(df: pd.DataFrame, format_text: pd.Series, label: pd.Series) -> pd.DataFrame:
+    # €/kg, €/L, €/ud y totales salen de enrich_prices(); si el DF llega sin ellas se
+    # calculan aquí. Sin medida → NULL (nunca el precio por unidad).
+    if set(MEASURE_COLS) <= set(df.columns):
+        return df
+    from scrapers.mercadona import enrich_prices
+    return enrich_prices(df.assign(format_text=format_text, price_per_unit_text=label))
+
+
+# ---------- adaptadores (salida de cada scraper → LOAD_COLUMNS) ----------
+def from_mercadona(df: pd.DataFrame) -> pd.DataFrame:
+    if "format_text" in df.columns:
+        df = _with_measures(df, df["format_text"], _text(df, "price_per_unit_text"))
+    return _frame(df, df["name"], _col_or(df, "price", np.nan), _text(df, "img_url"), _text(df, "product_url"),
+                  _text(df, "section" if "section" in df.columns else "category"), _text(df, "subcategory"))
+
+
+def _category_from_url(urls: pd.Series) -> pd.DataFrame:
+    # .../categories/<categoria>/<sub...>?... (Bonpreu) o .../es/c/<categoria>/<id> (Consum)
+    path = urls.str.split("?").str[0].str.extract(r"/(?:categories|c)/(.*)$")[0].fillna("").str.strip("/")
+    parts = path.str.split("/", n=1)
+    return pd.DataFrame({"category": parts.str[0].fillna(""), "subcategory": parts.str[1].fillna("")})
+
+
+def from_bonpreu(df: pd.DataFrame) -> pd.DataFrame:
+    df = _with_measures(df, _text(df, "name"), _text(df, "price_per_unit_text"))
+    cat = _category_from_url(_text(df, "category_url"))
+    return _frame(df, df["name"], _col_or(df, "price", np.nan), _text(df, "img_url"), _text(df, "product_url"),
+                  cat["category"], cat["subcategory"])
+
+
+def from_consum(df: pd.DataFrame) -> pd.DataFrame:
+    df = _with_measures(df, _text(df, "name"), _text(df, "ppu_text"))
+    cat = _category_from_url(_text(df, "category_url"))
+    return _frame(df, df["name"], _col_or(df, "price", np.nan), _text(df, "image"), _text(df, "product_url"),
+                  cat["category"], cat["subcategory"])
+
+
+ADAPTERS: Dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    "Mercadona": from_mercadona,
+    "Bonpreu": from_bonpreu,
+    "Consum": from_consum,
+}
+
+
+# ---------- carga ----------
+def reload_store(store: str, df: pd.DataFrame, validate: Optional[bool] = None) -> Dict[str, int]:
+    """Sustituye los productos de `store` por los de `df` (LOAD_COLUMNS). Devuelve contadores.
+
+    Con la validación activa (por defecto, BARATAZO_VALIDATE) las filas en cuarentena no se
+    cargan y, si se pasa algún umbral, lanza quality.ValidationError sin tocar la DB.
+    """
+    with telemetry.run(f"{store} load"):   # reutiliza la ejecución del pipeline si la hay
+        init_db()  # idempotente: asegura tablas nuevas (catalog_meta, ...)
+        # Ids deterministas, una vez por fila y vectorizados (mismos uuids que make_*_id); la
+        # validación cuenta duplicados por id (título normalizado) sin volver a normalizar
+        df = df.assign(store=store)
+        df = df.assign(id=make_product_ids(df["store"], df["title"]))
+        if quality.ENABLED if validate is None else validate:
+            df, rep = quality.validate(store, df)
+            print(("⛔ " if rep.blocked else "🔎 ") + rep.summary())
+            if rep.blocked:
+                telemetry.count("validation_blocked")
+                raise quality.ValidationError(rep)
+        return _reload(store, df)
+
+
+def _reload(store: str, df: pd.DataFrame) -> Dict[str, int]:
+    """Carga `df` (con store e id, de reload_store) en lugar de lo que hubiera de `store`."""
+    t0 = time.perf_counter()
+
+    # --- 1) Categorías normalizadas (los ids de producto ya vienen de reload_store) ---
+    df = df.assign(
+        category=df["category"].fillna("").astype(str).str.strip(),
+        subcategory=df["subcategory"].fillna("").astype(str).str.strip(),
+    )
+    # Un producto por id: el id sale del título normalizado ("Leche Entera" = "leche entera")
+    df_prod = df.drop_duplicates(subset="id", keep="first")
+    prod_cols = ["id", "title", "store", "price_unit", *MEASURE_COLS, "image", "product_url"]
+
+    # --- 2) Wipe + recarga en una sola transacción: si algo falla, la tienda queda como estaba ---
+    inserted_c = 0
+    with Session(engine) as s:
+        conn = s.connection()
+        # Antes se guardan los precios de la carga anterior: el change set de las alertas
+        before = pd.DataFrame(conn.execute(
+            text(f"SELECT id, {', '.join(ALERT_METRICS)} FROM product WHERE store = :store"),
+            {"store": store}).all(), columns=["id", *ALERT_METRICS])
+        conn.execute(text("""
+            DELETE FROM product_category
+             WHERE product_pk IN (SELECT pk FROM product WHERE store = :store)
+        """), {"store": store})
+        conn.execute(text("DELETE FROM product WHERE store = :store"), {"store": store})
+
+        # Productos (1 por id); la pk entera la pone SQLite (ROWID → "recientes")
+        urls = {c: df_prod[c].replace("", None) for c in ("image", "product_url")}
+        conn.execute(insert(Product.__table__), _records(df_prod[prod_cols].assign(**urls)))
+        inserted_p = len(df_prod)
+        pk_of = dict(conn.execute(text("SELECT id, pk FROM product WHERE store = :store"), {"store": store}).all())
+
+        # Categorías: solo las que faltan (la tabla es pequeña, se lee entera)
+        # Enlaces: todas las filas (multi-categoría); repetidos fuera con drop_duplicates
+        links = df[(df["category"] != "") | (df["subcategory"] != "")]
+        links = links.assign(cid=make_category_ids(links["category"], links["subcategory"]))
+        cat_pk = dict(conn.execute(text("SELECT id, pk FROM category")).all())
+        new_c = links.drop_duplicates("cid").loc[lambda d: ~d["cid"].isin(list(cat_pk))]
+        if len(new_c):
+            conn.execute(insert(Category.__table__), [
+                {"id": r.cid, "category": r.category, "subcategory": r.subcategory}
+                for r in new_c.itertuples(index=False)])
+            inserted_c = len(new_c)
+            cat_pk = dict(conn.execute(text("SELECT id, pk FROM category")).all())
+        pairs = pd.DataFrame({"product_pk": links["id"].map(pk_of), "category_pk": links["cid"].map(cat_pk)})
+        pairs = pairs.dropna().astype("int64").drop_duplicates()
+        if len(pairs):
+            conn.execute(insert(ProductCategory.__table__), pairs.to_dict("records"))
+        linked = len(pairs)
+
+        # Vigilancias de precio: solo sobre lo que ha cambiado, en la misma transacción
+        changes = price_changes(before, df_prod)
+        alerts = evaluate_alerts(conn, changes)
+
+        # Avisa a la web de que el catálogo ha cambiado (reconstruye índices)
+        bump_generation(conn)
+        s.commit()
+
+    # Estadísticas al día: los planes de la web dependen del reparto por tienda
+    with telemetry.span("analyze", store), engine.begin() as conn:
+        analyze(conn)
+
+    telemetry.observe("db_load", time.perf_counter() - t0, store)
+    telemetry.count("loaded_products", inserted_p)
+    telemetry.count("loaded_links", linked)
+    telemetry.count("duplicates", len(df) - len(df_prod))
+    telemetry.count("price_changes", len(changes))
+    telemetry.count("alerts", alerts)
+    # Con workers compartiendo la instantánea (BARATAZO_SNAPSHOT=shared) se deja ya escrita
+    publish_if_shared(engine)
+    # Con BARATAZO_REPLICA=1 la web lee de una copia del catálogo: se publica la de esta generación
+    publish_replica(engine)
+    # Con BARATAZO_IMG_PREFETCH=1 las imágenes nuevas se bajan ya a la caché de /img
+    prefetch_in_background(df_prod["image"].tolist(), store)
+    print(f"✅ {store}: productos_insertados={inserted_p}, categorias_nuevas={inserted_c}, enlaces_creados={linked}, "
+          f"precios_cambiados={len(changes)}, avisos={alerts}")
+    return {"products": inserted_p, "categories": inserted_c, "links": linked,
+            "price_changes": len(changes), "alerts": alerts}
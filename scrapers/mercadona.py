@@ -2,298 +2,166 @@
 # pip install -U selenium pandas
 # (opcional fallback) pip install -U webdriver-manager
 
-import re, time, hashlib
+import time
 import pandas as pd
-from typing import Optional, Set, List, Dict
+from typing import List, Dict
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, SessionNotCreatedException, WebDriverException
+from selenium.common.exceptions import TimeoutException
+
+from scrapers import telemetry
+from scrapers.browser import build_driver, PageMeter
+from pagina_web.units import price_es, parse_totals_batch, price_per_from_label_batch
+from scrapers.scroll import ScrollController, ScrollStats
+from scrapers.retry import retry_call
+from scrapers.fingerprint import Fingerprints, JS_PROBE_TOTAL, PROBE_CARDS, listing_fingerprint, probe_stable
 
 # --------- CONFIG ---------
-SCROLL_PAUSE = 0.10
-NO_NEW_LOOPS_TO_STOP = 5       # cortar scroll cuando no salen nuevos X veces
-
-# ---------- util ----------
-def _num_es(s: Optional[str]):
-    if not s: return None
-    s = str(s).replace("\xa0", " ").strip()
-    m = re.search(r"(\d{1,3}(?:\.\d{3})*(?:,\d+)|\d+,\d+|\d+(?:\.\d+)?)(?=\s*(?:€|euros?))", s, flags=re.I)
-    t = m.group(1) if m else (re.findall(r"\d{1,3}(?:\.\d{3})*(?:,\d+)|\d+,\d+|\d+(?:\.\d+)?", s) or [None])[-1]
-    if t is None: return None
-    if "," in t and "." in t: t = t.replace(".", "").replace(",", ".")
-    elif "," in t:            t = t.replace(",", ".")
-    try: return float(t)
-    except: return None
-
-def _build_driver(headless: bool = True, load_images: bool = True):
-    opts = Options()
-    if headless:
-        opts.add_argument("--headless=new"); opts.add_argument("--window-size=1366,900")
-    else:
-        opts.add_argument("--start-maximized"); opts.add_argument("--window-size=1366,900")
-    opts.page_load_strategy = "eager"
-    prefs = {"intl.accept_languages": "es-ES,es"}
-    if not load_images:
-        prefs["profile.managed_default_content_settings.images"] = 2
-    opts.add_experimental_option("prefs", prefs)
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--disable-notifications")
-    opts.add_argument("--lang=es-ES")
-    try:
-        driver = webdriver.Chrome(options=opts)  # Selenium Manager
-    except (SessionNotCreatedException, WebDriverException):
-        from webdriver_manager.chrome import ChromeDriverManager
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=opts)
-    driver.set_page_load_timeout(30)
-    driver.implicitly_wait(0)
-    return driver
+SCROLL_PAUSE = 0.10            # espera mínima entre pasos (el resto lo ajusta ScrollController)
+STABLE_ROUNDS = 2              # pasos sin nuevos, ya abajo del todo, para dar la lista por acabada
+SENTINEL_SELECTOR = "footer"   # visible => fin de la lista
 
 # ---------- normalización y precios ----------
-_NUM_RE = r"(?:\d{1,3}(?:\.\d{3})*(?:,\d+)?|\d+,\d+|\d+(?:\.\d+)?)"
-
-def _to_float_es(s: str):
-    if s is None: return None
-    s = s.strip()
-    if "," in s and "." in s: s = s.replace(".", "").replace(",", ".")
-    elif "," in s:            s = s.replace(",", ".")
-    try: return float(s)
-    except: return None
-
-_W = {"mg": 0.001, "g": 1.0, "gr": 1.0, "kg": 1000.0}
-_V = {"ml": 1.0, "cl": 10.0, "dl": 100.0, "l": 1000.0, "lt": 1000.0}
-
-def parse_totals_simple(format_text: str):
+def enrich_prices(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Regla simple:
-      - Si hay 'x' => multiplica factores y usa la unidad del último tramo (como ya hacíamos).
-      - Si NO hay 'x' => prioriza pares (número + unidad) de PESO/VOLUMEN; si no hay, usa unidades.
-    Devuelve totales en g / ml / units.
+    Añade price_kg, price_l, price_unit_count y total_g/total_ml/total_units.
+    Los €/medida salen de precio / total del formato; si el formato no se
+    entiende, se usa la etiqueta de la web (price_per_unit_text).
     """
-    if not format_text:
-        return {"g": 0.0, "ml": 0.0, "units": 0}
-
-    t = re.sub(r"\s+", " ", str(format_text).lower()).strip()
-
-    def _to_float_es(s: str):
-        if s is None: return None
-        s = s.strip()
-        if "," in s and "." in s:
-            s = s.replace(".", "").replace(",", ".")
-        elif "," in s:
-            s = s.replace(",", ".")
-        try: return float(s)
-        except: return None
-
-    # mapas base
-    W = {"mg": 0.001, "g": 1.0, "gr": 1.0, "kg": 1000.0}
-    V = {"ml": 1.0, "cl": 10.0, "dl": 100.0, "l": 1000.0, "lt": 1000.0}
-    U_pat = r"(uds?|unidades?|servicios?|rollos?|latas?|botellas?|bricks?)"
-
-    # 1) Caso con multiplicador (x/×/*) → mantenemos la lógica anterior
-    if re.search(r"[x×*]", t):
-        parts = re.split(r"\s*[x×*]\s*", t)
-        if not parts:
-            return {"g":0.0,"ml":0.0,"units":0}
-
-        last = parts[-1]
-        # elegir unidad de last priorizando peso/volumen
-        m_w = re.search(rf"({_NUM_RE})\s*(mg|kg|gr?|g)\b", last)
-        m_v = re.search(rf"({_NUM_RE})\s*(ml|cl|dl|lt|l)\b", last)
-        base_num = unit = None
-        kind = None
-        if m_w and (not m_v or m_w.start() > m_v.start()):
-            base_num = _to_float_es(m_w.group(1)); unit = m_w.group(2); kind = "W"
-        elif m_v:
-            base_num = _to_float_es(m_v.group(1)); unit = m_v.group(2); kind = "V"
-        else:
-            # caer a unidades si no hay peso/volumen
-            m_u = re.search(rf"({_NUM_RE})\s*{U_pat}\b", last)
-            if m_u:
-                mult = 1.0
-                for p in parts:
-                    n = re.search(_NUM_RE, p)
-                    if n: 
-                        f = _to_float_es(n.group(0))
-                        if f: mult *= f
-                return {"g":0.0, "ml":0.0, "units": int(round(mult))}
-            return {"g":0.0,"ml":0.0,"units":0}
-
-        # multiplicador = producto de números en los tramos anteriores
-        mult = 1.0
-        for p in parts[:-1]:
-            n = re.search(_NUM_RE, p)
-            if n:
-                f = _to_float_es(n.group(0))
-                if f: mult *= f
-
-        if kind == "W":
-            return {"g": base_num * W[unit] * mult, "ml": 0.0, "units": 0}
-        else:
-            return {"g": 0.0, "ml": base_num * V[unit] * mult, "units": 0}
-
-    # 2) Caso simple (sin 'x'): buscar *pares* número+unidad priorizando peso/volumen
-    #   - Coger el *último* par de peso o volumen (suele ser el más específico: "botella 750 ml")
-    pairs_w = list(re.finditer(rf"({_NUM_RE})\s*(mg|kg|gr?|g)\b", t))
-    pairs_v = list(re.finditer(rf"({_NUM_RE})\s*(ml|cl|dl|lt|l)\b", t))
-
-    if pairs_w or pairs_v:
-        if pairs_v and (not pairs_w or pairs_v[-1].start() > pairs_w[-1].start()):
-            m = pairs_v[-1]; num = _to_float_es(m.group(1)); unit = m.group(2)
-            total_ml = (num or 0.0) * V[unit]
-            return {"g": 0.0, "ml": total_ml, "units": 0}
-        else:
-            m = pairs_w[-1]; num = _to_float_es(m.group(1)); unit = m.group(2)
-            total_g = (num or 0.0) * W[unit]
-            return {"g": total_g, "ml": 0.0, "units": 0}
-
-    # 3) Si no hay peso/volume, intentar unidades (uds, botellas, etc.)
-    m_u = re.search(rf"({_NUM_RE})\s*{U_pat}\b", t)
-    if m_u:
-        num = _to_float_es(m_u.group(1)) or 0.0
-        return {"g":0.0, "ml":0.0, "units": int(round(num))}
-
-    # 4) Último recurso: si sólo hay un número suelto, asumir unidades
-    m_only = re.search(_NUM_RE, t)
-    if m_only:
-        num = _to_float_es(m_only.group(0)) or 0.0
-        return {"g":0.0, "ml":0.0, "units": int(round(num))}
-
-    return {"g":0.0,"ml":0.0,"units":0}
-
-def parse_price_per_from_label(price_per_unit_text: str):
-    if not price_per_unit_text: return {"ppkg":None,"ppl":None,"ppunit":None}
-    txt = price_per_unit_text.lower(); val = _num_es(price_per_unit_text)
-    return {
-        "ppkg": val if ("€/kg" in txt or "€ / kg" in txt) else None,
-        "ppl":  val if ("€/l"  in txt or "€ / l"  in txt) else None,
-        "ppunit": val if ("€/ud" in txt or "€/unidad" in txt) else None
-    }
-
-def compute_normalized_prices(row):
-    price = row.get("price")
-    fmt = (row.get("format_text") or "").strip()
-    pput = (row.get("price_per_unit_text") or "").strip()
-    totals = parse_totals_simple(fmt); g, ml, units = totals["g"], totals["ml"], totals["units"]
-    site = parse_price_per_from_label(pput)
-    price_kg = price_l = price_unit_count = None
-    if price is not None:
-        if g > 0:   price_kg = price * (1000.0 / g)
-        if ml > 0:  price_l  = price * (1000.0 / ml)
-        if units>0: price_unit_count = price / units
-    if price_kg is None:         price_kg = site["ppkg"]
-    if price_l is None:          price_l  = site["ppl"]
-    if price_unit_count is None: price_unit_count = site["ppunit"]
-    return pd.Series({
-        "price_kg": price_kg, "price_l": price_l, "price_unit_count": price_unit_count,
-        "total_g": g or None, "total_ml": ml or None, "total_units": units or None,
-    })
-
-def enrich_prices(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df.assign(price_kg=None, price_l=None, price_unit_count=None,
                          total_g=None, total_ml=None, total_units=None)
-    extra = df.apply(compute_normalized_prices, axis=1)
-    out = pd.concat([df, extra], axis=1)
+    tot = parse_totals_batch(df["format_text"].fillna("").astype(str).str.strip())
+    site = price_per_from_label_batch(df["price_per_unit_text"].fillna("").astype(str).str.strip())
+    price = pd.to_numeric(df["price"], errors="coerce")
+    g, ml, units = tot["g"], tot["ml"], tot["units"]
+
+    out = df.assign(
+        price_kg=(price * 1000.0 / g).where(g > 0).fillna(site["ppkg"]),
+        price_l=(price * 1000.0 / ml).where(ml > 0).fillna(site["ppl"]),
+        price_unit_count=(price / units).where(units > 0).fillna(site["ppunit"]),
+        total_g=g.where(g > 0),
+        total_ml=ml.where(ml > 0),
+        total_units=units.where(units > 0),
+    )
     for c in ["price_kg", "price_l", "price_unit_count"]:
         out[c] = pd.to_numeric(out[c], errors="coerce").round(4)
     return out
 
 # ---------- extractor (sin URLs) ----------
-def _key_for_seen(name_full: str, price_label: str) -> str:
-    return hashlib.sha1(f"{name_full}|{price_label}".encode("utf-8")).hexdigest()
+# Una sola llamada a execute_script por paso de scroll: el navegador recorre las
+# tarjetas y devuelve solo las que no ha devuelto antes. Las claves vistas
+# ("nombre|etiqueta precio") viven en la página, en un Set por `scope`
+# (subcategoría): la SPA no recarga al cambiar de subcategoría.
+JS_SCRAPE_NEW_CARDS = r"""
+const scope = arguments[0];
+if (window.__bzScope !== scope) { window.__bzScope = scope; window.__bzSeen = new Set(); }
+const seen = window.__bzSeen;
+const txt = n => (n ? (n.innerText || n.textContent || "").replace(/\s+/g, " ").trim() : "");
+const out = [];
+for (const el of document.querySelectorAll("[data-testid='product-cell']")) {
+  const nameEl = el.querySelector("h4.product-cell__description-name");
+  const priceEl = el.querySelector(".product-price [aria-label]") || el.querySelector(".product-price");
+  if (!nameEl || !priceEl) continue;
+  const format_text = txt(el.querySelector(".product-format"));
+  const name = (txt(nameEl) + " " + format_text).trim();
+  const price_label = priceEl.getAttribute("aria-label") || txt(priceEl);
+  const key = name + "|" + price_label;
+  if (seen.has(key)) continue;
+  seen.add(key);
+
+  // imagen (opcional)
+  let img_url = "";
+  const img = el.querySelector(".product-cell__image-wrapper img");
+  if (img) {
+    img_url = img.getAttribute("src") || img.getAttribute("data-src") || "";
+    if (!img_url) {
+      const ss = img.getAttribute("srcset") || "";
+      if (ss) { try { img_url = ss.split(",").pop().trim().split(" ")[0]; } catch (e) {} }
+    }
+  }
+  out.push({name, format_text, price_label, img_url});
+}
+return out;
+"""
+
+# Huella de la subcategoría recién abierta (sin scroll ni tocar el Set de arriba):
+# nombre + etiqueta de precio de las primeras tarjetas pintadas.
+JS_PROBE_CARDS = r"""
+const n = arguments[0];
+const txt = el => (el ? (el.innerText || el.textContent || "").replace(/\s+/g, " ").trim() : "");
+const out = [];
+for (const el of document.querySelectorAll("[data-testid='product-cell']")) {
+  if (out.length >= n) break;
+  const nameEl = el.querySelector("h4.product-cell__description-name");
+  const priceEl = el.querySelector(".product-price [aria-label]") || el.querySelector(".product-price");
+  if (!nameEl || !priceEl) continue;
+  out.push([(txt(nameEl) + " " + txt(el.querySelector(".product-format"))).trim(),
+            priceEl.getAttribute("aria-label") || txt(priceEl)]);
+}
+return out;
+"""
+
+def _probe_fingerprint(driver) -> str:
+    # primeras tarjetas + total: el contador de la página o, si no hay, las tarjetas que ya
+    # están en el DOM (la subcategoría se pinta entera; el scroll es por las imágenes)
+    def _probe():
+        cards = driver.execute_script(JS_PROBE_CARDS, PROBE_CARDS) or []
+        total = driver.execute_script(JS_PROBE_TOTAL, ["h1", "h2", ".category-detail__title"])
+        if total is None:
+            total = driver.execute_script("return document.querySelectorAll(\"[data-testid='product-cell']\").length;")
+        return cards, total
+    try:
+        cards, total = probe_stable(_probe)
+    except Exception:
+        return ""
+    return listing_fingerprint(cards, total) if cards else ""
 
-def _extract_all_products_on_current_page(driver, pause: float, section: str, subcategory: str) -> pd.DataFrame:
+def _extract_all_products_on_current_page(driver, pause: float, section: str, subcategory: str):
+    """Raspa la subcategoría abierta con scroll adaptativo. Devuelve (DataFrame, ScrollStats)."""
     WebDriverWait(driver, 20).until(
         EC.presence_of_element_located((By.CSS_SELECTOR, "[data-testid='product-cell']"))
     )
 
-    seen: Set[str] = set()
     out: List[Dict] = []
-    no_new_loops = 0
     cat_path = f"{section} > {subcategory}".strip(" >")
+    scope = f"{cat_path}|{time.time()}"
 
-    last_scroll_y = -1
-    while True:
-        cards = driver.find_elements(By.CSS_SELECTOR, "[data-testid='product-cell']")
-
-        new_count = 0
-        for el in cards:
-            try:
-                name_core = el.find_element(By.CSS_SELECTOR, "h4.product-cell__description-name").text.strip()
-                fmt_el = el.find_elements(By.CSS_SELECTOR, ".product-format")
-                format_text = fmt_el[0].text.strip() if fmt_el else ""
-                name_full = (name_core + " " + format_text).strip()
-
-                price_el = (el.find_elements(By.CSS_SELECTOR, ".product-price [aria-label]") or
-                            el.find_elements(By.CSS_SELECTOR, ".product-price"))[0]
-                price_label = price_el.get_attribute("aria-label") or price_el.text.strip()
-                price = _num_es(price_label)
-
-                key = _key_for_seen(name_full, price_label)
-                if key in seen:
-                    continue
-
-                # imagen (opcional)
-                img_url = ""
-                img_el = el.find_elements(By.CSS_SELECTOR, ".product-cell__image-wrapper img")
-                if img_el:
-                    img_url = (img_el[0].get_attribute("src") or img_el[0].get_attribute("data-src") or "")
-                    if not img_url:
-                        srcset = img_el[0].get_attribute("srcset") or ""
-                        if srcset:
-                            try: img_url = srcset.split(",")[-1].strip().split(" ")[0]
-                            except Exception: pass
-
-                out.append({
-                    "section": section,
-                    "subcategory": subcategory,
-                    "category_path": cat_path,
-                    "name": name_full,
-                    "price": price,
-                    "price_per_unit_text": price_label,
-                    "format_text": format_text,
-                    "img_url": img_url,
-                })
-                seen.add(key); new_count += 1
-
-            except Exception:
-                continue
-
-        if new_count == 0: no_new_loops += 1
-        else: no_new_loops = 0
-        if no_new_loops >= NO_NEW_LOOPS_TO_STOP:
-            break
-
+    def _extract() -> int:
         try:
-            driver.execute_script("window.scrollBy(0, Math.floor(window.innerHeight*0.9));")
+            batch = driver.execute_script(JS_SCRAPE_NEW_CARDS, scope) or []
         except Exception:
-            pass
-        time.sleep(pause)
-
-        try: cur_y = driver.execute_script("return window.pageYOffset;")
-        except Exception: cur_y = -1
-        if cur_y == last_scroll_y:
-            try:
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(pause * 1.5)
-                cur_y = driver.execute_script("return window.pageYOffset;")
-            except Exception:
-                pass
-            if cur_y == last_scroll_y:
-                break
-        last_scroll_y = cur_y
-
-    return pd.DataFrame(out)
+            batch = []
+        for b in batch:
+            price_label = b.get("price_label") or ""
+            out.append({
+                "section": section,
+                "subcategory": subcategory,
+                "category_path": cat_path,
+                "name": b.get("name") or "",
+                "price": price_es(price_label),
+                "price_per_unit_text": price_label,
+                "format_text": b.get("format_text") or "",
+                "img_url": b.get("img_url") or "",
+            })
+        return len(batch)
+
+    ctrl = ScrollController(
+        driver,
+        item_selector="[data-testid='product-cell']",
+        sentinel_selector=SENTINEL_SELECTOR,
+        min_wait=pause,
+        stable_rounds=STABLE_ROUNDS,
+        nudge=lambda: driver.execute_script("window.scrollTo(0, document.body.scrollHeight);"),
+        label=cat_path,
+    )
+    stats = ctrl.run(_extract)
+    return pd.DataFrame(out), stats
 
 # ---------- scraping de TODAS las subcategorías ----------
+@telemetry.run("Mercadona")
 def scrape_mercadona(
     start_category_url: str = "https://tienda.mercadona.es/categories/112",
     cp: str = "08203",
@@ -306,13 +174,17 @@ def scrape_mercadona(
       section, subcategory, category_path, name, price, price_per_unit_text, format_text,
       img_url, price_kg, price_l, price_unit_count, total_g, total_ml, total_units
     """
-    driver = _build_driver(headless=headless, load_images=load_images)
+    driver = build_driver("mercadona", headless=headless, load_images=load_images)
     wait = WebDriverWait(driver, 12)
+    meter = PageMeter()
+    fps = Fingerprints("Mercadona")
 
     try:
         print(f"→ Abriendo {start_category_url}")
-        driver.get(start_category_url)
+        with telemetry.span("navigate", start_category_url):
+            driver.get(start_category_url)
 
+        t_wait = time.perf_counter()
         # cookies
         try:
             wait.until(EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))).click()
@@ -337,6 +209,7 @@ def scrape_mercadona(
             print(f"✓ CP fijado: {cp}")
         except TimeoutException:
             print("• CP ya estaba fijado")
+        telemetry.observe("wait", time.perf_counter() - t_wait, "cookies+cp")
 
         def _get_sections():
             secs = driver.find_elements(By.CSS_SELECTOR, "[class*='category-menu'] li[class*='category-menu__item']")
@@ -344,10 +217,21 @@ def scrape_mercadona(
                 secs = driver.find_elements(By.XPATH, "//li[contains(@class,'category-menu__item')]")
             return secs
 
+        def _sub_button(si: int, bi: int):
+            # el menú se re-renderiza al navegar: se busca de nuevo cada vez
+            sections = _get_sections()
+            if si >= len(sections): return None, 0
+            sec = sections[si]
+            sub_btns = sec.find_elements(By.CSS_SELECTOR, "li[class*='category-item'] button[id]") \
+                       or sec.find_elements(By.XPATH, ".//li[contains(@class,'category-item')]//button[@id]")
+            return (sub_btns[bi] if bi < len(sub_btns) else None), len(sub_btns)
+
         sections = _get_sections()
         print(f"→ Secciones detectadas: {len(sections)}")
+        meter.sample(driver, "inicio")
 
         all_rows = []
+        scroll_stats = []   # tiempo de scroll por subcategoría (ScrollStats.as_dict)
         for si in range(len(sections)):
             sections = _get_sections()
             if si >= len(sections): break
@@ -384,37 +268,57 @@ def scrape_mercadona(
             print(f"  • Subcategorías: {len(sub_btns)}")
 
             for bi in range(len(sub_btns)):
-                sections = _get_sections()
-                if si >= len(sections): break
-                sec = sections[si]
-                sub_btns = sec.find_elements(By.CSS_SELECTOR, "li[class*='category-item'] button[id]") \
-                           or sec.find_elements(By.XPATH, ".//li[contains(@class,'category-item')]//button[@id]")
-                if bi >= len(sub_btns): break
-                btn = sub_btns[bi]
+                btn, n_btns = _sub_button(si, bi)
+                if btn is None: break
 
                 sub_name = btn.text.strip() or f"Sub_{bi+1}"
                 sub_id = btn.get_attribute("id") or ""
-                print(f"    → {bi+1}/{len(sub_btns)}  {sub_name} (id={sub_id})  …click")
+                print(f"    → {bi+1}/{n_btns}  {sub_name} (id={sub_id})  …click")
 
-                driver.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
-                try: btn.click()
-                except Exception: driver.execute_script("arguments[0].click();", btn)
+                pending = [btn]   # 1er intento con el botón ya localizado; en los reintentos se busca otra vez
 
-                try:
+                def _open():
+                    b = pending.pop() if pending else _sub_button(si, bi)[0]
+                    if b is None:
+                        raise TimeoutException("subcategoría desaparecida del menú")
+                    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", b)
+                    try: b.click()
+                    except Exception: driver.execute_script("arguments[0].click();", b)
                     WebDriverWait(driver, 20).until(
                         EC.presence_of_element_located((By.CSS_SELECTOR, "[data-testid='product-cell']"))
                     )
+
+                t_nav = time.perf_counter()
+                try:
+                    retry_call(_open, label=f"{sec_name} > {sub_name}", exceptions=(TimeoutException,))
                 except TimeoutException:
                     print("      ⚠️ No aparecieron tarjetas, salto.")
+                    telemetry.count("errors")
                     continue
-
-                t0 = time.time()
-                df = _extract_all_products_on_current_page(driver, pause=pause, section=sec_name, subcategory=sub_name)
-                dt = time.time() - t0
-                print(f"      ✔ {len(df)} productos en {dt:.1f}s")
+                finally:
+                    telemetry.observe("navigate", time.perf_counter() - t_nav, f"{sec_name} > {sub_name}")
+
+                # Misma huella que la última vez → se reutilizan sus filas, sin scroll
+                key = f"{sec_name} > {sub_name}"
+                fp = _probe_fingerprint(driver)
+                prev = fps.reuse(key, fp)
+                if prev is not None:
+                    df = pd.DataFrame(prev)
+                    st = ScrollStats(label=key, items=len(df), stop_reason="unchanged")
+                    scroll_stats.append(st.as_dict())
+                    print(f"      = {len(df)} productos (sin cambios, reutilizados)")
+                else:
+                    df, st = _extract_all_products_on_current_page(driver, pause=pause, section=sec_name, subcategory=sub_name)
+                    fps.save(key, fp, df.to_dict("records"))
+                    scroll_stats.append(st.as_dict())
+                    net = meter.sample(driver, st.label)
+                    print(f"      ✔ {len(df)} productos en {st.seconds:.1f}s "
+                          f"({st.steps} pasos, espera {st.wait_seconds:.1f}s, fin: {st.stop_reason})"
+                          + (f" · {net.requests} peticiones, {net.bytes / 1024:.0f} KB" if net else ""))
 
                 if not df.empty:
-                    df = enrich_prices(df)
+                    with telemetry.span("enrich", st.label):
+                        df = enrich_prices(df)
                     all_rows.append(df)
 
                 # -------- TEST rápido: parar tras la primera subcategoría --------
@@ -427,8 +331,17 @@ def scrape_mercadona(
                 "img_url","price_kg","price_l","price_unit_count","total_g","total_ml","total_units"
             ])
 
-        out = pd.concat(all_rows, ignore_index=True).drop_duplicates().reset_index(drop=True)
-        print(f"\n✅ TOTAL productos: {len(out)}")
+        out = pd.concat(all_rows, ignore_index=True)
+        n = len(out)
+        out = out.drop_duplicates().reset_index(drop=True)
+        telemetry.count("duplicates", n - len(out))
+        telemetry.count("items", len(out))
+        out.attrs["scroll_stats"] = scroll_stats
+        out.attrs["page_stats"] = [p.as_dict() for p in meter.pages]
+        print(f"\n✅ TOTAL productos: {len(out)} "
+              f"(scroll total {sum(st['seconds'] for st in scroll_stats):.1f}s)")
+        print(meter.report("Mercadona"))
+        print(f"♻️ {fps.summary()}")
         return out
 
     finally:
@@ -0,0 +1,40 @@
+# retry.py – reintentos con espera exponencial para categorías que fallan
+#
+#   df = retry_call(lambda: _scrape_category(drv, url), label=url)
+#
+# Espera base · 2^intento (con jitter, tope BACKOFF_MAX_S). Cada reintento cuenta en
+# telemetry ("retries"); si se agotan, la excepción sale y el scraper decide (saltar la
+# categoría y contar "errors"). BARATAZO_RETRIES / BARATAZO_BACKOFF_S, o scrapers/run.py.
+
+import os, random, time
+from typing import Callable, Optional, Tuple, Type, TypeVar
+
+from scrapers import telemetry
+
+RETRIES = int(os.environ.get("BARATAZO_RETRIES", "2"))
+BACKOFF_S = float(os.environ.get("BARATAZO_BACKOFF_S", "2"))
+BACKOFF_MAX_S = 60.0
+
+T = TypeVar("T")
+
+
+def backoff(attempt: int) -> float:
+    """Espera antes del reintento nº `attempt` (0 = el primero)."""
+    return min(BACKOFF_MAX_S, BACKOFF_S * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def retry_call(fn: Callable[[], T], label: str = "", retries: Optional[int] = None,
+               exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+               log: Optional[Callable[[str], None]] = print) -> T:
+    retries = RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except exceptions as e:
+            if attempt >= retries:
+                raise
+            d = backoff(attempt)
+            telemetry.count("retries")
+            if log: log(f"↻ {label}: {type(e).__name__}, reintento {attempt + 1}/{retries} en {d:.1f}s")
+            time.sleep(d)
+    raise AssertionError("unreachable")
@@ -0,0 +1,180 @@
+# run.py – "baratazo run": rasca las tiendas a la vez y carga cada una en cuanto acaba
+#
+#   python -m scrapers.run                                   # mercadona, consum y bonpreu
+#   python -m scrapers.run --stores mercadona,bonpreu --max-browsers 2 --max-memory-mb 2500
+#   python -m scrapers.run --retries 3 --show                # reintentos por categoría, Chrome visible
+#   python -m scrapers.run --every 24                        # modo daemon: una pasada cada 24 h
+#   python -m scrapers.run --no-load --out-dir db/scrapes    # solo rascar (CSV por tienda)
+#   python -m scrapers.run --full                            # sin atajos: todas las categorías enteras
+#
+# Un hilo por tienda: Selenium se pasa casi todo el tiempo esperando a Chrome, así que el
+# GIL no estorba. Cada tienda se carga al terminar su rascado; las cargas van de una en una
+# (SQLite tiene un solo escritor). Los topes de Chrome vivos y memoria los aplica
+# build_driver (browser.BrowserLimits) y los reintentos por categoría scrapers/retry.py.
+# Las categorías cuya huella no ha cambiado se reutilizan (scrapers/fingerprint.py).
+# La pared total ≈ la tienda más lenta (+ la carga que tenga que esperar), no la suma.
+# Antes de cargar, scrapers/validate.py: si el rascado no cuadra la tienda queda "blocked"
+# y conserva sus datos. Al final, un resumen con los tiempos de cada tienda; sale con 1 si
+# alguna falló o se bloqueó.
+
+import argparse, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from scrapers import telemetry, retry, fingerprint
+from scrapers.browser import BrowserLimits, set_limits
+
+
+# ---------- qué se rasca en cada tienda ----------
+def _scrape_mercadona(args) -> pd.DataFrame:
+    from scrapers.mercadona import scrape_mercadona
+    return scrape_mercadona(cp=args.cp, headless=not args.show)
+
+def _scrape_consum(args) -> pd.DataFrame:
+    from scrapers.consum import scrape_consum
+    return scrape_consum(headless=not args.show)
+
+def _scrape_bonpreu(args) -> pd.DataFrame:
+    from scrapers.bonpreu import scrape_bonpreu
+    return scrape_bonpreu(headless=not args.show)
+
+PIPELINES: Dict[str, Tuple[str, Callable[[argparse.Namespace], pd.DataFrame]]] = {
+    "mercadona": ("Mercadona", _scrape_mercadona),
+    "consum": ("Consum", _scrape_consum),
+    "bonpreu": ("Bonpreu", _scrape_bonpreu),
+}
+
+
+@dataclass
+class StoreResult:
+    store: str
+    status: str = "ok"
+    items: int = 0
+    scrape_s: float = 0.0
+    load_wait_s: float = 0.0
+    load_s: float = 0.0
+    total_s: float = 0.0
+    done_at_s: float = 0.0            # desde el inicio de la pasada
+    counters: Dict[str, int] = field(default_factory=dict)
+    error: str = ""
+
+
+def run_store(key: str, args: argparse.Namespace, load_lock: threading.Lock, t_start: float) -> StoreResult:
+    """Rascar → (CSV) → cargar una tienda, todo en una ejecución de telemetry."""
+    store, scrape = PIPELINES[key]
+    res = StoreResult(store)
+    t0 = time.perf_counter()
+    r = None
+    try:
+        with telemetry.run(store) as r:
+            df = scrape(args)
+            res.items = len(df)
+            res.scrape_s = time.perf_counter() - t0
+            if args.out_dir:
+                args.out_dir.mkdir(parents=True, exist_ok=True)
+                df.to_csv(args.out_dir / f"{key}-{datetime.now():%Y%m%d-%H%M%S}.csv", index=False, encoding="utf-8-sig")
+            if not args.no_load:
+                if df.empty:
+                    # cargar 0 filas vaciaría la tienda en la web
+                    raise RuntimeError("0 productos: no se carga")
+                from scrapers.guardar import ADAPTERS, reload_store
+                t1 = time.perf_counter()
+                with load_lock:
+                    res.load_wait_s = time.perf_counter() - t1
+                    t2 = time.perf_counter()
+                    reload_store(store, ADAPTERS[store](df), validate=not args.no_validate)
+                    res.load_s = time.perf_counter() - t2
+    except Exception as e:
+        from scrapers.validate import ValidationError
+        # bloqueada por la validación: la tienda sigue con los datos anteriores
+        res.status = "blocked" if isinstance(e, ValidationError) else "error"
+        res.error = f"{type(e).__name__}: {e}"
+    if r is not None:
+        res.counters = dict(r.counters)
+    res.total_s = time.perf_counter() - t0
+    res.done_at_s = time.perf_counter() - t_start
+    return res
+
+
+def run_once(args: argparse.Namespace, keys: List[str]) -> List[StoreResult]:
+    limits = BrowserLimits(args.max_browsers, args.max_memory_mb, args.browser_mb)
+    set_limits(limits)
+    load_lock = threading.Lock()
+    t_start = time.perf_counter()
+    results: List[StoreResult] = []
+    try:
+        with ThreadPoolExecutor(max_workers=len(keys), thread_name_prefix="store") as ex:
+            futs = {ex.submit(run_store, k, args, load_lock, t_start): k for k in keys}
+            for f in as_completed(futs):
+                res = f.result()
+                results.append(res)
+                print(f"🏁 {res.store}: {res.status} a los {res.done_at_s:.0f}s"
+                      + (f" ({res.error})" if res.error else ""), flush=True)
+    finally:
+        set_limits(None)
+    print_summary(results, time.perf_counter() - t_start, limits)
+    return results
+
+
+def print_summary(results: List[StoreResult], wall_s: float, limits: Optional[BrowserLimits] = None) -> None:
+    total = sum(r.total_s for r in results)
+    print(f"\n⏱ Resumen: {len(results)} tiendas en {wall_s:.0f}s de pared "
+          f"(suma {total:.0f}s{f', ×{total / wall_s:.1f}' if wall_s > 0 else ''})")
+    print(f"{'tienda':12} {'estado':7} {'productos':>9} {'rascar':>8} {'espera':>8} {'carga':>8} "
+          f"{'total':>8} {'iguales':>7} {'reint.':>6} {'errores':>7}")
+    for r in sorted(results, key=lambda r: r.done_at_s):
+        print(f"{r.store:12} {r.status:7} {r.items:9d} {r.scrape_s:7.0f}s {r.load_wait_s:7.0f}s {r.load_s:7.0f}s "
+              f"{r.total_s:7.0f}s {r.counters.get('categories_unchanged', 0):7d} "
+              f"{r.counters.get('retries', 0):6d} {r.counters.get('errors', 0):7d}")
+    if limits is not None:
+        st = limits.stats()
+        print(f"Chrome: máx. {st['peak']} a la vez (tope {st['max_browsers'] or '—'}, "
+              f"memoria {st['max_memory_mb'] or '—'} MB), {st['waited_s']:.0f}s esperando turno")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(prog="baratazo run", description="Rasca y carga las tiendas a la vez")
+    ap.add_argument("--stores", default=",".join(PIPELINES), help=f"separadas por coma ({', '.join(PIPELINES)})")
+    ap.add_argument("--max-browsers", type=int, default=3, help="Chrome vivos a la vez entre todas (0 = sin tope)")
+    ap.add_argument("--max-memory-mb", type=float, default=0, help="memoria total para Chrome (0 = sin tope)")
+    ap.add_argument("--browser-mb", type=float, default=700, help="memoria que se reserva por Chrome si no se puede medir")
+    ap.add_argument("--retries", type=int, default=retry.RETRIES, help="reintentos por categoría que falla")
+    ap.add_argument("--backoff", type=float, default=retry.BACKOFF_S, help="espera base entre reintentos (s, se dobla)")
+    ap.add_argument("--full", action="store_true", help="rasca todas las categorías enteras (ignora las huellas)")
+    ap.add_argument("--full-every", type=int, default=fingerprint.FULL_EVERY_DAYS,
+                    help="días máximos sin rascar entera una categoría sin cambios")
+    ap.add_argument("--cp", default="08203", help="código postal (Mercadona)")
+    ap.add_argument("--show", action="store_true", help="Chrome visible")
+    ap.add_argument("--no-load", action="store_true", help="solo rascar, sin tocar la DB")
+    ap.add_argument("--no-validate", action="store_true", help="carga sin la validación previa (scrapers/validate.py)")
+    ap.add_argument("--out-dir", type=Path, help="guarda el DataFrame de cada tienda en CSV")
+    ap.add_argument("--every", type=float, help="modo daemon: repite cada N horas")
+    args = ap.parse_args()
+
+    keys = [k.strip().lower() for k in args.stores.split(",") if k.strip()]
+    unknown = [k for k in keys if k not in PIPELINES]
+    if unknown or not keys:
+        ap.error(f"tiendas desconocidas: {', '.join(unknown) or '(ninguna)'}")
+    retry.RETRIES, retry.BACKOFF_S = args.retries, args.backoff
+    fingerprint.FORCE_FULL = fingerprint.FORCE_FULL or args.full
+    fingerprint.FULL_EVERY_DAYS = args.full_every
+
+    while True:
+        t0 = time.time()
+        print(f"🚀 {datetime.now():%Y-%m-%d %H:%M} · {', '.join(PIPELINES[k][0] for k in keys)}", flush=True)
+        results = run_once(args, keys)
+        failed = any(r.status != "ok" for r in results)
+        if not args.every:
+            return 1 if failed else 0
+        wait = max(0.0, args.every * 3600 - (time.time() - t0))
+        print(f"💤 Siguiente pasada en {wait / 3600:.1f} h", flush=True)
+        time.sleep(wait)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
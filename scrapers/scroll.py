@@ -0,0 +1,194 @@
+# scroll.py – scroll adaptativo para listas infinitas / virtualizadas
+#
+# En vez de pausas fijas y N rondas "estables", observa el DOM desde la página
+# (MutationObserver + nº de tarjetas renderizadas) y:
+#   - espera solo hasta que el DOM se queda quieto tras cada scroll,
+#   - ajusta la espera máxima a lo que tarda la lista en cargar (media móvil),
+#   - agranda el paso mientras salen productos nuevos,
+#   - para en cuanto ve el centinela de fin de lista, llega al nº esperado
+#     de productos o está abajo del todo sin novedades.
+
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Optional
+
+from scrapers import telemetry
+
+JS_SCROLL_STATE = r"""
+const itemSel = arguments[0], contSel = arguments[1], sentSel = arguments[2], dy = arguments[3];
+if (!window.__bzMut) {
+  window.__bzMut = {last: performance.now(), n: 0};
+  try {
+    new MutationObserver(() => { window.__bzMut.last = performance.now(); window.__bzMut.n++; })
+      .observe(document.body, {childList: true, subtree: true});
+  } catch (e) {}
+}
+const se = document.scrollingElement || document.documentElement;
+const cont = contSel ? document.querySelector(contSel) : null;
+const sc = (cont && cont.scrollHeight > cont.clientHeight + 4) ? cont : se;
+if (dy) {
+  try { sc.scrollBy(0, dy); } catch (e) {}
+  if (sc !== se) { try { window.scrollBy(0, dy); } catch (e) {} }
+  try { sc.dispatchEvent(new Event('scroll', {bubbles: true})); } catch (e) {}
+}
+let sentinel = false;
+if (sentSel) {
+  const s = document.querySelector(sentSel);
+  if (s) { const r = s.getBoundingClientRect(); sentinel = r.top < window.innerHeight && r.bottom > 0; }
+}
+return {
+  count: document.querySelectorAll(itemSel).length,
+  y: sc.scrollTop,
+  max_y: sc.scrollHeight - sc.clientHeight,
+  view: sc.clientHeight || window.innerHeight,
+  mut: window.__bzMut.n,
+  idle_ms: performance.now() - window.__bzMut.last,
+  sentinel: sentinel,
+};
+"""
+
+
+@dataclass
+class ScrollStats:
+    label: str = ""
+    steps: int = 0
+    items: int = 0
+    seconds: float = 0.0
+    wait_seconds: float = 0.0
+    extract_seconds: float = 0.0
+    stop_reason: str = ""
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+class ScrollController:
+    """
+    Recorre una lista con scroll, llamando a `extract()` en cada paso.
+    `extract()` raspa lo visible y devuelve cuántos productos NUEVOS ha añadido.
+    """
+
+    def __init__(
+        self,
+        driver,
+        item_selector: str,
+        container_selector: Optional[str] = None,
+        sentinel_selector: Optional[str] = None,
+        expected_count: Optional[int] = None,
+        virtualized: bool = False,
+        min_wait: float = 0.05,
+        max_wait: float = 2.0,
+        quiet_ms: float = 150.0,
+        stable_rounds: int = 2,
+        max_idle_rounds: int = 8,
+        max_steps: int = 400,
+        nudge: Optional[Callable[[], None]] = None,
+        label: str = "",
+    ):
+        self.driver = driver
+        self.item_selector = item_selector
+        self.container_selector = container_selector
+        self.sentinel_selector = sentinel_selector
+        self.expected_count = expected_count
+        # En listas virtualizadas solo existe lo visible: pasos > 1 pantalla se saltan tarjetas
+        self.max_step_frac = 0.9 if virtualized else 2.5
+        self.step_frac = 0.9
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.quiet_ms = quiet_ms
+        self.stable_rounds = stable_rounds
+        self.max_idle_rounds = max_idle_rounds
+        self.max_steps = max_steps
+        self.nudge = nudge
+        self.stats = ScrollStats(label=label)
+        self._settle_avg = max(min_wait, 0.3)   # media móvil de lo que tarda en cargar
+
+    # ---------- JS ----------
+    def _state(self, dy: int = 0) -> Dict:
+        try:
+            st = self.driver.execute_script(
+                JS_SCROLL_STATE, self.item_selector, self.container_selector,
+                self.sentinel_selector, int(dy),
+            )
+        except Exception:
+            st = None
+        return st or {"count": 0, "y": 0, "max_y": 0, "view": 800, "mut": 0, "idle_ms": 1e9, "sentinel": False}
+
+    def _wait_settle(self, before: Dict, expect_load: bool) -> Dict:
+        """
+        Espera tras un scroll:
+        - a media lista: hasta que el DOM lleva `quiet_ms` sin mutaciones;
+        - abajo del todo (`expect_load`): hasta que cambie el DOM y se calme, con
+          un tope adaptativo (3× lo que suele tardar en cargar la siguiente tanda).
+        """
+        t0 = time.perf_counter()
+        timeout = min(self.max_wait, max(2 * self.min_wait, 3 * self._settle_avg))
+        time.sleep(self.min_wait)
+        st = self._state()
+        while True:
+            elapsed = time.perf_counter() - t0
+            quiet = st["idle_ms"] >= self.quiet_ms
+            changed = st["mut"] != before["mut"] or st["count"] != before["count"]
+            if quiet and (changed or not expect_load):
+                if changed:
+                    # solo las esperas que han visto carga alimentan la media
+                    self._settle_avg = 0.7 * self._settle_avg + 0.3 * elapsed
+                break
+            if elapsed >= timeout:
+                break
+            time.sleep(self.min_wait)
+            st = self._state()
+        self.stats.wait_seconds += time.perf_counter() - t0
+        return st
+
+    # ---------- bucle ----------
+    def run(self, extract: Callable[[], int]) -> ScrollStats:
+        t0 = time.perf_counter()
+        st = self._state()
+        idle = 0
+        while self.stats.steps < self.max_steps:
+            te = time.perf_counter()
+            new = extract()
+            self.stats.extract_seconds += time.perf_counter() - te
+            self.stats.items += new
+            idle = 0 if new else idle + 1
+
+            at_bottom = st["y"] >= st["max_y"] - 2
+            if self.expected_count and self.stats.items >= self.expected_count:
+                self.stats.stop_reason = "expected_count"
+                break
+            if st["sentinel"] and not new:
+                self.stats.stop_reason = "sentinel"
+                break
+            if at_bottom and idle >= self.stable_rounds:
+                self.stats.stop_reason = "end_of_list"
+                break
+            if idle >= self.max_idle_rounds:
+                self.stats.stop_reason = "no_new_items"
+                break
+
+            # Paso: crece mientras haya novedades rápidas, vuelve a 0.9 pantallas si no
+            if new and self._settle_avg <= 2 * self.min_wait + self.quiet_ms / 1000.0:
+                self.step_frac = min(self.max_step_frac, self.step_frac * 1.5)
+            elif not new:
+                self.step_frac = 0.9
+
+            before = st
+            st = self._state(dy=int(self.step_frac * (st["view"] or 800)))
+            if st["y"] == before["y"] and not at_bottom and self.nudge:
+                try:
+                    self.nudge()   # el scroll por JS no ha movido nada: plan B de la tienda
+                except Exception:
+                    pass
+            st = self._wait_settle(st, expect_load=st["y"] >= st["max_y"] - 2)
+            self.stats.steps += 1
+        else:
+            self.stats.stop_reason = "max_steps"
+
+        self.stats.seconds = time.perf_counter() - t0
+        # Telemetría: "scroll" = todo menos la extracción; "wait" es la parte de scroll esperando al DOM
+        lbl = self.stats.label
+        telemetry.observe("scroll", self.stats.seconds - self.stats.extract_seconds, lbl)
+        telemetry.observe("wait", self.stats.wait_seconds, lbl)
+        telemetry.observe("extract", self.stats.extract_seconds, lbl)
+        return self.stats
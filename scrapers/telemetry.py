@@ -0,0 +1,285 @@
+# telemetry.py – tiempos por fase, contadores e informe de cada ejecución
+#
+#   with telemetry.run("Mercadona"):          # abre (o reutiliza) la ejecución
+#       with telemetry.span("navigate", url): # fase + etiqueta (categoría, URL…)
+#           driver.get(url)
+#       telemetry.count("items", len(df))
+#
+# Al cerrar la ejecución más externa:
+#   - JSON en <dir>/<tienda>-<fecha>.json
+#   - textfile de Prometheus (node_exporter) en <dir>/baratazo_<tienda>.prom
+#   - fila en la tabla scrape_run (histórico para SLOs de duración)
+# <dir> = BARATAZO_RUNS_DIR, o db/runs junto a la base de datos.
+#
+# Las llamadas sueltas (span/observe/count) sin ejecución abierta no hacen nada,
+# así que los scrapers se pueden usar igual desde un notebook.
+# La ejecución activa es por hilo (ContextVar): varias tiendas en paralelo no se mezclan.
+
+import json, os, re, statistics, time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Fases estándar (se admiten otras): driver_start, navigate, wait, scroll,
+# extract, enrich, db_load
+MAX_SPANS = 5000          # detalle por span guardado en el JSON (los agregados no tienen tope)
+SLOWEST_PER_PHASE = 10
+REGRESSION_FACTOR = 2.0   # aviso si una ejecución tarda > 2× la mediana de las anteriores
+
+# Objetivo de duración por tienda (s). BARATAZO_SLO_<TIENDA>=segundos lo sobreescribe.
+DEFAULT_SLO_SECONDS: Dict[str, float] = {
+    "mercadona": 3600.0,
+    "consum": 5400.0,
+    "bonpreu": 3600.0,
+}
+
+_current: ContextVar[Optional["Run"]] = ContextVar("baratazo_run", default=None)
+
+
+def _slug(s: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", (s or "").lower()).strip("_") or "run"
+
+
+class Run:
+    def __init__(self, store: str):
+        self.store = store
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.duration_s = 0.0
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.spans: List[Dict] = []
+        self.dropped_spans = 0
+
+    # ---------- registro ----------
+    def observe(self, phase: str, seconds: float, label: str = "") -> None:
+        ph = self.phases.setdefault(phase, {"seconds": 0.0, "count": 0, "max": 0.0})
+        ph["seconds"] += seconds
+        ph["count"] += 1
+        ph["max"] = max(ph["max"], seconds)
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append({
+                "phase": phase, "label": label,
+                "start": round(time.perf_counter() - self._t0 - seconds, 4),
+                "seconds": round(seconds, 4),
+            })
+        else:
+            self.dropped_spans += 1
+
+    @contextmanager
+    def span(self, phase: str, label: str = ""):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - t0, label)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def finish(self, status: str = "ok", error: Optional[str] = None) -> None:
+        self.duration_s = time.perf_counter() - self._t0
+        self.status = status
+        self.error = error
+
+    # ---------- informe ----------
+    def slo_seconds(self) -> Optional[float]:
+        env = os.environ.get(f"BARATAZO_SLO_{_slug(self.store).upper()}")
+        if env:
+            try:
+                return float(env)
+            except ValueError:
+                pass
+        return DEFAULT_SLO_SECONDS.get(_slug(self.store))
+
+    def report(self) -> Dict:
+        slowest = {}
+        for phase in self.phases:
+            top = sorted((s for s in self.spans if s["phase"] == phase and s["label"]),
+                         key=lambda s: s["seconds"], reverse=True)[:SLOWEST_PER_PHASE]
+            if top:
+                slowest[phase] = [{"label": s["label"], "seconds": s["seconds"]} for s in top]
+        slo = self.slo_seconds()
+        return {
+            "store": self.store,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration_s": round(self.duration_s, 3),
+            "status": self.status,
+            "error": self.error,
+            "slo_s": slo,
+            "slo_ok": None if slo is None else (self.status == "ok" and self.duration_s <= slo),
+            "phases": {k: {"seconds": round(v["seconds"], 3), "count": int(v["count"]), "max": round(v["max"], 3)}
+                       for k, v in sorted(self.phases.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "slowest": slowest,
+            "spans": self.spans,
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+# ---------- API de módulo (no-op sin ejecución activa) ----------
+def current() -> Optional[Run]:
+    return _current.get()
+
+
+def span(phase: str, label: str = ""):
+    r = _current.get()
+    return r.span(phase, label) if r is not None else nullcontext()
+
+
+def observe(phase: str, seconds: float, label: str = "") -> None:
+    r = _current.get()
+    if r is not None:
+        r.observe(phase, seconds, label)
+
+
+def count(name: str, n: int = 1) -> None:
+    r = _current.get()
+    if r is not None:
+        r.count(name, n)
+
+
+@contextmanager
+def run(store: str, emit: bool = True):
+    """
+    Abre una ejecución para `store`. Si ya hay una activa en este hilo (ej. el
+    scraper llamado desde un pipeline que ya la abrió), la reutiliza y no emite nada.
+    """
+    parent = _current.get()
+    if parent is not None:
+        yield parent
+        return
+    r = Run(store)
+    token = _current.set(r)
+    try:
+        yield r
+    except BaseException as e:
+        r.finish("error", f"{type(e).__name__}: {e}")
+        raise
+    else:
+        r.finish("ok")
+    finally:
+        _current.reset(token)
+        if emit:
+            emit_report(r)
+
+
+# ---------- salidas ----------
+def runs_dir() -> Path:
+    env = os.environ.get("BARATAZO_RUNS_DIR")
+    if env:
+        return Path(env)
+    from pagina_web.db import db_path
+    return db_path.parent / "runs"
+
+
+def to_prometheus(rep: Dict) -> str:
+    """Formato textfile de node_exporter (una tienda por fichero)."""
+    store = _slug(rep["store"])
+    ts = datetime.fromisoformat(rep["started_at"]).timestamp()
+    lines = [
+        "# HELP baratazo_scrape_duration_seconds Duración total de la última ejecución.",
+        "# TYPE baratazo_scrape_duration_seconds gauge",
+        f'baratazo_scrape_duration_seconds{{store="{store}"}} {rep["duration_s"]}',
+        "# HELP baratazo_scrape_success 1 si la última ejecución terminó bien.",
+        "# TYPE baratazo_scrape_success gauge",
+        f'baratazo_scrape_success{{store="{store}"}} {1 if rep["status"] == "ok" else 0}',
+        "# HELP baratazo_scrape_started_timestamp_seconds Inicio de la última ejecución (epoch).",
+        "# TYPE baratazo_scrape_started_timestamp_seconds gauge",
+        f'baratazo_scrape_started_timestamp_seconds{{store="{store}"}} {ts:.0f}',
+        "# HELP baratazo_scrape_phase_seconds Tiempo acumulado por fase en la última ejecución.",
+        "# TYPE baratazo_scrape_phase_seconds gauge",
+    ]
+    for phase, v in rep["phases"].items():
+        lines.append(f'baratazo_scrape_phase_seconds{{store="{store}",phase="{phase}"}} {v["seconds"]}')
+    lines += [
+        "# HELP baratazo_scrape_phase_max_seconds Span más lento por fase en la última ejecución.",
+        "# TYPE baratazo_scrape_phase_max_seconds gauge",
+    ]
+    for phase, v in rep["phases"].items():
+        lines.append(f'baratazo_scrape_phase_max_seconds{{store="{store}",phase="{phase}"}} {v["max"]}')
+    lines += [
+        "# HELP baratazo_scrape_count Contadores de la última ejecución (items, duplicates, retries…).",
+        "# TYPE baratazo_scrape_count gauge",
+    ]
+    for name, n in rep["counters"].items():
+        lines.append(f'baratazo_scrape_count{{store="{store}",counter="{name}"}} {n}')
+    if rep["slo_s"] is not None:
+        lines += [
+            "# HELP baratazo_scrape_slo_seconds Objetivo de duración.",
+            "# TYPE baratazo_scrape_slo_seconds gauge",
+            f'baratazo_scrape_slo_seconds{{store="{store}"}} {rep["slo_s"]}',
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: Path, data: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(data, encoding="utf-8")
+    os.replace(tmp, path)   # node_exporter nunca ve un fichero a medias
+
+
+def record_history(rep: Dict) -> None:
+    from sqlmodel import Session
+    from pagina_web.db import engine, init_db
+    from pagina_web.models import ScrapeRun
+    init_db()
+    c = rep["counters"]
+    with Session(engine) as s:
+        s.add(ScrapeRun(
+            store=rep["store"],
+            started_at=datetime.fromisoformat(rep["started_at"]),
+            duration_s=rep["duration_s"],
+            status=rep["status"],
+            items=c.get("items", 0),
+            duplicates=c.get("duplicates", 0),
+            retries=c.get("retries", 0),
+            report_json=json.dumps({k: v for k, v in rep.items() if k != "spans"}, ensure_ascii=False),
+        ))
+        s.commit()
+
+
+def history(store: str, limit: int = 20) -> List[Dict]:
+    """Últimas ejecuciones de `store` (más reciente primero)."""
+    from sqlalchemy import text
+    from pagina_web.db import engine
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT started_at, duration_s, status, items, duplicates, retries
+              FROM scrape_run WHERE store = :store
+             ORDER BY started_at DESC LIMIT :n
+        """), {"store": store, "n": int(limit)}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def emit_report(r: Run) -> Dict:
+    rep = r.report()
+    try:
+        out = runs_dir()
+        out.mkdir(parents=True, exist_ok=True)
+        stamp = r.started_at.strftime("%Y%m%dT%H%M%SZ")
+        _write_atomic(out / f"{_slug(r.store)}-{stamp}.json", json.dumps(rep, ensure_ascii=False, indent=1))
+        _write_atomic(out / f"baratazo_{_slug(r.store)}.prom", to_prometheus(rep))
+    except OSError as e:
+        print(f"⚠️ No se pudo escribir el informe de {r.store}: {e}")
+    try:
+        prev = [h["duration_s"] for h in history(r.store) if h["status"] == "ok"]
+    except Exception:
+        prev = []   # aún no existe la tabla
+    try:
+        record_history(rep)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el histórico de {r.store}: {e}")
+    if prev and rep["status"] == "ok":
+        med = statistics.median(prev)
+        if med > 0 and rep["duration_s"] > REGRESSION_FACTOR * med:
+            print(f"⚠️ {r.store}: {rep['duration_s'] / med:.1f}× más lenta que la mediana "
+                  f"de las últimas {len(prev)} ({med:.0f}s)")
+    slo = "" if rep["slo_ok"] is None else (" · SLO ✓" if rep["slo_ok"] else f" · SLO ✗ (> {rep['slo_s']:.0f}s)")
+    phases = ", ".join(f"{k} {v['seconds']:.1f}s" for k, v in rep["phases"].items())
+    print(f"⏱ {r.store}: {rep['status']} en {rep['duration_s']:.1f}s{slo} [{phases}] {rep['counters']}")
+    return rep
@@ -0,0 +1,255 @@
+# validate.py – control de calidad entre el rascado y la carga (activo por defecto)
+#
+#   clean, rep = validate("Mercadona", df)   # df en LOAD_COLUMNS (scrapers/guardar.py)
+#   if rep.blocked: ...                      # reload_store() lanza ValidationError y no toca la DB
+#
+# Comprobaciones, todas vectorizadas (100k filas en milisegundos):
+#   - rows:       productos distintos frente a los que hay ahora en la DB de esa tienda
+#                 (un selector roto que devuelve 50 no puede vaciar las otras 4.000)
+#   - bad_price:  precio nulo, cero o negativo → cuarentena
+#   - outliers:   €/kg y €/L fuera de [Q1 − k·IQR, Q3 + k·IQR] en escala log, con el histórico
+#                 (lo cargado ahora) de su subcategoría, o de la categoría si hay pocos; solo
+#                 productos nuevos o que saltan > OUTLIER_JUMP× sobre su valor → cuarentena
+#   - duplicates: la misma fila (título normalizado, como el id, + categoría) repetida; el
+#                 mismo título en varias categorías es normal y solo se informa
+#   - unparsed:   filas sin ninguna medida (€/kg, €/L, €/ud) frente a la proporción actual
+# Cada comprobación tiene su umbral; si se pasa, se bloquea la carga entera. Las filas en
+# cuarentena no se cargan. Informe JSON + CSV de la cuarentena en <dir>/<tienda>-<fecha>.*,
+# con <dir> = BARATAZO_QUARANTINE_DIR o db/quarantine junto a la base de datos.
+# Umbrales: constantes de abajo (BARATAZO_VALIDATE_<NOMBRE>); BARATAZO_VALIDATE=0 lo apaga.
+
+import json, os, time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scrapers import telemetry
+
+
+def _env(name: str, default: float) -> float:
+    return float(os.environ.get(f"BARATAZO_VALIDATE_{name}", default))
+
+ENABLED = os.environ.get("BARATAZO_VALIDATE", "1").strip().lower() not in ("0", "false", "no", "off")
+MIN_ROWS_RATIO = _env("MIN_ROWS_RATIO", 0.5)       # productos nuevos / actuales
+MIN_HISTORY = int(_env("MIN_HISTORY", 50))          # por debajo, sin comparación de filas
+MAX_BAD_PRICE = _env("MAX_BAD_PRICE", 0.05)         # fracción de filas
+MAX_OUTLIERS = _env("MAX_OUTLIERS", 0.05)
+MAX_DUPLICATES = _env("MAX_DUPLICATES", 0.10)
+MAX_UNPARSED_INCREASE = _env("MAX_UNPARSED_INCREASE", 0.15)   # sobre la proporción actual
+OUTLIER_IQR_K = _env("OUTLIER_IQR_K", 3.0)          # en log10: 3·IQR ≈ un factor grande, no un cambio de precio
+MIN_CATEGORY_SAMPLES = int(_env("MIN_CATEGORY_SAMPLES", 8))
+OUTLIER_JUMP = _env("OUTLIER_JUMP", 2.0)           # ×/÷ sobre su valor anterior
+
+OUTLIER_METRICS = ("price_kg", "price_l")
+MEASURES = ("price_kg", "price_l", "price_unit_count")
+
+
+class ValidationError(RuntimeError):
+    def __init__(self, report: "ValidationReport"):
+        super().__init__(f"validación: {'; '.join(report.blocked)}")
+        self.report = report
+
+
+@dataclass
+class ValidationReport:
+    store: str
+    rows: int = 0
+    products: int = 0
+    previous: int = 0
+    checks: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    blocked: List[str] = field(default_factory=list)
+    quarantined: int = 0
+    seconds: float = 0.0
+    history_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.blocked
+
+    def _check(self, name: str, value: float, limit: float, breached: bool, **extra) -> None:
+        self.checks[name] = {"value": round(float(value), 4), "limit": limit, "ok": not breached, **extra}
+
+    def summary(self) -> str:
+        state = "BLOQUEADA" if self.blocked else "ok"
+        parts = [f"{k} {v['value']:g}{'' if v['ok'] else ' ✗'}" for k, v in self.checks.items()]
+        return (f"{self.store}: validación {state} en {self.seconds * 1000:.0f} ms "
+                f"(+{self.history_s * 1000:.0f} ms de histórico) · {self.products} productos "
+                f"(antes {self.previous}), {self.quarantined} en cuarentena · {', '.join(parts)}"
+                + (f" · {'; '.join(self.blocked)}" if self.blocked else ""))
+
+
+def quarantine_dir() -> Path:
+    env = os.environ.get("BARATAZO_QUARANTINE_DIR")
+    if env:
+        return Path(env)
+    from pagina_web.db import db_path
+    return db_path.parent / "quarantine"
+
+
+def load_history(store: str, conn=None) -> pd.DataFrame:
+    """Lo cargado ahora de `store`: una fila por producto y categoría (con sus medidas).
+
+    Las categorías llegan como Categorical (la tabla category es pequeña): así no se
+    materializan 100k cadenas repetidas.
+    """
+    from sqlalchemy import text
+    from pagina_web.db import engine
+    if conn is None:
+        with engine.connect() as conn:
+            return load_history(store, conn)
+    cats = conn.execute(text("SELECT pk, category, subcategory FROM category")).all()
+    h = pd.DataFrame(conn.execute(text(f"""
+        SELECT p.pk, p.title, {', '.join(f'p.{c}' for c in MEASURES)}, pc.category_pk
+          FROM product p LEFT JOIN product_category pc ON pc.product_pk = p.pk
+         WHERE p.store = :store"""), {"store": store}).all(), columns=["pk", "title", *MEASURES, "category_pk"])
+    pos = pd.Index([r[0] for r in cats], dtype="int64").get_indexer(h["category_pk"].fillna(-1).astype("int64"))
+    for i, col in ((1, "category"), (2, "subcategory")):
+        codes, names = pd.factorize(pd.Series([r[i] for r in cats], dtype=object))
+        h[col] = pd.Categorical.from_codes(np.where(pos >= 0, codes[pos], -1), categories=names)
+    return h.drop(columns="category_pk")
+
+
+def _codes(a: pd.Series, b: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Códigos enteros comunes a dos Series de texto, normalizadas (strip + minúsculas).
+
+    Se factoriza cada una y solo se normalizan los valores distintos (pocos en categorías).
+    """
+    facs = [pd.factorize(s, use_na_sentinel=False) for s in (a, b)]
+    uniqs = [pd.Series(np.asarray(u, dtype=object)).fillna("").astype(str).str.strip().str.lower() for _, u in facs]
+    index = pd.Index(pd.concat(uniqs, ignore_index=True).unique())
+    return index.get_indexer(uniqs[0])[facs[0][0]], index.get_indexer(uniqs[1])[facs[1][0]]
+
+
+def _title_codes(titles: pd.Series) -> np.ndarray:
+    """Códigos de título con la misma clave que el id del producto (make_product_ids: strip,
+    minúsculas, espacios juntos): "Leche Entera" y "leche  entera" son el mismo producto."""
+    codes, uniq = pd.factorize(titles, use_na_sentinel=False)
+    # split() corta por los mismos espacios que \s+ y ya quita los de los extremos; una pasada
+    # por título distinto, la mitad que .str.strip().str.lower().str.replace()
+    keys = [" ".join(t.lower().split()) if isinstance(t, str) else "" for t in uniq]
+    return pd.factorize(np.asarray(keys, dtype=object))[0][codes]
+
+
+def _bounds(values: np.ndarray, keys: np.ndarray) -> pd.DataFrame:
+    """lo/hi (log10) por clave con al menos MIN_CATEGORY_SAMPLES valores."""
+    g = pd.Series(values).groupby(keys)
+    q = pd.DataFrame({"q1": g.quantile(0.25), "q3": g.quantile(0.75), "n": g.size()})
+    q = q[q["n"] >= MIN_CATEGORY_SAMPLES]
+    iqr = q["q3"] - q["q1"]
+    return pd.DataFrame({"lo": q["q1"] - OUTLIER_IQR_K * iqr, "hi": q["q3"] + OUTLIER_IQR_K * iqr})
+
+
+def _lookup(table: pd.Series, keys: np.ndarray) -> np.ndarray:
+    # -1 (clave sin límites) cae en el NaN del final
+    return np.append(table.to_numpy(dtype=float), np.nan)[table.index.get_indexer(keys)]
+
+
+def _log(v: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(v > 0, np.log10(v), np.nan)
+
+
+def validate(store: str, df: pd.DataFrame, history: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, ValidationReport]:
+    """(filas que se pueden cargar, informe). Si rep.blocked, no se debe cargar nada."""
+    t0 = time.perf_counter()
+    hist = load_history(store) if history is None else history
+    rep = ValidationReport(store, rows=len(df), history_s=time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    n = max(len(df), 1)
+    reason = np.full(len(df), "", dtype=object)
+
+    # Todo con códigos enteros: título, categoría y (categoría, subcategoría)
+    # con id (reload_store) sale lo mismo que normalizando el título, sin repetir el trabajo
+    t_new = pd.factorize(df["id"])[0] if "id" in df else _title_codes(df["title"])
+    c_new, c_hist = _codes(df["category"], hist["category"])
+    s_new, s_hist = _codes(df["subcategory"], hist["subcategory"])
+    n_sub = int(max(s_new.max(initial=-1), s_hist.max(initial=-1))) + 1
+    p_new, p_hist = c_new * n_sub + s_new, c_hist * n_sub + s_hist
+    # histórico por producto: su primera fila (un producto sale una vez por categoría)
+    first = np.flatnonzero(~pd.Index(hist["pk"]).duplicated())
+
+    # precio nulo / cero
+    price = pd.to_numeric(df["price_unit"], errors="coerce").to_numpy(dtype=float)
+    bad = ~(price > 0)
+    reason[bad] = "bad_price"
+    rep._check("bad_price", bad.sum() / n, MAX_BAD_PRICE, bad.sum() / n > MAX_BAD_PRICE, rows=int(bad.sum()))
+
+    # €/kg, €/L fuera del rango de su subcategoría (o categoría) en el histórico. Un producto
+    # que ya estaba con (casi) el mismo valor no cuenta: el azafrán es caro todos los días.
+    out_rows = np.zeros(len(df), dtype=bool)
+    for col in OUTLIER_METRICS:
+        if col not in df.columns or not len(first):
+            continue   # sin histórico no hay con qué comparar
+        lv_hist = _log(hist[col].to_numpy(dtype=float)[first])
+        ok = ~np.isnan(lv_hist)
+        sub_b = _bounds(lv_hist[ok], p_hist[first][ok])
+        cat_b = _bounds(lv_hist[ok], c_hist[first][ok])
+        lo = _lookup(sub_b["lo"], p_new)
+        hi = _lookup(sub_b["hi"], p_new)
+        lo = np.where(np.isnan(lo), _lookup(cat_b["lo"], c_new), lo)
+        hi = np.where(np.isnan(hi), _lookup(cat_b["hi"], c_new), hi)
+        lv = _log(pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float))
+        with np.errstate(invalid="ignore"):
+            mask = ~np.isnan(lv) & ((lv < lo) | (lv > hi)) & ~bad
+        if mask.any():   # pocas filas: su valor anterior se busca por título solo para ellas
+            titles = df["title"].to_numpy()[mask]
+            h_titles = hist["title"].iloc[first]
+            m = h_titles.isin(titles).to_numpy()
+            prev = pd.Series(lv_hist[m], index=h_titles[m].to_numpy())
+            prev = prev[~prev.index.duplicated()].reindex(titles).to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                mask[mask] = ~(np.abs(lv[mask] - prev) <= np.log10(OUTLIER_JUMP))   # nuevo (NaN) → sí
+        reason[mask & (reason == "")] = f"outlier_{col}"
+        out_rows |= mask
+    rep._check("outliers", out_rows.sum() / n, MAX_OUTLIERS, out_rows.sum() / n > MAX_OUTLIERS,
+               rows=int(out_rows.sum()), k=OUTLIER_IQR_K)
+
+    # duplicados: fila repetida (anómalo) vs título en varias categorías (normal)
+    dup_rows = pd.Index(t_new.astype(np.int64) * (int(p_new.max(initial=0)) + 1) + p_new).duplicated()
+    multi = int(pd.Index(t_new).duplicated().sum() - dup_rows.sum())
+    rep._check("duplicates", dup_rows.sum() / n, MAX_DUPLICATES, dup_rows.sum() / n > MAX_DUPLICATES,
+               rows=int(dup_rows.sum()), multi_category=multi)
+
+    # formatos sin parsear: ninguna medida
+    have = [c for c in MEASURES if c in df.columns]
+    unparsed = (df[have].isna().all(axis=1).to_numpy() if have else np.ones(len(df), dtype=bool)) & ~bad
+    base = float(np.isnan(hist[list(MEASURES)].to_numpy(dtype=float)[first]).all(axis=1).mean()) if len(first) else 0.0
+    frac = unparsed.sum() / n
+    rep._check("unparsed", frac, round(base + MAX_UNPARSED_INCREASE, 4), frac > base + MAX_UNPARSED_INCREASE,
+               rows=int(unparsed.sum()), previous=round(base, 4))
+
+    # cuántos productos quedan frente a los que hay
+    keep = ~(bad | out_rows)
+    rep.products = int(pd.unique(t_new[keep]).size)
+    rep.previous = int(len(first))
+    ratio = rep.products / rep.previous if rep.previous else 1.0
+    rep._check("rows", ratio, MIN_ROWS_RATIO, rep.previous >= MIN_HISTORY and ratio < MIN_ROWS_RATIO,
+               products=rep.products, previous=rep.previous)
+
+    rep.blocked = [f"{k} {v['value']:g} (umbral {v['limit']:g})" for k, v in rep.checks.items() if not v["ok"]]
+    rep.quarantined = int((~keep).sum())
+    rep.seconds = time.perf_counter() - t0
+    telemetry.observe("validate", rep.history_s + rep.seconds, store)
+    telemetry.count("quarantined", rep.quarantined)
+    if rep.quarantined or rep.blocked:
+        save_report(rep, df[~keep].assign(reason=reason[~keep]) if rep.quarantined else None)
+    return df[keep], rep
+
+
+def save_report(rep: ValidationReport, quarantined: Optional[pd.DataFrame] = None) -> Optional[Path]:
+    """Informe JSON (+ CSV con las filas en cuarentena) en quarantine_dir()."""
+    try:
+        out = quarantine_dir()
+        out.mkdir(parents=True, exist_ok=True)
+        stem = out / f"{rep.store.lower()}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%fZ}"
+        stem.with_suffix(".json").write_text(json.dumps(asdict(rep), ensure_ascii=False, indent=1), encoding="utf-8")
+        if quarantined is not None and len(quarantined):
+            quarantined.to_csv(stem.with_suffix(".csv"), index=False, encoding="utf-8-sig")
+        return stem
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el informe de validación de {rep.store}: {e}")
+        return None
@@ -0,0 +1,122 @@
+# check_units.py – corpus + propiedades + microbenchmark de pagina_web/units.py
+#
+#   python scripts/check_units.py                 # comprueba el corpus y mide
+#   python scripts/check_units.py --regen         # regenera el corpus desde la DB
+#
+# El corpus (units_corpus.tsv) son los títulos reales de la DB con los totales
+# (g, ml, units) esperados. Si cambias el parser a propósito, revisa el diff
+# del .tsv tras --regen antes de commitearlo.
+
+import argparse, csv, math, sqlite3, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from pagina_web.units import parse_totals, parse_totals_batch, tokenize_quantity  # noqa: E402
+
+CORPUS = Path(__file__).with_name("units_corpus.tsv")
+DEFAULT_DB = ROOT / "db" / "baratazo.db"
+
+
+def regen(db: Path) -> None:
+    with sqlite3.connect(db) as conn:
+        titles = sorted({r[0] for r in conn.execute("SELECT title FROM product") if r[0]})
+    with CORPUS.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter="\t", lineterminator="\n")
+        w.writerow(["text", "g", "ml", "units"])
+        for t in titles:
+            g, ml, units = parse_totals(t)
+            w.writerow([t, f"{g:g}", f"{ml:g}", units])
+    print(f"Corpus regenerado: {len(titles)} textos → {CORPUS.name}")
+
+
+def load_corpus():
+    with CORPUS.open(encoding="utf-8") as f:
+        r = csv.DictReader(f, delimiter="\t")
+        return [(row["text"], float(row["g"]), float(row["ml"]), int(row["units"])) for row in r]
+
+
+def _close(a, b) -> bool:
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def check(corpus) -> int:
+    fails = 0
+
+    def fail(msg):
+        nonlocal fails
+        fails += 1
+        if fails <= 20:
+            print("  ✗", msg)
+
+    # 1) Corpus: salida esperada
+    for text, g, ml, units in corpus:
+        got = parse_totals(text)
+        if not (_close(got[0], g) and _close(got[1], ml) and got[2] == units):
+            fail(f"corpus {text!r}: esperado {(g, ml, units)}, obtenido {got}")
+
+    texts = [c[0] for c in corpus]
+    batch = parse_totals_batch(texts)
+    for text, row in zip(texts, batch.itertuples(index=False)):
+        got = parse_totals(text)
+        # 2) batch == escalar
+        if (row.g, row.ml, row.units) != got:
+            fail(f"batch {text!r}: {tuple(row)} != {got}")
+        # 3) no negativos y una sola magnitud
+        if min(got) < 0 or sum(1 for v in got if v) > 1:
+            fail(f"magnitudes {text!r}: {got}")
+        # 4) insensible a mayúsculas y espacios
+        if parse_totals("  " + text.upper().replace(" ", "   ") + " ") != got:
+            fail(f"normalización {text!r}")
+        # 5) "N x <formato>" multiplica los formatos con un solo número con unidad
+        parts = tokenize_quantity(text.lower())
+        if len(parts) == 1 and sum(1 for tok in parts[0] if tok[1]) == 1 and (got[0] or got[1]):
+            g, ml, _ = parse_totals(f"3 x {text}")
+            if not (_close(g, 3 * got[0]) and _close(ml, 3 * got[1])):
+                fail(f"multiplicador {text!r}: {(g, ml)} != 3 × {got[:2]}")
+    return fails
+
+
+def bench(corpus, repeat: int = 5) -> None:
+    texts = [c[0] for c in corpus]
+    n = len(texts)
+
+    best = min(_timed(lambda: [parse_totals(t) for t in texts]) for _ in range(repeat))
+    print(f"parse_totals (escalar):      {best / n * 1e6:7.2f} µs/texto  ({n} textos)")
+
+    best = min(_timed(lambda: parse_totals_batch(texts)) for _ in range(repeat))
+    print(f"parse_totals_batch (únicos): {best / n * 1e6:7.2f} µs/texto")
+
+    # Scrapes reales: muchos formatos repetidos ("Brick 1 L", "Paquete 500 g"...)
+    rep = [t.rsplit(" ", 3)[-3:] for t in texts]
+    fmts = [" ".join(r) for r in rep] * 10
+    best = min(_timed(lambda: parse_totals_batch(fmts)) for _ in range(repeat))
+    print(f"parse_totals_batch (formatos repetidos): {best / len(fmts) * 1e6:7.2f} µs/texto")
+
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Corpus, propiedades y microbenchmark de pagina_web/units.py")
+    ap.add_argument("--regen", action="store_true", help="regenera el corpus desde la DB")
+    ap.add_argument("--db", type=Path, default=DEFAULT_DB)
+    ap.add_argument("--no-bench", action="store_true")
+    args = ap.parse_args()
+
+    if args.regen:
+        regen(args.db)
+    corpus = load_corpus()
+    fails = check(corpus)
+    print(f"{'✅' if not fails else '❌'} {len(corpus)} textos, {fails} fallos")
+    if not args.no_bench:
+        bench(corpus)
+    return 1 if fails else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())